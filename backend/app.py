@@ -6,7 +6,7 @@ import logging
 import sys
 from threading import Thread
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g, stream_with_context
 from flask_cors import CORS
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
@@ -15,8 +15,13 @@ try:
 	from config.db_credentials import DB_CONFIG
 	from log2db.utils import setup_logging
 	from log2db.db_manager import DatabaseManager
-	from log2db.core import process_log_file
-	from archive.group_trips import group_trips_logic
+	from log2db.pool import configure_pool, get_pool
+	from log2db.ingest_service import IngestService
+	from log2db.sources import is_log_file
+	from log2db.metrics import REGISTRY, CONTENT_TYPE, HTTP_REQUEST_SECONDS, INGEST_SERVICE_GAUGES, DB_POOL_GAUGES
+	from log2db.json_stream import iter_json_document
+	from archive.group_trips import group_trips_logic, preview_group_summary
+	from log2db.trip_endpoints import parse_sensitivity, PREVIEW_SENSITIVITIES
 except ImportError as e:
 	print(f"FATAL: A required file or module could not be imported: {e}", file=sys.stderr)
 	sys.exit(1)
@@ -25,27 +30,51 @@ app = Flask(__name__)
 CORS(app)
 logger = logging.getLogger(__name__)
 
+# Watcher ingestion settings, overridable from the environment.
+INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', 2))
+INGEST_QUEUE_SIZE = int(os.environ.get('INGEST_QUEUE_SIZE', 100))
+INGEST_STABLE_SECONDS = float(os.environ.get('INGEST_STABLE_SECONDS', 2.0))
+INGEST_MAX_RETRIES = int(os.environ.get('INGEST_MAX_RETRIES', 3))
+INGEST_STORAGE = os.environ.get('INGEST_STORAGE', 'wide')
+
+# Connection pool shared by the routes, trip grouping and the watcher's workers.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+DB_POOL_MAX_LIFETIME = float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800))
+DB_POOL_HEALTH_CHECK_AFTER = float(os.environ.get('DB_POOL_HEALTH_CHECK_AFTER', 30))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+
+configure_pool(DB_CONFIG, size=DB_POOL_SIZE, max_lifetime=DB_POOL_MAX_LIFETIME,
+	health_check_after=DB_POOL_HEALTH_CHECK_AFTER, timeout=DB_POOL_TIMEOUT)
+
+ingest_service = None
+
 class LogFileHandler(FileSystemEventHandler):
-	def __init__(self, db_manager_class, db_config):
-		self.db_manager_class = db_manager_class
-		self.db_config = db_config
+	def __init__(self, service):
+		self.service = service
+
+	def _submit(self, path):
+		if is_log_file(os.path.basename(path)):
+			app.logger.info(f"WATCHDOG: New file detected: {path}")
+			self.service.submit(path)
 
 	def on_created(self, event):
-		if not event.is_directory and event.src_path.lower().endswith('.csv'):
-			app.logger.info(f"WATCHDOG: New file detected: {event.src_path}")
-			time.sleep(2)
-			db_manager = self.db_manager_class(self.db_config)
-			try:
-				process_log_file(event.src_path, db_manager)
-			finally:
-				db_manager.close()
+		if not event.is_directory:
+			self._submit(event.src_path)
+
+	def on_moved(self, event):
+		if not event.is_directory:
+			self._submit(event.dest_path)
 
 def start_watcher():
+	global ingest_service
 	path_to_watch = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'logs'))
 	if not os.path.isdir(path_to_watch):
 		os.makedirs(path_to_watch)
+	ingest_service = IngestService(DatabaseManager, DB_CONFIG, workers=INGEST_WORKERS, max_queue=INGEST_QUEUE_SIZE,
+		stable_seconds=INGEST_STABLE_SECONDS, max_retries=INGEST_MAX_RETRIES, storage=INGEST_STORAGE)
+	ingest_service.start()
 	app.logger.info(f"WATCHDOG: Starting file watcher on directory: {path_to_watch}")
-	event_handler = LogFileHandler(DatabaseManager, DB_CONFIG)
+	event_handler = LogFileHandler(ingest_service)
 	observer = Observer()
 	observer.schedule(event_handler, path_to_watch, recursive=False)
 	observer.start()
@@ -54,8 +83,54 @@ def start_watcher():
 		while True: time.sleep(1)
 	except KeyboardInterrupt:
 		observer.stop()
+		ingest_service.stop()
 	observer.join()
 
+@app.before_request
+def start_request_timer():
+	g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+	started = g.pop('request_started', None)
+	if started is not None:
+		labels = dict(endpoint=request.url_rule.rule if request.url_rule else 'unmatched', method=request.method, status=response.status_code)
+		observe = lambda: HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, **labels)
+		if response.is_streamed:
+			# The body is generated after this hook; time the request until it is closed.
+			response.call_on_close(observe)
+		else:
+			observe()
+	return response
+
+def _set_gauges(gauges, values):
+	for key, value in values.items():
+		gauge = gauges.get(key)
+		if gauge is not None:
+			gauge.set(value)
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+	if ingest_service is not None:
+		_set_gauges(INGEST_SERVICE_GAUGES, ingest_service.status())
+	pool = get_pool(DB_CONFIG)
+	if pool is not None:
+		_set_gauges(DB_POOL_GAUGES, pool.stats())
+	return Response(REGISTRY.render_text(), content_type=CONTENT_TYPE)
+
+@app.route('/api/db/pool', methods=['GET'])
+def get_pool_status():
+	pool = get_pool(DB_CONFIG)
+	if pool is None:
+		return jsonify({"pooled": False})
+	return jsonify(dict(pool.stats(), pooled=True))
+
+@app.route('/api/ingest/status', methods=['GET'])
+def get_ingest_status():
+	if ingest_service is None:
+		return jsonify({"running": False})
+	return jsonify(dict(ingest_service.status(), running=True))
+
 @app.route('/api/logs', methods=['GET'])
 def get_logs():
 	db_manager = DatabaseManager(DB_CONFIG)
@@ -66,27 +141,45 @@ def get_logs():
 
 @app.route('/api/logs/<int:log_id>/data', methods=['GET'])
 def get_log_data(log_id):
+	# The rows are streamed as they are read; the response owns the connection from here on.
 	db_manager = DatabaseManager(DB_CONFIG)
 	try:
-		log_data, columns, statistics, _ = db_manager.get_data_for_log(log_id)
 		trip_info = db_manager.fetch_one("SELECT file_name, trip_group_id, distance_miles, trip_duration_seconds FROM log_index li LEFT JOIN trips t ON li.log_id = t.log_id WHERE li.log_id = %s", (log_id,))
 		group_logs = []
 		if trip_info and trip_info.get('trip_group_id'):
 			group_logs = db_manager.get_logs_for_trip_group(trip_info['trip_group_id'])
-
-		return jsonify({
-			"data": log_data, 
-			"columns": columns, 
-			"statistics": statistics,
-			"trip_info": trip_info,
-			"group_logs": group_logs
-		})
+		chunks, columns, statistics, _ = db_manager.stream_data_for_log(log_id)
 	except Exception as e:
+		db_manager.close()
 		app.logger.error(f"Error fetching data for log_id {log_id}: {e}", exc_info=True)
 		return jsonify({"error": "Could not fetch log data"}), 500
-	finally:
+
+	def release():
+		# Idempotent: runs when the body is done and again when the response is closed.
+		close_chunks = getattr(chunks, 'close', None)
+		if close_chunks: close_chunks()
 		db_manager.close()
 
+	def generate():
+		try:
+			yield from iter_json_document({
+				"columns": columns,
+				"statistics": statistics,
+				"trip_info": trip_info,
+				"group_logs": group_logs
+			}, "data", chunks, error_fields={"error": "Could not fetch all log data"})
+		except Exception as e:
+			# Headers are already sent with a 200; the document ends with the "error" field instead.
+			app.logger.error(f"Error streaming data for log_id {log_id}: {e}", exc_info=True)
+		finally:
+			release()
+
+	response = Response(stream_with_context(generate()), content_type='application/json')
+	# A body that is never iterated (HEAD requests, clients gone before the
+	# first chunk) never runs the generator's finally; closing the response does.
+	response.call_on_close(release)
+	return response
+
 @app.route('/api/trip-groups', methods=['GET'])
 def get_trip_groups():
 	db_manager = DatabaseManager(DB_CONFIG)
@@ -123,32 +216,26 @@ def get_trip_group_summary():
 	finally:
 		db_manager.close()
 
+def request_sensitivity():
+	"""The request body's grouping sensitivity (default 3), or None if it is not a valid one."""
+	data = request.get_json(silent=True) or {}
+	return parse_sensitivity(data.get('sensitivity', 3))
+
+def invalid_sensitivity():
+	return jsonify({"error": f"sensitivity must be an integer from {PREVIEW_SENSITIVITIES[0]} to {PREVIEW_SENSITIVITIES[-1]}."}), 400
+
 @app.route('/api/trip-groups/preview', methods=['POST'])
 def preview_trip_groups():
-	data = request.get_json()
-	sensitivity = data.get('sensitivity', 3)
-	groups = group_trips_logic(preview_mode=True, sensitivity=sensitivity)
-	
-	group_counts = {"groups_of_2": 0, "groups_of_3_4": 0, "groups_of_5_plus": 0}
-	total_trips_in_groups = 0
-	for group in groups.values():
-		count = len(group)
-		if count == 2: group_counts["groups_of_2"] += 1
-		elif count in [3, 4]: group_counts["groups_of_3_4"] += 1
-		elif count >= 5: group_counts["groups_of_5_plus"] += 1
-		if count > 1: total_trips_in_groups += count
-
-	summary = {
-		"total_groups": len([g for g in groups.values() if len(g) > 1]),
-		"total_trips_grouped": total_trips_in_groups,
-		"group_counts": group_counts
-	}
-	return jsonify(summary)
+	sensitivity = request_sensitivity()
+	if sensitivity is None:
+		return invalid_sensitivity()
+	return jsonify(preview_group_summary(sensitivity))
 
 @app.route('/api/trips/apply-grouping', methods=['POST'])
 def apply_grouping():
-	data = request.get_json()
-	sensitivity = data.get('sensitivity', 3)
+	sensitivity = request_sensitivity()
+	if sensitivity is None:
+		return invalid_sensitivity()
 	try:
 		group_trips_logic(preview_mode=False, sensitivity=sensitivity)
 		return jsonify({"success": True, "message": f"Successfully applied new grouping with sensitivity {sensitivity}."})
@@ -1,8 +1,13 @@
 # FILE: backend/backfill_states.py
 #
-# --- VERSION 1.3.0 ---
-# - No functional changes are needed in this script. It is designed to work
-#   with the updated `state_detector` and `db_manager` modules.
+# --- VERSION 1.6.0 ---
+# - Rebuilds `pid_state_stats` at the end, since its baselines are grouped
+#   by operating state.
+# - Writes through `db_manager.update_operating_states`, so logs stored in the
+#   narrow `log_rows` layout are backfilled too.
+# - Uses the vectorized `classify_state_labels` so each log is classified in
+#   one NumPy pass instead of a Python loop per row.
+# - FIXED: `get_data_for_log` returns four values; the unpacking now matches.
 # - Running this script will erase the old, simple operating states from your
 #   database and replace them with the new, more intelligent classifications.
 # -----------------------------
@@ -15,7 +20,7 @@ sys.path.append('..')
 
 from config.db_credentials import DB_CONFIG
 from log2db.db_manager import DatabaseManager
-from log2db.state_detector import classify_operating_states
+from log2db.state_detector import classify_state_labels
 from log2db.utils import setup_logging
 
 def backfill():
@@ -45,34 +50,33 @@ def backfill():
 			logger.info(f"Processing log {i+1}/{total_logs} (ID: {log_id})...")
 
 			try:
-				data_rows, pids, _ = db_manager.get_data_for_log(log_id) # We don't need stats here
+				data_rows, pids, _, _ = db_manager.get_data_for_log(log_id) # We don't need stats here
 				if not data_rows:
 					logger.warning(f"  Log ID {log_id} has no data rows. Skipping.")
 					continue
 
-				classified_rows = classify_operating_states(data_rows, pids)
+				if any('data_id' not in row for row in data_rows):
+					logger.error(f"  Rows in log {log_id} are missing 'data_id'. Cannot update.")
+					continue
 
-				updates = []
-				for row in classified_rows:
-					if 'data_id' not in row:
-						logger.error(f"  Row in log {log_id} is missing 'data_id'. Cannot update.")
-						continue
-					updates.append((row['operating_state'], row['data_id']))
+				states = classify_state_labels(data_rows, pids)
+				updates = [(state, row['data_id']) for row, state in zip(data_rows, states)]
 
 				if not updates:
 					logger.warning(f"  No rows to update for log ID {log_id}.")
 					continue
 
-				cursor = db_manager.connection.cursor()
-				update_query = "UPDATE log_data SET operating_state = %s WHERE data_id = %s"
-				cursor.executemany(update_query, updates)
-				db_manager.connection.commit()
-				logger.info(f"  Successfully updated {cursor.rowcount} rows for log ID {log_id}.")
-				cursor.close()
+				updated = db_manager.update_operating_states(log_id, updates)
+				logger.info(f"  Successfully updated {updated} rows for log ID {log_id}.")
 
 			except Exception as e:
 				logger.error(f"  An error occurred processing log ID {log_id}: {e}", exc_info=True)
 
+		# The per-state baselines were aggregated under the old labels.
+		logger.info("Rebuilding per-state PID statistics...")
+		if db_manager.rebuild_pid_state_stats() is None:
+			logger.error("Could not rebuild PID statistics; run scripts/rebuild_pid_state_stats.py.")
+
 	except Exception as e:
 		logger.critical(f"A critical error occurred during the backfill process: {e}", exc_info=True)
 	finally:
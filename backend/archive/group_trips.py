@@ -1,9 +1,18 @@
 # FILE: backend/group_trips.py
 #
-# --- VERSION 1.9.7-ALPHA ---
-# - This is the complete, corrected, and fully implemented file.
-# - It uses the optimized `get_first/last_valid_coord` methods from the
-#   db_manager to ensure high performance.
+# --- VERSION 1.9.10-ALPHA ---
+# - `generate_group_id` folds a coordinate rounded to -0.0 into 0.0, as
+#   `round_endpoints` does, so both give every trip the same group id.
+#
+# --- VERSION 1.9.9-ALPHA ---
+# - Endpoints come from the in-memory `load_endpoint_set`, and group ids are
+#   hashed from its rounded keys, so a preview and the grouping it previews
+#   always match. `preview_group_summary` returns the preview's group counts
+#   without touching log rows or hashing anything.
+# - Reads every log's start and end coordinates from `trips` in one query
+#   (`get_trip_endpoints`); they are stored there at ingest, so grouping no
+#   longer runs two ORDER BY queries on log_data per log. Logs ingested
+#   before that are filled in by migration 0010_trip_endpoints.
 # - It correctly uses `INSERT ... ON DUPLICATE KEY UPDATE` to be safely
 #   re-runnable.
 # -----------------------------
@@ -17,6 +26,7 @@ sys.path.append('..')
 
 from config.db_credentials import DB_CONFIG
 from log2db.db_manager import DatabaseManager
+from log2db.trip_endpoints import load_endpoint_set
 from log2db.utils import setup_logging
 
 def haversine(lon1, lat1, lon2, lat2):
@@ -34,8 +44,9 @@ def haversine(lon1, lat1, lon2, lat2):
 def generate_group_id(lat1, lon1, lat2, lon2, sensitivity=3):
 	if any(v is None for v in [lat1, lon1, lat2, lon2]): return None
 	try:
-		p1 = (round(float(lat1), sensitivity), round(float(lon1), sensitivity))
-		p2 = (round(float(lat2), sensitivity), round(float(lon2), sensitivity))
+		# + 0.0 turns a rounded -0.0 into 0.0: the same place, and the same key as `round_endpoints`.
+		p1 = (round(float(lat1), sensitivity) + 0.0, round(float(lon1), sensitivity) + 0.0)
+		p2 = (round(float(lat2), sensitivity) + 0.0, round(float(lon2), sensitivity) + 0.0)
 		sorted_points = sorted([p1, p2])
 		s = f"{sorted_points[0][0]}:{sorted_points[0][1]}|{sorted_points[1][0]}:{sorted_points[1][1]}"
 		return hashlib.sha256(s.encode()).hexdigest()
@@ -47,52 +58,26 @@ def group_trips_logic(preview_mode=False, sensitivity=3):
 	db_manager = None
 	try:
 		db_manager = DatabaseManager(DB_CONFIG)
-		all_logs = db_manager.get_all_logs()
-		if not all_logs:
-			logger.info("No logs found to process.")
-			return {} if preview_mode else None
-
-		all_cols = db_manager.get_all_defined_columns()
-		lat_pid_info = next((info for name, info in all_cols.items() if 'latitude' in name), None)
-		lon_pid_info = next((info for name, info in all_cols.items() if 'longitude' in name), None)
-
-		if not lat_pid_info or not lon_pid_info:
-			logger.error("Could not find latitude/longitude PIDs.")
+		endpoint_set = load_endpoint_set(db_manager)
+		if not len(endpoint_set):
+			logger.info("No logs with trip endpoints found to process.")
 			return {} if preview_mode else None
-		
-		lat_pid = lat_pid_info['sanitized_name']
-		lon_pid = lon_pid_info['sanitized_name']
-		
-		updates = []
-		groups_preview = {}
-
-		for log in all_logs:
-			log_id = log['log_id']
-			start_coords = db_manager.get_first_valid_coord(log_id, lat_pid, lon_pid)
-			end_coords = db_manager.get_last_valid_coord(log_id, lat_pid, lon_pid)
-
-			if not start_coords or not end_coords: continue
-			
-			start_lat, start_lon = start_coords[lat_pid], start_coords[lon_pid]
-			end_lat, end_lon = end_coords[lat_pid], end_coords[lon_pid]
 
-			group_id = generate_group_id(start_lat, start_lon, end_lat, end_lon, sensitivity)
-			distance = haversine(start_lon, start_lat, end_lon, end_lat)
-
-			if preview_mode:
-				if group_id:
-					if group_id not in groups_preview:
-						groups_preview[group_id] = []
-					groups_preview[group_id].append(log_id)
-			else:
-				updates.append((log_id, start_lat, start_lon, end_lat, end_lon, group_id, distance))
+		log_ids = endpoint_set.log_ids.tolist()
+		group_ids = [generate_group_id(*key, sensitivity) for key in endpoint_set.group_keys(sensitivity).tolist()]
 
 		if preview_mode:
+			groups_preview = {}
+			for log_id, group_id in zip(log_ids, group_ids):
+				if group_id:
+					groups_preview.setdefault(group_id, []).append(log_id)
 			return groups_preview
 
+		updates = [(log_id, group_id, haversine(start_lon, start_lat, end_lon, end_lat))
+			for log_id, group_id, (start_lat, start_lon, end_lat, end_lon) in zip(log_ids, group_ids, endpoint_set.coords.tolist())]
 		if updates:
 			cursor = db_manager.connection.cursor()
-			query = "INSERT INTO trips (log_id, start_lat, start_lon, end_lat, end_lon, trip_group_id, distance_miles) VALUES (%s, %s, %s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE start_lat=VALUES(start_lat), start_lon=VALUES(start_lon), end_lat=VALUES(end_lat), end_lon=VALUES(end_lon), trip_group_id=VALUES(trip_group_id), distance_miles=VALUES(distance_miles)"
+			query = "INSERT INTO trips (log_id, trip_group_id, distance_miles) VALUES (%s, %s, %s) ON DUPLICATE KEY UPDATE trip_group_id=VALUES(trip_group_id), distance_miles=VALUES(distance_miles)"
 			cursor.executemany(query, updates)
 			db_manager.connection.commit()
 			logger.info(f"Successfully inserted/updated trip data for {len(updates)} logs. Rows affected: {cursor.rowcount}")
@@ -101,10 +86,18 @@ def group_trips_logic(preview_mode=False, sensitivity=3):
 		if db_manager:
 			db_manager.close()
 
+def preview_group_summary(sensitivity=3):
+	"""Group counts of a grouping at `sensitivity`, answered from the in-memory endpoint set."""
+	db_manager = DatabaseManager(DB_CONFIG)
+	try:
+		return load_endpoint_set(db_manager).summary(sensitivity)
+	finally:
+		db_manager.close()
+
 def main():
 	setup_logging()
 	logger = logging.getLogger(__name__)
-	logger.info("--- Starting Trip Grouping Process (v1.9.7-ALPHA) ---")
+	logger.info("--- Starting Trip Grouping Process (v1.9.10-ALPHA) ---")
 	group_trips_logic()
 	logger.info("--- Trip Grouping Process Finished ---")
 
@@ -1,8 +1,13 @@
 # FILE: backend/scrub_vehicle_data.py
 #
-# --- VERSION 1.6.1 ---
-# - FIXED: A NameError caused by attempting to use the `json` module
-#   without importing it first. Added `import json`.
+# --- VERSION 1.6.4 ---
+# - The deleted logs are taken out of the `pid_state_stats` baselines first,
+#   and the baselines of removed column definitions are deleted with them.
+# - Clears the `header_signatures` cache table when orphaned column
+#   definitions are removed, so ingestion re-resolves those layouts.
+# - Log data rows are removed with `delete_log_data`, which truncates whole
+#   partitions of a partitioned log_data and otherwise deletes in chunks
+#   instead of one table-locking DELETE.
 # -----------------------------
 
 import logging
@@ -66,12 +71,19 @@ def scrub_data():
 		log_id_list = list(log_ids_to_delete)
 		format_strings = ','.join(['%s'] * len(log_id_list))
 
+		logger.info("Removing the logs from the PID baselines...")
+		if not db_manager.subtract_log_state_stats(log_id_list):
+			logger.error("Could not update the PID baselines; nothing was deleted.")
+			return
+
 		# 3. Perform cascading deletes in the correct order
 		logger.info("Deleting associated trips...")
 		db_manager.execute_query(f"DELETE FROM trips WHERE log_id IN ({format_strings})", tuple(log_id_list))
 		
 		logger.info("Deleting associated log data rows...")
-		db_manager.execute_query(f"DELETE FROM log_data WHERE log_id IN ({format_strings})", tuple(log_id_list))
+		if not db_manager.delete_log_data(log_id_list):
+			logger.error("Could not delete the log data rows; the log index entries were kept.")
+			return
 
 		logger.info("Deleting log index entries...")
 		db_manager.execute_query(f"DELETE FROM log_index WHERE log_id IN ({format_strings})", tuple(log_id_list))
@@ -93,6 +105,9 @@ def scrub_data():
 			logger.info(f"Found {len(orphaned_ids)} orphaned column definitions to remove.")
 			format_strings = ','.join(['%s'] * len(orphaned_ids))
 			db_manager.execute_query(f"DELETE FROM column_definitions WHERE column_id IN ({format_strings})", tuple(orphaned_ids))
+			db_manager.execute_query(f"DELETE FROM pid_state_stats WHERE column_id IN ({format_strings})", tuple(orphaned_ids))
+			# Cached header layouts may point at the removed definitions.
+			db_manager.execute_query("DELETE FROM header_signatures")
 		else:
 			logger.info("No orphaned column definitions found.")
 
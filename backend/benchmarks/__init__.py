@@ -0,0 +1,4 @@
+# FILE: backend/benchmarks/__init__.py
+#
+# Ingestion benchmarks. Run from the `backend` directory, e.g.:
+#   python -m benchmarks.bench_writers --rows 200000
@@ -0,0 +1,174 @@
+# FILE: backend/benchmarks/bench_ingest.py
+#
+# --- VERSION 1.0.0 ---
+# - End-to-end ingest benchmark on a synthetic corpus (see `synthetic.py`).
+#   Each stage runs in a fresh process so its peak RSS is its own:
+#     hash      SHA-256 of every file (the manifest check)
+#     parse     preamble + CSV rows
+#     classify  parse + operating-state classification
+#     convert   classify + typed insert tuples
+#     ingest    the full `process_log_file` path
+# - `--db memory` ingests into `MemoryDatabaseManager` (no server needed);
+#   `--db mysql` uses the configured database and removes its logs afterwards.
+# - Results are printed and written as JSON; `--baseline` compares against an
+#   earlier results file.
+# -----------------------------
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import resource
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log2db.core import OffsetLineReader, iter_data_rows, iter_batches, build_insert_tuples, process_log_file
+from log2db.preamble import read_preamble
+from log2db.manifest import hash_file
+from log2db.state_detector import classify_operating_states
+from log2db.utils import value_converter
+from log2db.writers import WRITERS, DEFAULT_WRITER, STORAGE_LAYOUTS, STORAGE_WIDE
+from benchmarks.synthetic import write_corpus
+from benchmarks.memory_db import MemoryDatabaseManager
+
+STAGES = ('hash', 'parse', 'classify', 'convert', 'ingest')
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def iter_file_batches(file_path):
+    with open(file_path, 'rb') as raw:
+        lines = OffsetLineReader(raw)
+        preamble = read_preamble(lines, os.path.basename(file_path))
+        for batch in iter_batches(iter_data_rows(lines, preamble.headers, preamble.dialect)):
+            yield preamble, batch
+
+def run_pass(file_paths, stage):
+    rows = 0
+    for file_path in file_paths:
+        if stage == 'hash':
+            hash_file(file_path)
+            continue
+        converters = None
+        for preamble, batch in iter_file_batches(file_path):
+            if stage in ('classify', 'convert'):
+                batch = classify_operating_states(batch, preamble.headers)
+            if stage == 'convert':
+                if converters is None:
+                    converters = [(h, value_converter('FLOAT')) for h in preamble.headers]
+                build_insert_tuples(1, batch, dict.fromkeys(preamble.headers), preamble.start_timestamp, converters)
+            rows += len(batch)
+    return rows
+
+def run_ingest(file_paths, db, writer, storage):
+    if db == 'memory':
+        db_manager = MemoryDatabaseManager()
+    else:
+        from config.db_credentials import DB_CONFIG
+        from log2db.db_manager import DatabaseManager
+        db_manager = DatabaseManager(DB_CONFIG, allow_local_infile=True)
+        db_manager.ensure_base_tables_exist()
+    try:
+        failed = [p for p in file_paths if not process_log_file(p, db_manager, writer=writer, storage=storage)[0]]
+        rows = sum(db_manager.count_log_rows(e['log_id']) for e in db_manager.get_ingest_manifest() if e['file_name'] in {os.path.basename(p) for p in file_paths} and e['log_id'])
+        if db != 'memory':
+            for p in file_paths:
+                file_name = os.path.basename(p)
+                db_manager.delete_log_for_file(file_name)
+                db_manager.execute_query("DELETE FROM ingest_manifest WHERE file_name = %s", (file_name,))
+        return rows, failed
+    finally:
+        db_manager.close()
+
+def run_stage(stage, file_paths, total_bytes, db, writer, storage):
+    """Runs in a child process; returns the stage's result row."""
+    logging.disable(logging.CRITICAL)
+    failed = []
+    started = time.perf_counter()
+    if stage == 'ingest':
+        rows, failed = run_ingest(file_paths, db, writer, storage)
+    else:
+        rows = run_pass(file_paths, stage)
+    elapsed = time.perf_counter() - started
+    return {
+        'stage': stage,
+        'seconds': round(elapsed, 3),
+        'rows': rows,
+        'rows_per_sec': round(rows / elapsed, 1) if rows and elapsed > 0 else None,
+        'mb_per_sec': round(total_bytes / 1048576 / elapsed, 2) if elapsed > 0 else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'failed_files': len(failed),
+    }
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {s['stage']: s for s in json.load(f)['stages']}
+    print(f"Compared with {baseline_path}:")
+    for s in results['stages']:
+        old = baseline.get(s['stage'])
+        if old and old.get('mb_per_sec') and s.get('mb_per_sec'):
+            change = (s['mb_per_sec'] / old['mb_per_sec'] - 1) * 100
+            print(f"  {s['stage']:<10}{old['mb_per_sec']:>10} -> {s['mb_per_sec']:<10} MB/sec ({change:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark log2db ingestion on synthetic OBD2 logs.")
+    parser.add_argument('--files', type=int, default=4, help="Synthetic logs to generate (default: 4).")
+    parser.add_argument('--hours', type=float, default=2.0, help="Duration of each log in hours (default: 2).")
+    parser.add_argument('--hz', type=float, default=2.0, help="Rows per second of drive time (default: 2).")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--db', choices=('memory', 'mysql'), default='memory', help="Target for the ingest stage (default: memory).")
+    parser.add_argument('--writer', choices=sorted(WRITERS), default=DEFAULT_WRITER)
+    parser.add_argument('--storage', choices=STORAGE_LAYOUTS, default=STORAGE_WIDE)
+    parser.add_argument('--label', default='', help="Free-form label stored with the results, e.g. a version or commit.")
+    parser.add_argument('--output', default='bench_ingest.json', help="Where to write the JSON results (default: bench_ingest.json).")
+    parser.add_argument('--baseline', help="Earlier results file to compare against.")
+    args = parser.parse_args()
+
+    corpus_dir = tempfile.mkdtemp(prefix='log2db_bench_')
+    try:
+        prefix = f"__bench_{int(time.time())}"
+        corpus = write_corpus(corpus_dir, args.files, args.hours, args.hz, prefix=prefix)
+        file_paths = [path for path, _, _ in corpus]
+        total_bytes = sum(size for _, _, size in corpus)
+
+        stages = []
+        context = multiprocessing.get_context('spawn')
+        for stage in args.stages:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                stages.append(pool.submit(run_stage, stage, file_paths, total_bytes, args.db, args.writer, args.storage).result())
+    finally:
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    results = {
+        'label': args.label,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'db': args.db, 'writer': args.writer, 'storage': args.storage},
+        'corpus': {'files': len(corpus), 'rows': sum(rows for _, rows, _ in corpus), 'bytes': total_bytes, 'hours_per_file': args.hours, 'hz': args.hz},
+        'stages': stages,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print("-" * 72)
+    print(f"{'stage':<10}{'seconds':>10}{'rows':>10}{'rows/sec':>12}{'MB/sec':>10}{'peak RSS MB':>14}")
+    for s in stages:
+        rate = s['rows_per_sec'] if s['rows_per_sec'] is not None else '-'
+        print(f"{s['stage']:<10}{s['seconds']:>10}{s['rows']:>10}{rate:>12}{s['mb_per_sec']:>10}{s['peak_rss_mb']:>14}{'  FAILED FILES: ' + str(s['failed_files']) if s['failed_files'] else ''}")
+    print("-" * 72)
+    print(f"Results written to {args.output}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+if __name__ == '__main__':
+    main()
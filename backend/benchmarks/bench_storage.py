@@ -0,0 +1,79 @@
+# FILE: backend/benchmarks/bench_storage.py
+#
+# --- VERSION 1.0.0 ---
+# - Compares the wide (`log_data`) and narrow (`log_rows`/`log_samples`)
+#   storage layouts: on-disk size per stored row from information_schema, and
+#   `get_data_for_log` read latency for a sample of logs in each layout.
+# - Read-only; convert a few logs with scripts/convert_log_storage.py first to
+#   get narrow numbers.
+# -----------------------------
+
+import os
+import sys
+import time
+import logging
+import argparse
+import statistics
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.db_credentials import DB_CONFIG
+from log2db.db_manager import DatabaseManager
+from log2db.writers import STORAGE_LAYOUTS
+
+TABLES_BY_LAYOUT = {'wide': ('log_data',), 'narrow': ('log_rows', 'log_samples')}
+ROW_TABLE_BY_LAYOUT = {'wide': 'log_data', 'narrow': 'log_rows'}
+
+def table_sizes(db_manager, layout):
+    tables = TABLES_BY_LAYOUT[layout]
+    format_strings = ','.join(['%s'] * len(tables))
+    query = f"SELECT COALESCE(SUM(data_length), 0) AS data_bytes, COALESCE(SUM(index_length), 0) AS index_bytes FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name IN ({format_strings})"
+    sizes = db_manager.fetch_one(query, tables)
+    rows = db_manager.fetch_one(f"SELECT COUNT(*) AS n FROM {ROW_TABLE_BY_LAYOUT[layout]}")['n']
+    total = int(sizes['data_bytes']) + int(sizes['index_bytes'])
+    return {'layout': layout, 'rows': rows, 'data_mb': int(sizes['data_bytes']) / 1048576, 'index_mb': int(sizes['index_bytes']) / 1048576, 'bytes_per_row': total / rows if rows else 0.0}
+
+def read_latency(db_manager, layout, sample, repeats):
+    logs = db_manager.fetch_all("SELECT log_id FROM log_index WHERE storage_layout = %s ORDER BY log_id DESC LIMIT %s", (layout, sample))
+    timings = []
+    for log in logs:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            db_manager.get_data_for_log(log['log_id'])
+            timings.append(time.perf_counter() - started)
+    if not timings:
+        return {'layout': layout, 'logs': 0, 'median_ms': None, 'max_ms': None}
+    return {'layout': layout, 'logs': len(logs), 'median_ms': statistics.median(timings) * 1000, 'max_ms': max(timings) * 1000}
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare wide and narrow log storage.")
+    parser.add_argument('--sample', type=int, default=5, help="Logs per layout to read (default: 5).")
+    parser.add_argument('--repeats', type=int, default=3, help="Reads per log (default: 3).")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    db_manager = DatabaseManager(DB_CONFIG)
+    try:
+        # information_schema sizes are cached by InnoDB; refresh them first.
+        for tables in TABLES_BY_LAYOUT.values():
+            db_manager.fetch_all(f"ANALYZE TABLE {', '.join(tables)}")
+        sizes = [table_sizes(db_manager, layout) for layout in STORAGE_LAYOUTS]
+        reads = [read_latency(db_manager, layout, args.sample, args.repeats) for layout in STORAGE_LAYOUTS]
+    finally:
+        db_manager.close()
+
+    print("-" * 60)
+    print(f"{'layout':<8}{'rows':>12}{'data MB':>10}{'index MB':>10}{'bytes/row':>12}")
+    for s in sizes:
+        print(f"{s['layout']:<8}{s['rows']:>12}{s['data_mb']:>10.1f}{s['index_mb']:>10.1f}{s['bytes_per_row']:>12.1f}")
+    print("-" * 60)
+    print(f"{'layout':<8}{'logs':>6}{'median ms':>12}{'max ms':>10}")
+    for r in reads:
+        if r['median_ms'] is None:
+            print(f"{r['layout']:<8}{0:>6}{'-':>12}{'-':>10}")
+        else:
+            print(f"{r['layout']:<8}{r['logs']:>6}{r['median_ms']:>12.1f}{r['max_ms']:>10.1f}")
+    print("-" * 60)
+
+if __name__ == '__main__':
+    main()
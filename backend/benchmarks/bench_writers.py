@@ -0,0 +1,74 @@
+# FILE: backend/benchmarks/bench_writers.py
+#
+# --- VERSION 1.0.0 ---
+# - Compares rows/sec for the `log_data` writers in `log2db.writers`.
+# - Each run indexes a throwaway log, writes synthetic rows through the writer
+#   and deletes the log again (log_data rows go with it via ON DELETE CASCADE).
+# -----------------------------
+
+import os
+import sys
+import time
+import json
+import random
+import logging
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.db_credentials import DB_CONFIG
+from log2db.db_manager import DatabaseManager
+from log2db.core import BATCH_SIZE, iter_batches
+from log2db.writers import WRITERS, get_writer
+
+def pick_float_columns(db_manager, count):
+    """Uses existing FLOAT columns so the benchmark never alters the schema."""
+    columns = [c for c in db_manager.get_all_defined_columns().values() if c['mysql_data_type'] == 'FLOAT']
+    return {c['column_name']: c['sanitized_name'] for c in columns[:count]}
+
+def synthetic_tuples(log_id, row_count, column_count, start_timestamp):
+    rnd = random.Random(42)
+    for i in range(row_count):
+        values = tuple(f"{rnd.uniform(0, 5000):.2f}" for _ in range(column_count))
+        yield (log_id, start_timestamp + i // 3, 'Closed Loop (City)') + values
+
+def run_writer(db_manager, writer_name, column_map, row_count):
+    file_name = f"__bench_{writer_name}_{int(time.time() * 1000)}.csv"
+    log_id = db_manager.insert_log_index(file_name, int(time.time()), 0.0, json.dumps([]))
+    try:
+        writer = get_writer(writer_name, db_manager, log_id, column_map)
+        started = time.perf_counter()
+        for batch in iter_batches(synthetic_tuples(log_id, row_count, len(column_map), int(time.time())), BATCH_SIZE):
+            writer.write(batch)
+        ok = writer.finish()
+        elapsed = time.perf_counter() - started
+        return {'writer': writer.name, 'rows': row_count, 'seconds': round(elapsed, 3), 'rows_per_sec': round(row_count / elapsed, 1), 'ok': ok}
+    finally:
+        db_manager.execute_query("DELETE FROM log_index WHERE log_id = %s", (log_id,))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the log_data bulk writers.")
+    parser.add_argument('--rows', type=int, default=100000, help="Rows written per writer (default: 100000).")
+    parser.add_argument('--columns', type=int, default=20, help="Number of existing FLOAT PID columns to fill (default: 20).")
+    parser.add_argument('--writers', nargs='+', choices=sorted(WRITERS), default=sorted(WRITERS))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    db_manager = DatabaseManager(DB_CONFIG, allow_local_infile=True)
+    try:
+        column_map = pick_float_columns(db_manager, args.columns)
+        if not column_map:
+            print("No FLOAT columns defined yet. Ingest at least one log before benchmarking.")
+            sys.exit(1)
+        results = [run_writer(db_manager, name, column_map, args.rows) for name in args.writers]
+    finally:
+        db_manager.close()
+
+    print("-" * 50)
+    print(f"{'writer':<14}{'rows':>10}{'seconds':>10}{'rows/sec':>14}")
+    for r in results:
+        print(f"{r['writer']:<14}{r['rows']:>10}{r['seconds']:>10}{r['rows_per_sec']:>14}{'' if r['ok'] else '  FAILED'}")
+    print("-" * 50)
+
+if __name__ == '__main__':
+    main()
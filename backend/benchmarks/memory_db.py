@@ -0,0 +1,132 @@
+# FILE: backend/benchmarks/memory_db.py
+#
+# --- VERSION 1.0.0 ---
+# - In-memory stand-in for `DatabaseManager`, covering just the calls made by
+#   `process_log_file`. Rows are counted, not kept, so a benchmark against it
+#   measures log2db's own parsing and conversion cost with no server involved.
+# -----------------------------
+
+import threading
+from contextlib import contextmanager
+
+from log2db.utils import sanitize_column_name
+from log2db.writers import STORAGE_WIDE
+from log2db.state_stats import merge_aggregates
+
+class MemoryDatabaseManager:
+    def __init__(self, db_config=None, allow_local_infile=False):
+        self.columns = {}
+        self.logs = {}
+        self.manifest = {}
+        self.file_metadata = {}
+        self.trip_endpoints = {}
+        self.state_stats = {}
+        self.signatures = {}
+        self.row_counts = {}
+        self.sample_count = 0
+        self._lock = threading.Lock()
+
+    def close(self):
+        pass
+
+    def ensure_base_tables_exist(self):
+        pass
+
+    @contextmanager
+    def named_lock(self, lock_name, timeout=60):
+        with self._lock:
+            yield True
+
+    def get_all_defined_columns(self, refresh=False):
+        return {name: dict(c) for name, c in self.columns.items()}
+
+    def add_new_columns(self, new_columns, add_to_log_data=True):
+        added = {}
+        for name, mysql_type in new_columns:
+            self.columns[name] = {'column_id': len(self.columns) + 1, 'column_name': name, 'sanitized_name': sanitize_column_name(name),
+                                  'mysql_data_type': mysql_type, 'wide_column': 1 if add_to_log_data else 0}
+            added[name] = dict(self.columns[name])
+        return added
+
+    def add_log_data_columns(self, definitions):
+        for d in definitions:
+            self.columns[d['column_name']]['wide_column'] = 1
+            d['wide_column'] = 1
+        return True
+
+    def get_header_signatures(self):
+        return list(self.signatures.values())
+
+    def save_header_signature(self, signature, headers_json, columns_json):
+        self.signatures[signature] = {'signature': signature, 'headers_json': headers_json, 'columns_json': columns_json}
+
+    def get_ingest_manifest(self, file_name=None, content_hash=None):
+        rows = list(self.manifest.values())
+        if file_name is None and content_hash is None:
+            return rows
+        return [r for r in rows if r['file_name'] == file_name or r['content_hash'] == content_hash]
+
+    def upsert_manifest_entry(self, file_name, file_size, file_mtime, content_hash, status, log_id=None):
+        entry = self.manifest.setdefault(file_name, {'rows_committed': 0, 'byte_offset': 0})
+        entry.update(file_name=file_name, file_size=file_size, file_mtime=file_mtime, content_hash=content_hash, status=status, log_id=log_id)
+
+    def save_file_metadata(self, content_hash, file_name, log_id, start_time, last_time_offset, trip_distance, header_signature, row_count, byte_size):
+        self.file_metadata[content_hash] = {'file_name': file_name, 'log_id': log_id, 'start_time': start_time, 'last_time_offset': last_time_offset,
+                                            'trip_distance': trip_distance, 'header_signature': header_signature, 'row_count': row_count, 'byte_size': byte_size}
+
+    def save_trip_endpoints(self, log_id, start, end):
+        self.trip_endpoints[log_id] = (start, end)
+        return True
+
+    def refresh_trip_endpoints(self, log_ids=None):
+        # Rows are not kept, so a resumed log keeps whatever it had.
+        return True
+
+    def delete_log_for_file(self, file_name):
+        for log_id in [i for i, log in self.logs.items() if log['file_name'] == file_name]:
+            del self.logs[log_id]
+            self.row_counts.pop(log_id, None)
+            self.trip_endpoints.pop(log_id, None)
+        if file_name in self.manifest:
+            self.manifest[file_name].update(rows_committed=0, byte_offset=0)
+
+    def is_file_processed(self, file_name):
+        return any(log['file_name'] == file_name for log in self.logs.values())
+
+    def insert_log_index(self, file_name, start_timestamp, duration, column_ids_json, storage_layout=STORAGE_WIDE):
+        log_id = len(self.logs) + 1
+        self.logs[log_id] = {'file_name': file_name, 'start_timestamp': start_timestamp, 'trip_duration_seconds': duration, 'storage_layout': storage_layout}
+        return log_id
+
+    def update_log_duration(self, log_id, duration):
+        self.logs[log_id]['trip_duration_seconds'] = duration
+
+    def get_storage_layout(self, log_id):
+        return self.logs[log_id]['storage_layout'] if log_id in self.logs else None
+
+    def count_log_rows(self, log_id):
+        return self.row_counts.get(log_id, 0)
+
+    def merge_pid_state_stats(self, aggregates):
+        for column_id, state, count, mean, m2 in aggregates or ():
+            key = (column_id, state)
+            self.state_stats[key] = merge_aggregates(self.state_stats[key], (count, mean, m2)) if key in self.state_stats else (count, mean, m2)
+        return True
+
+    def _commit(self, log_id, rows, checkpoint):
+        self.row_counts[log_id] = self.row_counts.get(log_id, 0) + rows
+        if checkpoint:
+            self.merge_pid_state_stats(checkpoint.state_stats)
+            self.manifest[checkpoint.file_name].update(rows_committed=checkpoint.rows_committed, byte_offset=checkpoint.byte_offset)
+            self.logs[log_id]['trip_duration_seconds'] = checkpoint.duration
+        return True
+
+    def insert_log_data_tuples(self, log_id, column_map, insert_tuples, checkpoint=None):
+        return self._commit(log_id, len(insert_tuples), checkpoint)
+
+    def insert_narrow_rows(self, log_id, row_tuples, sample_tuples, checkpoint=None):
+        self.sample_count += len(sample_tuples)
+        return self._commit(log_id, len(row_tuples), checkpoint)
+
+    def supports_local_infile(self):
+        return False
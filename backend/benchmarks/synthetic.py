@@ -0,0 +1,154 @@
+# FILE: backend/benchmarks/synthetic.py
+#
+# --- VERSION 1.0.0 ---
+# - Generates synthetic OBD2 CSV logs shaped like the real ones: a comment
+#   preamble with a `# StartTime` line in each of the accepted formats,
+#   unit-suffixed headers, a GPS track and a plausible drive cycle.
+# - Consecutive files drift in schema: each layout drops some optional PIDs
+#   and adds others, so the benchmark exercises column creation and the
+#   header-signature cache the way a real log folder does.
+# - Usage: python benchmarks/synthetic.py OUT_DIR --files 10 --hours 2
+# -----------------------------
+
+import os
+import math
+import random
+import argparse
+from datetime import datetime, timedelta
+
+# (header, generator name). Every file carries these.
+CORE_PIDS = [
+    ('Engine RPM (rpm)', 'rpm'),
+    ('GPS Speed (mph)', 'speed'),
+    ('Calculated load value (%)', 'load'),
+    ('Engine coolant temperature (°F)', 'coolant'),
+    ('Fuel System 1 Status', 'fuel_status'),
+    ('Latitude', 'lat'),
+    ('Longitude', 'lon'),
+]
+
+# Files pick a rotating subset of these, which is the schema drift.
+OPTIONAL_PIDS = [
+    ('Intake air temperature (°F)', 'intake_temp'),
+    ('Throttle position (%)', 'throttle'),
+    ('Mass air flow rate (g/s)', 'maf'),
+    ('Short term fuel % trim - Bank 1 (%)', 'stft'),
+    ('Long term fuel % trim - Bank 1 (%)', 'ltft'),
+    ('Vehicle speed (mph)', 'obd_speed'),
+    ('Altitude (ft)', 'altitude'),
+    ('Battery voltage (V)', 'voltage'),
+    ('Trip Distance (miles)', 'distance'),
+    ('Transmission Temperature (°F)', 'trans_temp'),
+]
+
+# One entry per StartTime format in `log2db.utils.TIMESTAMP_FORMATS`, with the
+# label/separator variants the StartTime regex accepts.
+START_TIME_STYLES = [
+    ('# StartTime = ', '%m/%d/%Y %I:%M:%S.%f %p'),
+    ('# Start Time: ', '%m/%d/%Y %I:%M:%S %p'),
+    ('#StartTime=', '%Y-%m-%d %H:%M:%S'),
+]
+
+def layout_for(index, optional_count=6):
+    """Header list for the `index`-th file; neighbouring files share most PIDs."""
+    start = index % len(OPTIONAL_PIDS)
+    optional = [OPTIONAL_PIDS[(start + i) % len(OPTIONAL_PIDS)] for i in range(optional_count)]
+    return [('Time (sec)', 'time')] + CORE_PIDS + optional
+
+def format_start_time(style, start):
+    prefix, fmt = style
+    return prefix + start.strftime(fmt)
+
+class DriveSimulator:
+    """A simple warm-up / city / highway cycle with a GPS track to match."""
+
+    def __init__(self, rnd, lat=44.97, lon=-93.26):
+        self.rnd = rnd
+        self.lat = lat
+        self.lon = lon
+        self.heading = rnd.uniform(0, 2 * math.pi)
+        self.coolant = rnd.uniform(60, 90)
+        self.speed = 0.0
+        self.distance = 0.0
+        self.altitude = rnd.uniform(700, 1100)
+
+    def step(self, t, dt):
+        phase = (t / 600.0) % 3
+        target = 0.0 if t < 30 else 28.0 if phase < 1 else 67.0 if phase < 2 else 40.0
+        self.speed = max(0.0, self.speed + (target - self.speed) * 0.05 + self.rnd.gauss(0, 0.8))
+        self.coolant = min(200.0, self.coolant + 0.08 * dt)
+        self.heading += self.rnd.gauss(0, 0.02)
+        miles = self.speed * dt / 3600.0
+        self.distance += miles
+        self.lat += miles / 69.0 * math.cos(self.heading)
+        self.lon += miles / (69.0 * math.cos(math.radians(self.lat))) * math.sin(self.heading)
+        self.altitude += self.rnd.gauss(0, 0.5)
+        engine_on = t >= 5
+        rpm = 0 if not engine_on else 700 + self.speed * 32 + self.rnd.gauss(0, 40)
+        load = 0 if not engine_on else min(100.0, 18 + self.speed * 0.6 + self.rnd.gauss(0, 4))
+        return {
+            'time': f"{t:.3f}",
+            'rpm': f"{max(rpm, 0):.0f}",
+            'speed': f"{self.speed:.1f}",
+            'load': f"{max(load, 0):.1f}",
+            'coolant': f"{self.coolant:.0f}",
+            'fuel_status': '1' if self.coolant < 160 else '2',
+            'lat': f"{self.lat:.6f}",
+            'lon': f"{self.lon:.6f}",
+            'intake_temp': f"{70 + self.rnd.gauss(0, 2):.0f}",
+            'throttle': f"{min(100.0, 12 + self.speed * 0.4):.1f}",
+            'maf': f"{rpm / 180.0:.2f}",
+            'stft': f"{self.rnd.gauss(0, 2):.1f}",
+            'ltft': f"{self.rnd.gauss(1, 0.5):.1f}",
+            'obd_speed': f"{self.speed:.0f}",
+            'altitude': f"{self.altitude:.0f}",
+            'voltage': f"{14.1 + self.rnd.gauss(0, 0.1):.2f}",
+            'distance': f"{self.distance:.3f}",
+            'trans_temp': f"{min(190.0, self.coolant - 5):.0f}",
+        }
+
+def write_log(path, index=0, hours=1.0, sample_hz=1.0, seed=None, start=None, gap_rate=0.01):
+    """
+    Writes one synthetic log and returns (rows, bytes). `gap_rate` is the share
+    of cells left empty, as loggers do for PIDs that missed a poll.
+    """
+    rnd = random.Random(seed if seed is not None else index)
+    start = start or datetime(2025, 3, 14, 8, 15, 30, 250000) + timedelta(days=index)
+    layout = layout_for(index)
+    sim = DriveSimulator(rnd)
+    dt = 1.0 / sample_hz
+    rows = int(hours * 3600 * sample_hz)
+
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write('\ufeff# CSV Log\n')
+        f.write(format_start_time(START_TIME_STYLES[index % len(START_TIME_STYLES)], start) + '\n')
+        f.write(','.join(header for header, _ in layout) + '\n')
+        for i in range(rows):
+            values = sim.step(i * dt, dt)
+            cells = [values[key] if key == 'time' or rnd.random() >= gap_rate else '' for _, key in layout]
+            f.write(','.join(cells) + '\n')
+    return rows, os.path.getsize(path)
+
+def write_corpus(out_dir, files=5, hours=1.0, sample_hz=1.0, prefix='synthetic'):
+    """Writes `files` logs into `out_dir` and returns [(path, rows, bytes)]."""
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for index in range(files):
+        path = os.path.join(out_dir, f"{prefix}_{index:03d}.csv")
+        rows, size = write_log(path, index=index, hours=hours, sample_hz=sample_hz)
+        written.append((path, rows, size))
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic OBD2 CSV logs.")
+    parser.add_argument('out_dir')
+    parser.add_argument('--files', type=int, default=5, help="Number of logs (default: 5).")
+    parser.add_argument('--hours', type=float, default=1.0, help="Duration of each log in hours (default: 1).")
+    parser.add_argument('--hz', type=float, default=1.0, help="Rows per second of drive time (default: 1).")
+    args = parser.parse_args()
+
+    for path, rows, size in write_corpus(args.out_dir, args.files, args.hours, args.hz):
+        print(f"{path}: {rows} rows, {size / 1048576:.1f} MB")
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,10 @@
 
 import os
 import sys
+import time
 import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -11,12 +14,67 @@ try:
     from log2db.utils import setup_logging
     from log2db.db_manager import DatabaseManager
     from log2db.core import process_log_file
+    from log2db.writers import WRITERS, DEFAULT_WRITER, LoadDataWriter, STORAGE_LAYOUTS, STORAGE_WIDE
+    from log2db.manifest import IngestManifest
+    from log2db.sources import is_log_file, iter_log_sources
 except ImportError as e:
     print(f"FATAL: A required file or module could not be imported: {e}", file=sys.stderr)
     sys.exit(1)
 
+# Each worker process keeps its own connection for the lifetime of the pool.
+_worker_db_manager = None
+_worker_writer = DEFAULT_WRITER
+_worker_storage = STORAGE_WIDE
+
+def _init_worker(db_config, writer, storage=STORAGE_WIDE):
+    global _worker_db_manager, _worker_writer, _worker_storage
+    if not logging.getLogger().handlers:
+        setup_logging()
+    _worker_db_manager = DatabaseManager(db_config, allow_local_infile=(writer == LoadDataWriter.name))
+    _worker_writer = writer
+    _worker_storage = storage
+
+def _process_in_worker(source):
+    try:
+        return process_log_file(source, _worker_db_manager, writer=_worker_writer, storage=_worker_storage)
+    except Exception as e:
+        logging.error(f"Unhandled error while processing '{source.name}': {e}", exc_info=True)
+        return False, "error"
+
+def _tally(counts, size, success, status):
+    """Counts one result; `size` is the file size from the fingerprint taken before it was processed."""
+    if success:
+        if status == "processed":
+            counts['processed'] += 1
+            counts['bytes'] += size
+        else:
+            counts['skipped'] += 1
+    else:
+        counts['errors'] += 1
+
+def run_serial(sources, db_manager, counts, writer=DEFAULT_WRITER, manifest=None, storage=STORAGE_WIDE):
+    for source, size in sources:
+        success, status = process_log_file(source, db_manager, writer=writer, manifest=manifest, storage=storage)
+        _tally(counts, size, success, status)
+
+def run_parallel(sources, workers, counts, writer=DEFAULT_WRITER, storage=STORAGE_WIDE):
+    logging.info(f"Starting {workers} ingest workers.")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(DB_CONFIG, writer, storage)) as pool:
+        futures = {pool.submit(_process_in_worker, source): size for source, size in sources}
+        for future in as_completed(futures):
+            success, status = future.result()
+            _tally(counts, futures[future], success, status)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m log2db", description="Ingest CSV logs from the 'logs' directory.")
+    parser.add_argument('--workers', '-w', type=int, default=1, help="Number of worker processes, each with its own database connection (default: 1).")
+    parser.add_argument('--writer', choices=sorted(WRITERS), default=DEFAULT_WRITER, help=f"How rows are written to log_data (default: {DEFAULT_WRITER}).")
+    parser.add_argument('--storage', choices=STORAGE_LAYOUTS, default=STORAGE_WIDE, help="Store new logs in the wide log_data table or the long-format log_rows/log_samples tables (default: wide).")
+    return parser.parse_args(argv)
+
 def main():
     """Main function to run the log processing."""
+    args = parse_args()
     logger = setup_logging()
     logger.info("==================================================")
     logger.info("      Jeep Log Processing Tool v0.8.6 Started     ")
@@ -24,7 +82,7 @@ def main():
 
     db_manager = None
     try:
-        db_manager = DatabaseManager(DB_CONFIG)
+        db_manager = DatabaseManager(DB_CONFIG, allow_local_infile=(args.writer == LoadDataWriter.name))
         db_manager.ensure_base_tables_exist()
 
         log_directory = 'logs'
@@ -32,28 +90,49 @@ def main():
             logger.critical(f"Log directory '{log_directory}' not found.")
             sys.exit(1)
 
-        log_files = sorted([f for f in os.listdir(log_directory) if f.lower().endswith('.csv')])
+        log_files = sorted([f for f in os.listdir(log_directory) if is_log_file(f)])
         if not log_files:
-            logger.warning("No CSV files found in the 'logs' directory.")
+            logger.warning("No CSV files (.csv, .csv.gz, .csv.zst or .zip) found in the 'logs' directory.")
             return
 
-        logger.info(f"Found {len(log_files)} CSV files to process in '{log_directory}'.")
-        
-        success_count, skipped_count, error_count = 0, 0, 0
+        sources = [source for f in log_files for source in iter_log_sources(os.path.join(log_directory, f))]
+        logger.info(f"Found {len(sources)} CSV logs in {len(log_files)} files to process in '{log_directory}'.")
+        counts = {'processed': 0, 'skipped': 0, 'errors': 0, 'bytes': 0}
+        started = time.monotonic()
 
-        for file_name in log_files:
-            file_path = os.path.join(log_directory, file_name)
-            success, status = process_log_file(file_path, db_manager)
-            if success:
-                if status == "processed": success_count += 1
-                else: skipped_count += 1
+        manifest = IngestManifest.load(db_manager)
+        pending = []
+        for source in sources:
+            try:
+                fingerprint = source.fingerprint()
+            except OSError as e:
+                logger.error(f"Could not read '{source.name}': {e}")
+                counts['errors'] += 1
+                continue
+            if manifest.is_unchanged(source.name, fingerprint):
+                counts['skipped'] += 1
             else:
-                error_count += 1
-        
+                # (source, size): the throughput figures never stat the file again.
+                pending.append((source, fingerprint[0]))
+        logger.info(f"{counts['skipped']} logs unchanged since their last ingest; {len(pending)} to check.")
+
+        if args.workers > 1:
+            db_manager.close()
+            db_manager = None
+            run_parallel(pending, args.workers, counts, writer=args.writer, storage=args.storage)
+        else:
+            run_serial(pending, db_manager, counts, writer=args.writer, manifest=manifest, storage=args.storage)
+
+        elapsed = time.monotonic() - started
+        files_per_sec = counts['processed'] / elapsed if elapsed > 0 else 0.0
+        mb_per_sec = counts['bytes'] / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+
         logger.info("----------------- JOB COMPLETE -----------------")
-        logger.info(f"Successfully Processed: {success_count}")
-        logger.info(f"Skipped (already done): {skipped_count}")
-        logger.info(f"Errors: {error_count}")
+        logger.info(f"Successfully Processed: {counts['processed']}")
+        logger.info(f"Skipped (already done): {counts['skipped']}")
+        logger.info(f"Errors: {counts['errors']}")
+        logger.info(f"Elapsed: {elapsed:.1f}s with {max(args.workers, 1)} worker(s)")
+        logger.info(f"Throughput: {files_per_sec:.2f} files/sec, {mb_per_sec:.2f} MB/sec")
         logger.info("--------------------------------------------------")
 
     except Exception as e:
@@ -1,114 +1,505 @@
 # FILE: backend/log2db/core.py
 #
-# --- VERSION 1.2.0 ---
-# - Now imports and uses the `classify_operating_states` function from the
-#   new `state_detector` module to add context to each data row before ingestion.
+# --- VERSION 1.7.1 ---
+# - The trip distance recorded in `log_file_metadata` is in miles: a
+#   'Trip Distance (km)' column is converted, one in another unit is skipped.
+# - The `load_data` writer merges a file's pid_state_stats in its LOAD DATA
+#   transaction (`finish(state_stats)`) instead of a separate commit after it.
+# - The insert-tuple layout is defined in `insert_tuples.py`, shared by the
+#   writers, the state stats and the endpoint tracker.
+# - The unused `find_header_row` scan is gone; `read_preamble` replaced it.
+# - The first and last valid GPS coordinate of a log are picked out of its
+#   insert tuples while streaming (`trip_endpoints.EndpointTracker`) and
+#   stored in `trips` once the file is done, so trip grouping never scans
+#   log_data. Resumed files recompute theirs from the stored rows.
+# - Rows get a millisecond timestamp (`ts_ms`) next to the whole-second
+#   `timestamp`: the exact start time from the preamble plus the row's time
+#   offset, rounded to the millisecond. Insert tuples are now
+#   (log_id, timestamp, ts_ms, operating_state, *values).
+# - Ingestion is resumable. Every committed batch saves a checkpoint (rows
+#   committed, byte offset past them, duration so far) in the same
+#   transaction, and an interrupted file with unchanged content continues from
+#   it. Files are read in binary through `OffsetLineReader` so offsets are
+#   exact. A failed batch now stops the file instead of being skipped.
+# - Each stage (hash, preamble, parse, schema, classify, timestamp, insert,
+#   finish, whole file) is timed into `metrics.INGEST_STAGE_SECONDS`, with
+#   counters for files by outcome, rows, bytes and errors by stage.
+# - Each batch's numeric values are aggregated per PID and operating state
+#   (`state_stats.py`) and merged into `pid_state_stats` with the batch.
+# - A resumed file whose rows were all committed takes its duration from the
+#   last row, read backwards from EOF (`utils.last_data_rows`).
+# - Every processed file is recorded in `log_file_metadata` (start time,
+#   last time offset, trip distance, header signature, rows, bytes) keyed by
+#   its content hash, for the maintenance scripts.
+# - Logs are read through `sources.LogSource`, so .csv.gz, .csv.zst and the
+#   CSVs inside a .zip are hashed, scanned and ingested straight from the
+#   decompressed stream.
+# - New columns are typed from every row of the file (`sample_column_types`)
+#   rather than the first one. The extra read only happens when the file
+#   brings PIDs the schema has not seen.
+# - `build_insert_tuples` converts each cell once into the Python value for
+#   its column type (float/int/str, None for empty cells), so MySQL no longer
+#   parses numeric strings on insert.
+# - `process_log_file` is now a streaming pipeline. Rows are read, classified,
+#   timestamped and converted to insert tuples one batch at a time, so memory
+#   stays bounded by BATCH_SIZE regardless of the length of the log.
+# - The trip duration is taken from the last row seen while streaming and is
+#   written to `log_index` once all batches have been inserted.
+# - New columns are created by `add_missing_columns` under a database lock so
+#   parallel ingest workers can safely share the schema.
+# - Batches are handed to a writer from `writers.py`, selected with the
+#   `writer` argument ('executemany' or 'load_data').
+# - The file is opened once: `read_preamble` finds the start time and header
+#   row and the data pass continues from the same handle. Known header
+#   layouts reuse their cached column mapping from `HEADER_CACHE`.
+# - `process_log_file` consults the ingest manifest (see `manifest.py`)
+#   instead of `is_file_processed`; the parsing and writing moved to
+#   `ingest_file`.
+# - `storage='narrow'` stores the log in long format (`log_rows`/`log_samples`)
+#   and never alters log_data for new PIDs.
 # -----------------------------
 
-import os
+import io
 import csv
+import time
+import codecs
 import logging
 import json
-import re
-from .utils import parse_start_timestamp, infer_mysql_type
+from itertools import chain
+from .utils import ColumnTypeSampler, value_converter, last_data_rows
+from .preamble import read_preamble, normalize_header, header_units, HEADER_CACHE
 from .state_detector import classify_operating_states
+from .state_stats import StateStatsAccumulator, numeric_positions
+from .trip_endpoints import EndpointTracker, find_gps_columns
+from .writers import get_writer, DEFAULT_WRITER, STORAGE_WIDE
+from .metrics import INGEST_STAGE_SECONDS, INGEST_FILES, INGEST_ROWS, INGEST_BYTES, INGEST_ERRORS, timed_iter
+from .sources import as_log_source, SOURCE_ERRORS, PLAIN
+from .manifest import IngestManifest, Checkpoint, hash_stream, FINISHED_STATUSES, STATUS_PROCESSING, STATUS_DONE, STATUS_FAILED, STATUS_DUPLICATE, STATUS_NO_DATA
 
-def find_header_row(file_path):
-    with open(file_path, 'r', encoding='utf-8-sig', errors='ignore') as f:
-        for i, line in enumerate(f):
-            line = line.strip()
-            if line and not line.startswith('#'):
-                reader = csv.reader([line])
-                raw_headers = next(reader)
-                normalized_headers = []
-                for h in raw_headers:
-                    no_units = re.sub(r'\s*\([^)]*\)$', '', h)
-                    no_extra_space = re.sub(r'\s+', ' ', no_units).strip()
-                    final_header = no_extra_space.lower()
-                    normalized_headers.append(final_header)
-                return i, normalized_headers
-    return -1, None
-
-def process_log_file(file_path, db_manager):
-    file_name = os.path.basename(file_path)
-    logging.info(f"--- Processing file: {file_name} ---")
+BATCH_SIZE = 500
+TIME_HEADER = 'time'
+DISTANCE_HEADER = 'trip distance'
+# Miles per unit of the trip distance column, by the unit in its raw header
+# (None: no unit, taken as miles). Distances in other units are not recorded.
+DISTANCE_UNITS_TO_MILES = {None: 1.0, 'miles': 1.0, 'mi': 1.0, 'km': 0.621371}
+SCHEMA_LOCK_NAME = 'log2db_schema'
 
-    if db_manager.is_file_processed(file_name):
-        logging.info(f"Skipping '{file_name}', already in database.")
-        return True, "skipped"
+class OffsetLineReader:
+    """
+    Iterates the decoded lines of a freshly opened binary stream and tracks
+    the byte offset just past the last line returned, so ingestion can checkpoint
+    and later `seek()` back to a row boundary. Decodes like the text-mode reads
+    it replaces (UTF-8, BOM stripped, undecodable bytes dropped).
+    """
 
-    start_timestamp = parse_start_timestamp(file_path)
-    if start_timestamp is None: return False, "error"
-    
-    header_row_index, headers = find_header_row(file_path)
-    if not headers:
-        logging.error(f"Could not find a valid header row in '{file_name}'.")
-        return False, "error"
-    logging.info(f"Normalized Headers: {headers}")
+    def __init__(self, raw):
+        self.raw = raw
+        self.offset = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.raw.readline()
+        if not line:
+            raise StopIteration
+        if self.offset == 0 and line.startswith(codecs.BOM_UTF8):
+            line = line[len(codecs.BOM_UTF8):]
+            self.offset = len(codecs.BOM_UTF8)
+        self.offset += len(line)
+        return line.decode('utf-8', errors='ignore')
+
+    def seek(self, offset):
+        if self.raw.seekable():
+            self.raw.seek(offset)
+        else:
+            # Forward-only streams (zstd): read and drop up to the offset.
+            remaining = offset - self.offset
+            if remaining < 0:
+                raise io.UnsupportedOperation("Cannot seek backwards in this stream.")
+            while remaining > 0:
+                chunk = self.raw.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+        self.offset = offset
+
+def iter_data_rows(f, headers, dialect=csv.excel):
+    """Yields the non-empty data rows of an open CSV positioned after its header row."""
+    reader = csv.DictReader(f, fieldnames=headers, dialect=dialect)
+    for row in reader:
+        if any(row.values()):
+            yield row
+
+def iter_batches(iterable, batch_size=BATCH_SIZE):
+    """Groups an iterable into lists of at most `batch_size` items."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
-    data_rows = []
+def parse_time_offset(row):
+    time_offset_str = row.get(TIME_HEADER)
     try:
-        with open(file_path, 'r', encoding='utf-8-sig', errors='ignore') as f:
-            for _ in range(header_row_index + 1): next(f)
-            reader = csv.DictReader(f, fieldnames=headers)
-            for row in reader:
-                if any(row.values()): data_rows.append(row)
+        return float(time_offset_str) if time_offset_str and time_offset_str.strip() else 0.0
+    except (ValueError, TypeError):
+        return 0.0
+
+def distance_to_miles(raw_headers):
+    """Miles per unit of the log's trip distance column; None if it has none or its unit is unknown."""
+    for raw in raw_headers or ():
+        if normalize_header(raw) == DISTANCE_HEADER:
+            return DISTANCE_UNITS_TO_MILES.get(header_units(raw))
+    return None
+
+def parse_trip_distance(row, miles_per_unit=1.0):
+    """The row's trip distance in miles."""
+    value = row.get(DISTANCE_HEADER) if row and miles_per_unit else None
+    try:
+        return float(value) * miles_per_unit if value and value.strip() else None
+    except (ValueError, TypeError):
+        return None
+
+def tail_row(source, headers, dialect=csv.excel):
+    """A plain file's last data row, read from its end; None for compressed sources."""
+    if source.compression != PLAIN:
+        return None
+    rows = last_data_rows(source.path, 1, dialect)
+    return dict(zip(headers, rows[-1])) if rows else None
+
+def save_file_metadata(db_manager, content_hash, file_name, log_id, preamble, last_row, row_count, byte_size):
+    """Records the file in `log_file_metadata`; a no-op without a content hash."""
+    if content_hash is None:
+        return
+    duration = parse_time_offset(last_row) if last_row else None
+    db_manager.save_file_metadata(content_hash, file_name, log_id, preamble.start_time, duration,
+                                  parse_trip_distance(last_row, distance_to_miles(preamble.raw_headers)), preamble.signature, row_count, byte_size)
+
+def save_trip_endpoints(db_manager, log_id, endpoints, resumed):
+    """
+    Stores the endpoints tracked while streaming in `trips`. A resumed file
+    never saw its first rows, so its endpoints are computed from the stored rows.
+    """
+    if resumed:
+        db_manager.refresh_trip_endpoints([log_id])
+    elif endpoints.end is not None:
+        db_manager.save_trip_endpoints(log_id, endpoints.start, endpoints.end)
+
+def start_time_ms(preamble):
+    """The log's start as Unix milliseconds, from the preamble's exact start time when it has one."""
+    if preamble.start_time is not None:
+        return int(round(preamble.start_time.timestamp() * 1000))
+    return preamble.start_timestamp * 1000
+
+def row_timestamps(row, start_timestamp, start_ms):
+    """(Unix seconds, Unix milliseconds) of a row: the log's start plus the row's time offset."""
+    offset = parse_time_offset(row)
+    try:
+        return start_timestamp + int(offset), start_ms + int(round(offset * 1000))
+    except (ValueError, TypeError, OverflowError):
+        return start_timestamp, start_ms
+
+def column_converters(column_map, defined_columns):
+    """One converter per `column_map` entry, matching the column's MySQL type."""
+    return [(h, value_converter(defined_columns[h]['mysql_data_type'])) for h in column_map]
+
+def build_insert_tuples(log_id, rows, column_map, start_timestamp, converters=None, start_ms=None):
+    """
+    Converts classified row dicts into (log_id, timestamp, ts_ms,
+    operating_state, *values) insert tuples, laid out as in `insert_tuples`. With `converters` (from
+    `column_converters`) the values are typed; without, the raw strings are
+    passed through. `start_ms` defaults to `start_timestamp` in milliseconds.
+    """
+    if start_ms is None:
+        start_ms = start_timestamp * 1000
+    if converters is None:
+        headers = list(column_map.keys())
+        return [
+            (log_id, *row_timestamps(row, start_timestamp, start_ms), row['operating_state']) + tuple(row.get(h, None) for h in headers)
+            for row in rows
+        ]
+    return [
+        (log_id, *row_timestamps(row, start_timestamp, start_ms), row['operating_state']) + tuple([convert(row.get(h)) for h, convert in converters])
+        for row in rows
+    ]
+
+def sample_column_types(source, preamble, headers, data_offset):
+    """Reads every data row once and returns {header: mysql type} for `headers`."""
+    samplers = {h: ColumnTypeSampler() for h in headers}
+    with source.open() as raw:
+        lines = OffsetLineReader(raw)
+        lines.seek(data_offset)
+        for row in iter_data_rows(lines, preamble.headers, preamble.dialect):
+            for h, sampler in samplers.items():
+                sampler.add(row.get(h))
+    return {h: sampler.mysql_type for h, sampler in samplers.items()}
+
+def needs_schema_change(defined_columns, headers, storage=STORAGE_WIDE):
+    """True if any header lacks a definition, or (wide storage) a physical log_data column."""
+    for h in headers:
+        definition = defined_columns.get(h)
+        if definition is None:
+            return True
+        if storage == STORAGE_WIDE and not definition.get('wide_column', 1):
+            return True
+    return False
+
+def add_missing_columns(db_manager, headers, column_types, storage=STORAGE_WIDE):
+    """
+    Adds schema columns for any headers not yet in `column_definitions`, all in
+    one ALTER, typed from `column_types` ({header: mysql type}). The definitions are re-read under a database lock so that
+    parallel workers seeing the same new PID only create it once. Narrow
+    storage only needs definitions, so it never alters log_data. Returns None
+    on failure.
+    """
+    with db_manager.named_lock(SCHEMA_LOCK_NAME) as acquired:
+        if not acquired: return None
+        defined_columns = db_manager.get_all_defined_columns(refresh=True)
+        missing = list(dict.fromkeys(h for h in headers if h not in defined_columns))
+        if missing:
+            new_columns = [(header, column_types.get(header, 'VARCHAR(255)')) for header in missing]
+            added = db_manager.add_new_columns(new_columns, add_to_log_data=(storage == STORAGE_WIDE))
+            if added is None or any(h not in added for h in missing):
+                logging.critical(f"Could not add new columns {missing}.")
+                return None
+            defined_columns.update(added)
+        if storage == STORAGE_WIDE:
+            narrow_only = [defined_columns[h] for h in dict.fromkeys(headers) if not defined_columns[h].get('wide_column', 1)]
+            if narrow_only and not db_manager.add_log_data_columns(narrow_only):
+                logging.critical(f"Could not add log_data columns for {[d['column_name'] for d in narrow_only]}.")
+                return None
+        return defined_columns
+
+def ingest_file(source, file_name, db_manager, writer=DEFAULT_WRITER, on_indexed=None, storage=STORAGE_WIDE, resume=None, content_hash=None):
+    """
+    Parses one CSV (a `LogSource`, read through any decompression) and writes
+    it to the database. Returns (success, status, log_id);
+    `on_indexed(log_id)` is called as soon as the log_index row exists.
+    With `resume` (a manifest entry with a checkpoint) the existing log is
+    continued from its saved byte offset instead of being indexed again.
+    Given the file's `content_hash`, a processed file is also recorded in
+    `log_file_metadata`.
+    """
+    log_id = resume['log_id'] if resume else None
+    try:
+        with source.open() as raw:
+            lines = OffsetLineReader(raw)
+            HEADER_CACHE.load(db_manager)
+            with INGEST_STAGE_SECONDS.time(stage='preamble'):
+                preamble = read_preamble(lines, file_name, HEADER_CACHE)
+            start_timestamp = preamble.start_timestamp
+            if start_timestamp is None:
+                INGEST_ERRORS.inc(stage='preamble')
+                return False, "error", log_id
+            start_ms = start_time_ms(preamble)
+
+            headers = preamble.headers
+            if not headers:
+                logging.error(f"Could not find a valid header row in '{file_name}'.")
+                INGEST_ERRORS.inc(stage='preamble')
+                return False, "error", log_id
+            logging.info(f"Normalized Headers: {headers}")
+            data_offset = lines.offset
+
+            row_count = 0
+            if resume:
+                row_count = resume['rows_committed']
+                lines.seek(resume['byte_offset'])
+                logging.info(f"Resuming log_id {log_id} after {row_count} committed rows (byte {resume['byte_offset']}).")
+
+            batches = timed_iter(iter_batches(iter_data_rows(lines, headers, preamble.dialect)), 'parse')
+            first_batch = next(batches, None)
+
+            if not first_batch:
+                if resume:
+                    logging.info(f"All rows of '{file_name}' were already committed.")
+                    last_row = tail_row(source, headers, preamble.dialect)
+                    if last_row is not None:
+                        db_manager.update_log_duration(log_id, parse_time_offset(last_row))
+                    save_file_metadata(db_manager, content_hash, file_name, log_id, preamble, last_row, row_count, lines.offset)
+                    db_manager.refresh_trip_endpoints([log_id])
+                    return True, "processed", log_id
+                logging.warning(f"No data rows found in '{file_name}'.")
+                return True, "skipped_no_data", log_id
+
+            defined_columns = HEADER_CACHE.columns_for(preamble.signature)
+            if defined_columns is None or needs_schema_change(defined_columns, headers, storage):
+                with INGEST_STAGE_SECONDS.time(stage='schema'):
+                    defined_columns = db_manager.get_all_defined_columns()
+                    if needs_schema_change(defined_columns, headers, storage):
+                        new_headers = [h for h in dict.fromkeys(headers) if h not in defined_columns]
+                        column_types = sample_column_types(source, preamble, new_headers, data_offset) if new_headers else {}
+                        defined_columns = add_missing_columns(db_manager, headers, column_types, storage)
+                    if defined_columns is not None:
+                        defined_columns = HEADER_CACHE.store(db_manager, preamble.signature, headers, defined_columns)
+                if defined_columns is None:
+                    INGEST_ERRORS.inc(stage='schema')
+                    return False, "error", log_id
+            else:
+                logging.info("Header layout recognized; using cached column mapping.")
+
+            if not resume:
+                current_log_column_ids = [defined_columns[h]['column_id'] for h in headers if h in defined_columns]
+                column_ids_json = json.dumps(current_log_column_ids)
+
+                log_id = db_manager.insert_log_index(file_name, start_timestamp, 0.0, column_ids_json, storage)
+                if not log_id:
+                    if db_manager.is_file_processed(file_name):
+                        return True, "skipped", log_id
+                    INGEST_ERRORS.inc(stage='index')
+                    return False, "error", log_id
+                if on_indexed: on_indexed(log_id)
+
+            column_map = {h: defined_columns[h]['sanitized_name'] for h in headers}
+
+            column_ids = [defined_columns[h]['column_id'] for h in column_map]
+            converters = column_converters(column_map, defined_columns)
+            mysql_types = [defined_columns[h]['mysql_data_type'] for h in column_map]
+            data_writer = get_writer(writer, db_manager, log_id, column_map, storage, column_ids, start_row=row_count, column_types=mysql_types)
+            state_stats = StateStatsAccumulator(numeric_positions(column_map, defined_columns))
+            endpoints = EndpointTracker(column_map, defined_columns, find_gps_columns(db_manager.get_all_defined_columns()))
+            first_ts = last_ts = None
+            last_row = None
+            try:
+                for batch in chain([first_batch], batches):
+                    INGEST_ROWS.inc(len(batch))
+                    with INGEST_STAGE_SECONDS.time(stage='classify'):
+                        batch = classify_operating_states(batch, headers)
+                    with INGEST_STAGE_SECONDS.time(stage='timestamp'):
+                        insert_tuples = build_insert_tuples(log_id, batch, column_map, start_timestamp, converters, start_ms)
+                    with INGEST_STAGE_SECONDS.time(stage='stats'):
+                        state_stats.add(insert_tuples)
+                        endpoints.add(insert_tuples)
+                    checkpoint = None
+                    if data_writer.commits_per_batch:
+                        checkpoint = Checkpoint(file_name, row_count + len(batch), lines.offset, parse_time_offset(batch[-1]), state_stats.take())
+                    with INGEST_STAGE_SECONDS.time(stage='insert'):
+                        written = data_writer.write(insert_tuples, checkpoint)
+                    if not written:
+                        data_writer.abort()
+                        INGEST_ERRORS.inc(stage='insert')
+                        logging.error(f"Stopped ingesting '{file_name}' after {row_count} committed rows; it will resume from there.")
+                        return False, "error", log_id
+                    if first_ts is None: first_ts = insert_tuples[0][1]
+                    last_ts = insert_tuples[-1][1]
+                    last_row = batch[-1]
+                    row_count += len(batch)
+            except Exception as e:
+                data_writer.abort()
+                INGEST_ERRORS.inc(stage='stream')
+                logging.error(f"Error streaming data from '{file_name}' into log_id {log_id}: {e}")
+                return False, "error", log_id
+            with INGEST_STAGE_SECONDS.time(stage='finish'):
+                # Bulk writers commit once, and merge the file's statistics in that transaction.
+                finished = data_writer.finish(state_stats.take())
+            if not finished:
+                INGEST_ERRORS.inc(stage='finish')
+                return False, "error", log_id
     except Exception as e:
+        INGEST_ERRORS.inc(stage='read')
         logging.error(f"Error reading data from '{file_name}': {e}")
+        return False, "error", log_id
+
+    logging.info(f"Read {row_count} data rows from '{file_name}'. Row timestamps First: {first_ts}, Last: {last_ts}")
+
+    duration = parse_time_offset(last_row)
+    logging.info(f"Calculated trip duration: {duration:.2f} seconds.")
+    db_manager.update_log_duration(log_id, duration)
+    save_file_metadata(db_manager, content_hash, file_name, log_id, preamble, last_row, row_count, lines.offset)
+    save_trip_endpoints(db_manager, log_id, endpoints, resumed=bool(resume and resume['rows_committed']))
+
+    logging.info(f"Successfully processed and ingested '{file_name}'.")
+    return True, "processed", log_id
+
+def process_log_file(file_path, db_manager, writer=DEFAULT_WRITER, manifest=None, storage=STORAGE_WIDE):
+    """
+    Ingests one file unless the ingest manifest says it is already done.
+    `file_path` is a path to a single (possibly compressed) CSV or a
+    `LogSource` from `iter_log_sources`, which zip archives must go through.
+    Pass a preloaded `IngestManifest` when scanning a directory; without one,
+    the entries for this file are fetched with a single query.
+    """
+    started = time.perf_counter()
+    try:
+        source = as_log_source(file_path)
+    except ValueError as e:
+        logging.error(str(e))
+        INGEST_FILES.inc(status="error")
         return False, "error"
+    success, status = _process_log_file(source, db_manager, writer, manifest, storage)
+    INGEST_FILES.inc(status=status)
+    if status == "processed":
+        INGEST_STAGE_SECONDS.observe(time.perf_counter() - started, stage='file')
+        try:
+            INGEST_BYTES.inc(source.fingerprint()[0])
+        except SOURCE_ERRORS:
+            pass
+    return success, status
 
-    if not data_rows:
-        logging.warning(f"No data rows found in '{file_name}'.")
-        return True, "skipped_no_data"
-    logging.info(f"Read {len(data_rows)} data rows from '{file_name}'.")
-
-    data_rows = classify_operating_states(data_rows, headers)
-
-    defined_columns = db_manager.get_all_defined_columns()
-    
-    first_data_row = data_rows[0]
-    for header in headers:
-        if header not in defined_columns:
-            sample_value = first_data_row.get(header)
-            mysql_type = infer_mysql_type(sample_value)
-            new_col_info = db_manager.add_new_column(header, mysql_type)
-            if new_col_info:
-                defined_columns[header] = new_col_info
-            else:
-                logging.critical(f"Could not add new column '{header}'.")
-                return False, "error"
+def _process_log_file(source, db_manager, writer, manifest, storage):
+    file_name = source.name
+    logging.info(f"--- Processing file: {file_name} ---")
 
-    normalized_time_header = 'time'
-    last_row_time_str = data_rows[-1].get(normalized_time_header, '0')
     try:
-        duration = float(last_row_time_str) if last_row_time_str and last_row_time_str.strip() else 0.0
-    except (ValueError, TypeError):
-        duration = 0.0
-    logging.info(f"Calculated trip duration: {duration:.2f} seconds.")
+        fingerprint = source.fingerprint()
+        if manifest is not None and manifest.is_unchanged(file_name, fingerprint):
+            logging.info(f"Skipping '{file_name}', already in database.")
+            return True, "skipped"
+        with INGEST_STAGE_SECONDS.time(stage='hash'), source.open() as f:
+            content_hash = hash_stream(f)
+    except SOURCE_ERRORS as e:
+        logging.error(f"Could not read '{file_name}': {e}")
+        return False, "error"
 
-    current_log_column_ids = [defined_columns[h]['column_id'] for h in headers if h in defined_columns]
-    column_ids_json = json.dumps(current_log_column_ids)
+    if manifest is None:
+        manifest = IngestManifest.load_for(db_manager, file_name, content_hash)
+        if manifest.is_unchanged(file_name, fingerprint):
+            logging.info(f"Skipping '{file_name}', already in database.")
+            return True, "skipped"
 
-    log_id = db_manager.insert_log_index(file_name, start_timestamp, duration, column_ids_json)
-    if not log_id: return False, "error"
+    entry = manifest.entry(file_name)
+    if entry and entry['status'] in FINISHED_STATUSES:
+        if entry['content_hash'] == content_hash:
+            manifest.record(db_manager, file_name, fingerprint, content_hash, entry['status'], entry['log_id'])
+            logging.info(f"Skipping '{file_name}', already in database (touched but unchanged).")
+            return True, "skipped"
+        if entry['status'] == STATUS_DONE:
+            logging.warning(f"'{file_name}' has changed since it was ingested. Delete its log to ingest it again.")
+            return True, "skipped"
 
-    column_map = {h: defined_columns[h]['sanitized_name'] for h in headers}
+    duplicate_of = manifest.duplicate_of(file_name, content_hash)
+    if duplicate_of:
+        logging.info(f"Skipping '{file_name}', same content as already ingested '{duplicate_of}'.")
+        manifest.record(db_manager, file_name, fingerprint, content_hash, STATUS_DUPLICATE)
+        return True, "skipped_duplicate"
 
-    for row in data_rows:
-        try:
-            time_offset_str = row.get(normalized_time_header)
-            time_offset = float(time_offset_str) if time_offset_str and time_offset_str.strip() else 0.0
-            row['row_timestamp'] = start_timestamp + int(time_offset)
-        except (ValueError, TypeError):
-            row['row_timestamp'] = start_timestamp
-    
-    if data_rows:
-        logging.info(f"Row timestamps calculated. First: {data_rows[0]['row_timestamp']}, Last: {data_rows[-1]['row_timestamp']}")
-
-    batch_size = 500
-    for i in range(0, len(data_rows), batch_size):
-        batch = data_rows[i:i + batch_size]
-        db_manager.insert_log_data_batch(log_id, batch, column_map)
+    resume = manifest.resume_point(file_name, content_hash)
+    if resume:
+        stored_rows = db_manager.count_log_rows(resume['log_id'])
+        if stored_rows != resume['rows_committed']:
+            logging.warning(f"Checkpoint for '{file_name}' says {resume['rows_committed']} rows but {stored_rows} are stored. Starting over.")
+            resume = None
+        else:
+            storage = db_manager.get_storage_layout(resume['log_id']) or storage
 
-    logging.info(f"Successfully processed and ingested '{file_name}'.")
-    return True, "processed"
\ No newline at end of file
+    if entry and not resume:
+        logging.info(f"Re-ingesting '{file_name}' (previous status: {entry['status']}). Removing any partial data first.")
+        db_manager.delete_log_for_file(file_name)
+
+    manifest.record(db_manager, file_name, fingerprint, content_hash, STATUS_PROCESSING, resume['log_id'] if resume else None)
+
+    def on_indexed(log_id):
+        manifest.record(db_manager, file_name, fingerprint, content_hash, STATUS_PROCESSING, log_id)
+
+    success, status, log_id = ingest_file(source, file_name, db_manager, writer, on_indexed, storage, resume, content_hash)
+
+    if status == "skipped":
+        # Another process indexed this file first; its manifest entry is its own.
+        return success, status
+    final_status = STATUS_DONE if status == "processed" else STATUS_NO_DATA if status == "skipped_no_data" else STATUS_FAILED
+    manifest.record(db_manager, file_name, fingerprint, content_hash, final_status, log_id)
+    return success, status
@@ -1,25 +1,171 @@
 #  FILE: backend/db_manager.py
 #
-# --- VERSION 1.9.7-ALPHA ---
-# - FIXED: This file has been restored to its complete, functional state.
-# - All methods, including `is_file_processed`, `add_new_column`,
-#   `insert_log_index`, and `insert_log_data_batch`, have been re-implemented,
-#   fixing the `AttributeError` that broke the file ingestion process.
+# --- VERSION 1.9.8-ALPHA ---
+# - Added `insert_log_data_tuples`, which takes rows already shaped as insert
+#   tuples so the streaming ingest pipeline never materializes row dicts twice.
+#   `insert_log_data_batch` now builds its tuples and delegates to it.
+# - Added `update_log_duration`, used once a streamed file has been consumed.
+# - Added `named_lock`, a GET_LOCK advisory lock used to serialize schema
+#   changes between parallel ingest workers. A duplicate `log_index` insert is
+#   now logged as a warning rather than an error.
+# - Added `load_log_data_file` and `supports_local_infile` for the LOAD DATA
+#   writer in `writers.py`. Pass `allow_local_infile=True` to enable it.
+# - Added the `header_signatures` table and its accessors, which persist the
+#   header-layout cache in `preamble.py`.
+# - Added the `ingest_manifest` table (see `manifest.py`) with its accessors
+#   and `delete_log_for_file`. Existing `log_index` rows are seeded into it as 'done'.
+# - Added `add_new_columns`, which registers all of a file's new PIDs and adds
+#   them with a single ALTER TABLE (ALGORITHM=INSTANT where supported).
+# - `get_all_defined_columns` is served from an in-process cache that is
+#   dropped whenever this process changes the schema. It returns copies of the
+#   cached rows, so callers that update a definition leave the cache intact.
+# - Added the long-format storage tables `log_rows`/`log_samples` and the
+#   `log_index.storage_layout` flag. `get_data_for_log` pivots narrow logs back
+#   into the usual row shape. `column_definitions.wide_column` records whether
+#   a PID has a physical log_data column yet.
+# - `ingest_manifest` carries an ingest checkpoint (`rows_committed`,
+#   `byte_offset`). The row writers accept a `checkpoint` that is saved in the
+#   same transaction as the batch, together with the running trip duration,
+#   and now return False when a batch fails.
+# - Data writes and log_data ALTERs report latency, committed rows and
+#   failures to `metrics.py` (`log2db_db_*`).
+# - Added the `log_file_metadata` table, keyed by content hash: start time
+#   (UTC, microseconds), last-row time offset, trip distance, header
+#   signature, row count and byte size of every ingested file.
+# - Added the `pid_state_stats` table. `get_pid_statistics` reads it in one
+#   query instead of a GROUP BY scan of log_data per PID; ingest checkpoints
+#   merge each batch's aggregates into it and `rebuild_pid_state_stats`
+#   recomputes it from the stored logs.
+# - Added `stream_data_for_log`, which yields a log's rows in chunks from an
+#   unbuffered cursor (narrow logs a row_seq range at a time) for the
+#   streaming `/api/logs/<id>/data` response.
+# - A log's resolved columns (storage layout, PIDs, sanitized-to-original
+#   names) are kept in a process-wide LRU keyed by log_id, shared by
+#   `get_data_for_log` and `stream_data_for_log`, and dropped when this
+#   process re-indexes or deletes the log.
+# - A DatabaseManager takes its connection from the pool registered for its
+#   config with `pool.configure_pool()` and `close()` hands it back; without a
+#   pool it still opens and closes its own connection.
+# - `ensure_base_tables_exist` no longer probes and patches the schema at
+#   every startup: the tables are built by the versioned migrations in
+#   `migrations.py`, and it only applies those not yet recorded. It raises if
+#   a migration fails.
+#   Startup leaves `manual` migrations (the optional GPX tables) pending.
+# - log_data may be RANGE-partitioned on log_id (scripts/partition_log_data.py).
+#   `insert_log_index` then adds partitions ahead of new logs (and refuses
+#   a log no partition covers), and `delete_log_data` truncates whole
+#   partitions where it can: ranges below log_index's AUTO_INCREMENT whose
+#   logs are all being deleted. Deletes on the
+#   unpartitioned table run in chunks. `delete_log_for_file` calls it, since
+#   a partitioned log_data has no foreign key to cascade from.
+# - `subtract_log_state_stats` takes a log's rows back out of pid_state_stats
+#   before the log is deleted (by `delete_log_for_file` or a scrub), so logs
+#   that are re-ingested from the start are not counted twice.
+# - `load_log_data_file` merges the file's pid_state_stats aggregates in the
+#   LOAD DATA transaction, so a crash cannot leave rows without statistics.
+# - log_data rows carry a millisecond `ts_ms` and are clustered on
+#   (log_id, ts_ms, data_id) (migration 0009_log_data_ts_ms), so a log is
+#   read in key order without a filesort. Until that migration has run,
+#   inserts leave `ts_ms` out and reads order by `timestamp` as before.
+# - Trip endpoints live in `trips`: `save_trip_endpoints` stores the ones
+#   tracked during ingest and `refresh_trip_endpoints` recomputes them for
+#   many logs in one INSERT ... SELECT with window functions. The per-log
+#   `get_first_valid_coord`/`get_last_valid_coord` lookups are gone;
+#   `get_trip_endpoints` reads them all at once, and `trip_endpoints_version`
+#   tells the in-memory endpoint cache in `trip_endpoints.py` when to reload.
 # -----------------------------
 
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, errorcode
 import logging
 import json
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 
-from .utils import sanitize_column_name
+from .utils import sanitize_column_name, is_numeric_type
+from .state_stats import std_dev, merge_aggregates, remove_aggregate
+from .trip_endpoints import find_gps_columns
+from .metrics import DB_WRITE_SECONDS, DB_ROWS_WRITTEN, DB_ERRORS, LOG_COLUMNS_CACHE_LOOKUPS
+from .pool import get_pool
+from .writers import STORAGE_WIDE, STORAGE_NARROW
+
+# Process-wide cache of column_definitions, keyed by (host, database).
+_defined_columns_cache = {}
+_defined_columns_lock = threading.Lock()
+
+# Process-wide LRU of resolved log columns, keyed by (host, database, log_id).
+# Logs do not change after ingestion; this process drops an entry when it
+# re-indexes or deletes the log, and the TTL covers changes made elsewhere
+# (the CLI, convert_log_storage.py).
+LOG_COLUMNS_CACHE_SIZE = 256
+LOG_COLUMNS_CACHE_TTL = 300
+_log_columns_cache = OrderedDict()
+_log_columns_lock = threading.Lock()
+
+# ER_ALTER_OPERATION_NOT_SUPPORTED(_REASON), ER_UNKNOWN_ALTER_ALGORITHM: the server
+# cannot run the ALTER with the requested algorithm.
+_INSTANT_UNSUPPORTED_ERRNOS = (1845, 1846, 1800)
+# ER_INNODB_MAX_ROW_VERSION (MySQL >= 8.0.29): the table has used its 64 instant
+# ADD/DROP COLUMN row versions. A non-instant ALTER rebuilds it and resets the
+# count, so this says nothing about the server and is only retried.
+_INSTANT_RETRY_ERRNOS = _INSTANT_UNSUPPORTED_ERRNOS + (4092,)
+_instant_ddl_supported = None
+
+# Rows per chunk read by `stream_data_for_log`.
+STREAM_CHUNK_SIZE = 2000
+
+# A RANGE(log_id)-partitioned log_data (scripts/partition_log_data.py) is kept
+# LOG_DATA_PARTITIONS_AHEAD partitions ahead of the newest log; new ones are
+# added once fewer than LOG_DATA_PARTITIONS_MIN_AHEAD remain. The partition
+# list is cached per process for LOG_DATA_PARTITIONS_TTL seconds.
+LOG_DATA_PARTITIONS_AHEAD = 8
+LOG_DATA_PARTITIONS_MIN_AHEAD = 2
+LOG_DATA_PARTITIONS_TTL = 60
+MAX_PARTITIONS = 8192
+PARTITION_LOCK_NAME = 'log2db_partitions'
+# Seconds an ADD PARTITION waits for running queries before giving up, so it
+# never holds up every other query on log_data behind its metadata lock.
+PARTITION_DDL_LOCK_WAIT = 10
+_log_data_partitions_cache = {}
+_log_data_partitions_lock = threading.Lock()
+
+# Rows per DELETE when log_data rows are removed without truncating a partition.
+DELETE_CHUNK_SIZE = 10000
+
+# PIDs aggregated per query when a deleted log's share of pid_state_stats is
+# computed (three select expressions each).
+STATE_STATS_COLUMNS_PER_QUERY = 200
+
+# Whether log_data has the millisecond `ts_ms` column yet, by (host, database):
+# True once seen, otherwise when it was last checked. The migration that adds
+# it (0009_log_data_ts_ms) may be applied later by scripts/migrate.py.
+_log_data_ts_ms = {}
+
+# The `trips` rows that trip grouping can use.
+_TRIP_ENDPOINTS_KNOWN = "start_lat IS NOT NULL AND start_lon IS NOT NULL AND end_lat IS NOT NULL AND end_lon IS NOT NULL"
+
+def log_data_partition_definitions(start, end, width):
+    """PARTITION clauses of `width` log_ids each, from `start` until one covers `end`."""
+    return [f"PARTITION p{low} VALUES LESS THAN ({low + width})" for low in range(start, end + 1, width)]
 
 class DatabaseManager:
-    def __init__(self, db_config):
+    def __init__(self, db_config, allow_local_infile=False):
         self.db_config = db_config
+        self.allow_local_infile = allow_local_infile
         self.connection = None
+        self._local_infile_supported = None
+        # Borrow from the pool registered for this config, if any (see pool.py).
+        self._pool = get_pool(db_config, allow_local_infile)
+        connect_args = dict(self.db_config)
+        if allow_local_infile:
+            connect_args['allow_local_infile'] = True
         try:
-            self.connection = mysql.connector.connect(**self.db_config)
+            if self._pool is not None:
+                self.connection = self._pool.acquire()
+            else:
+                self.connection = mysql.connector.connect(**connect_args)
         except Error as e:
             logging.critical(f"DATABASE CONNECTION FAILED: {e}")
             raise
@@ -56,6 +202,22 @@ class DatabaseManager:
         finally:
             cursor.close()
 
+    @contextmanager
+    def named_lock(self, lock_name, timeout=60):
+        """Holds a server-wide GET_LOCK advisory lock; yields False if it could not be taken."""
+        result = self.fetch_one("SELECT GET_LOCK(%s, %s) AS acquired", (lock_name, timeout))
+        acquired = bool(result and result['acquired'] == 1)
+        # End the current read snapshot so work done under the lock sees
+        # everything committed by the previous holder.
+        self.connection.commit()
+        if not acquired:
+            logging.error(f"Timed out after {timeout}s waiting for database lock '{lock_name}'.")
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self.fetch_one("SELECT RELEASE_LOCK(%s) AS released", (lock_name,))
+
     def _column_exists(self, table_name, column_name):
         query = "SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME = %s"
         cursor = self.connection.cursor()
@@ -65,178 +227,822 @@ class DatabaseManager:
         return exists
 
     def ensure_base_tables_exist(self):
-        logging.info("Ensuring base tables exist...")
-        log_index_query = """
-        CREATE TABLE IF NOT EXISTS log_index (
-            log_id INT AUTO_INCREMENT PRIMARY KEY,
-            file_name VARCHAR(255) UNIQUE NOT NULL,
-            start_timestamp BIGINT NOT NULL,
-            trip_duration_seconds FLOAT NOT NULL,
-            column_ids_json TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        ) ENGINE=InnoDB;
+        """Applies pending schema migrations (see migrations.py); one lookup when the schema is current."""
+        from .migrations import apply_migrations
+        if not apply_migrations(self, run_online=False, include_manual=False):
+            raise RuntimeError("Schema migrations failed; see the log for details.")
+
+    def get_pid_statistics(self, sanitized_pids):
+        """{pid: {operating_state: {'mean', 'std_dev'}}} from `pid_state_stats`, in one query."""
+        if not sanitized_pids:
+            return {}
+        format_strings = ','.join(['%s'] * len(sanitized_pids))
+        query = f"""
+            SELECT cd.sanitized_name, s.operating_state, s.sample_count, s.mean, s.m2
+            FROM column_definitions cd JOIN pid_state_stats s ON s.column_id = cd.column_id
+            WHERE cd.sanitized_name IN ({format_strings})
+        """
+        stats = {pid: {} for pid in sanitized_pids}
+        try:
+            for row in self.fetch_all(query, tuple(sanitized_pids)):
+                stats.setdefault(row['sanitized_name'], {})[row['operating_state']] = {'mean': row['mean'], 'std_dev': std_dev(row['sample_count'], row['m2'])}
+        except Error as e:
+            logging.error(f"Could not read PID statistics: {e}")
+        return stats
+
+    # Chan et al. merge of an incoming aggregate into the stored one. MySQL
+    # applies the assignments left to right, so m2 and mean must be computed
+    # before sample_count changes.
+    _MERGE_STATE_STATS = """
+        ON DUPLICATE KEY UPDATE
+            m2 = m2 + VALUES(m2) + POW(VALUES(mean) - mean, 2) * sample_count * VALUES(sample_count) / (sample_count + VALUES(sample_count)),
+            mean = mean + (VALUES(mean) - mean) * VALUES(sample_count) / (sample_count + VALUES(sample_count)),
+            sample_count = sample_count + VALUES(sample_count)
+    """
+
+    def _merge_state_stats(self, cursor, aggregates):
+        """Merges [(column_id, state, count, mean, m2)] into pid_state_stats inside the caller's transaction."""
+        if aggregates:
+            cursor.executemany("INSERT INTO pid_state_stats (column_id, operating_state, sample_count, mean, m2) VALUES (%s, %s, %s, %s, %s)"
+                               + self._MERGE_STATE_STATS, aggregates)
+
+    def merge_pid_state_stats(self, aggregates):
+        cursor = self.connection.cursor()
+        try:
+            self._merge_state_stats(cursor, aggregates)
+            self.connection.commit()
+            return True
+        except Error as e:
+            logging.error(f"Failed to merge PID state statistics: {e}")
+            self.connection.rollback()
+            return False
+        finally:
+            cursor.close()
+
+    def rebuild_pid_state_stats(self):
+        """Recomputes pid_state_stats from every stored log (wide and narrow) in one transaction."""
+        numeric = [c for c in self.get_all_defined_columns(refresh=True).values() if is_numeric_type(c['mysql_data_type'])]
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("DELETE FROM pid_state_stats")
+            for column in numeric:
+                if not column.get('wide_column', 1):
+                    continue
+                pid = column['sanitized_name']
+                cursor.execute(f"""
+                    INSERT INTO pid_state_stats (column_id, operating_state, sample_count, mean, m2)
+                    SELECT %s, operating_state, COUNT(`{pid}`), AVG(`{pid}`), VAR_POP(`{pid}`) * COUNT(`{pid}`)
+                    FROM log_data WHERE operating_state IS NOT NULL AND `{pid}` IS NOT NULL
+                    GROUP BY operating_state
+                """, (column['column_id'],))
+            if numeric:
+                format_strings = ','.join(['%s'] * len(numeric))
+                cursor.execute(f"""
+                    INSERT INTO pid_state_stats (column_id, operating_state, sample_count, mean, m2)
+                    SELECT * FROM (
+                        SELECT s.column_id, r.operating_state, COUNT(s.value) AS n, AVG(s.value) AS avg_value, VAR_POP(s.value) * COUNT(s.value) AS sq
+                        FROM log_samples s JOIN log_rows r ON r.log_id = s.log_id AND r.row_seq = s.row_seq
+                        WHERE r.operating_state IS NOT NULL AND s.value IS NOT NULL AND s.column_id IN ({format_strings})
+                        GROUP BY s.column_id, r.operating_state
+                    ) AS narrow
+                """ + self._MERGE_STATE_STATS, tuple(c['column_id'] for c in numeric))
+            self.connection.commit()
+            cursor.execute("SELECT COUNT(*) FROM pid_state_stats")
+            return cursor.fetchone()[0]
+        except Error as e:
+            logging.error(f"Failed to rebuild PID state statistics: {e}")
+            self.connection.rollback()
+            return None
+        finally:
+            cursor.close()
+
+    def subtract_log_state_stats(self, log_ids):
         """
-        column_definitions_query = """
-        CREATE TABLE IF NOT EXISTS column_definitions (
-            column_id INT AUTO_INCREMENT PRIMARY KEY,
-            column_name VARCHAR(255) UNIQUE NOT NULL,
-            sanitized_name VARCHAR(255) UNIQUE NOT NULL,
-            mysql_data_type VARCHAR(50) NOT NULL
-        ) ENGINE=InnoDB;
+        Takes the rows of `log_ids` back out of pid_state_stats (the inverse of
+        the merges made while they were ingested), so a log that is deleted or
+        re-ingested from the start no longer counts. Call it before deleting
+        the rows. Returns False on failure.
         """
-        log_data_query = """
-        CREATE TABLE IF NOT EXISTS log_data (
-            data_id BIGINT AUTO_INCREMENT PRIMARY KEY,
-            log_id INT NOT NULL,
-            timestamp BIGINT NOT NULL,
-            INDEX (log_id),
-            FOREIGN KEY (log_id) REFERENCES log_index(log_id) ON DELETE CASCADE
-        ) ENGINE=InnoDB;
+        if not log_ids:
+            return True
+        numeric = [c for c in self.get_all_defined_columns().values() if is_numeric_type(c['mysql_data_type'])]
+        if not numeric:
+            return True
+        in_logs = ','.join(['%s'] * len(log_ids))
+        parts = {}
+        def add(key, count, mean, m2):
+            part = (int(count), float(mean), float(m2))
+            parts[key] = merge_aggregates(parts[key], part) if key in parts else part
+        cursor = self.connection.cursor()
+        try:
+            wide = [c for c in numeric if c.get('wide_column', 1)]
+            for i in range(0, len(wide), STATE_STATS_COLUMNS_PER_QUERY):
+                chunk = wide[i:i + STATE_STATS_COLUMNS_PER_QUERY]
+                selects = ", ".join(f"COUNT(`{c['sanitized_name']}`), AVG(`{c['sanitized_name']}`), VAR_POP(`{c['sanitized_name']}`) * COUNT(`{c['sanitized_name']}`)" for c in chunk)
+                cursor.execute(f"SELECT operating_state, {selects} FROM log_data WHERE log_id IN ({in_logs}) AND operating_state IS NOT NULL GROUP BY operating_state", tuple(log_ids))
+                for row in cursor.fetchall():
+                    for j, column in enumerate(chunk):
+                        count, mean, m2 = row[1 + 3 * j:4 + 3 * j]
+                        if count:
+                            add((column['column_id'], row[0]), count, mean, m2)
+            cursor.execute(f"""
+                SELECT s.column_id, r.operating_state, COUNT(s.value), AVG(s.value), VAR_POP(s.value) * COUNT(s.value)
+                FROM log_samples s JOIN log_rows r ON r.log_id = s.log_id AND r.row_seq = s.row_seq
+                WHERE s.log_id IN ({in_logs}) AND r.operating_state IS NOT NULL AND s.value IS NOT NULL
+                GROUP BY s.column_id, r.operating_state
+            """, tuple(log_ids))
+            for column_id, state, count, mean, m2 in cursor.fetchall():
+                if count:
+                    add((column_id, state), count, mean, m2)
+            if parts:
+                column_ids = sorted({column_id for column_id, _ in parts})
+                cursor.execute(f"SELECT column_id, operating_state, sample_count, mean, m2 FROM pid_state_stats WHERE column_id IN ({','.join(['%s'] * len(column_ids))}) FOR UPDATE", tuple(column_ids))
+                updates, emptied = [], []
+                for column_id, state, count, mean, m2 in cursor.fetchall():
+                    if (column_id, state) not in parts:
+                        continue
+                    count, mean, m2 = remove_aggregate((count, mean, m2), parts[(column_id, state)])
+                    if count:
+                        updates.append((count, mean, m2, column_id, state))
+                    else:
+                        emptied.append((column_id, state))
+                if updates:
+                    cursor.executemany("UPDATE pid_state_stats SET sample_count = %s, mean = %s, m2 = %s WHERE column_id = %s AND operating_state = %s", updates)
+                if emptied:
+                    cursor.executemany("DELETE FROM pid_state_stats WHERE column_id = %s AND operating_state = %s", emptied)
+            self.connection.commit()
+            return True
+        except Error as e:
+            logging.error(f"Failed to remove logs {sorted(log_ids)} from PID state statistics: {e}")
+            self.connection.rollback()
+            return False
+        finally:
+            cursor.close()
+
+    def _schema_cache_key(self):
+        return (self.db_config.get('host'), self.db_config.get('database'))
+
+    def get_all_defined_columns(self, refresh=False):
         """
-        self.execute_query(log_index_query)
-        self.execute_query(column_definitions_query)
-        self.execute_query(log_data_query)
-
-        if not self._column_exists('log_data', 'operating_state'):
-            self.execute_query("ALTER TABLE log_data ADD COLUMN operating_state VARCHAR(50), ADD INDEX idx_operating_state (operating_state);")
-
-        trips_table_query = """
-        CREATE TABLE IF NOT EXISTS trips (
-            trip_id INT AUTO_INCREMENT PRIMARY KEY,
-            log_id INT NOT NULL UNIQUE,
-            start_lat DECIMAL(9, 6),
-            start_lon DECIMAL(9, 6),
-            end_lat DECIMAL(9, 6),
-            end_lon DECIMAL(9, 6),
-            trip_group_id VARCHAR(64),
-            distance_miles FLOAT,
-            notes TEXT,
-            tags JSON,
-            FOREIGN KEY (log_id) REFERENCES log_index(log_id) ON DELETE CASCADE
-        ) ENGINE=InnoDB;
+        Returns {column_name: column_definitions row}. Served from a process-wide
+        cache that is refilled only on `refresh=True` or after this process
+        changes the schema. The rows are copies, so callers may change them
+        without touching the cache.
         """
-        self.execute_query(trips_table_query)
+        key = self._schema_cache_key()
+        with _defined_columns_lock:
+            cached = _defined_columns_cache.get(key)
+        if cached is None or refresh:
+            query = "SELECT column_id, column_name, sanitized_name, mysql_data_type, wide_column FROM column_definitions"
+            cached = {row['column_name'].lower(): row for row in self.fetch_all(query)}
+            with _defined_columns_lock:
+                _defined_columns_cache[key] = cached
+        return {name: dict(row) for name, row in cached.items()}
 
-        if not self._column_exists('trips', 'distance_miles'):
-            self.execute_query("ALTER TABLE trips ADD COLUMN distance_miles FLOAT;")
-        
-        logging.info("Base tables verification complete.")
+    def log_data_has_ts_ms(self):
+        """True once log_data has `ts_ms`; until then rechecked every LOG_COLUMNS_CACHE_TTL seconds."""
+        key = self._schema_cache_key()
+        checked = _log_data_ts_ms.get(key)
+        if checked is True:
+            return True
+        if checked is None or time.monotonic() - checked > LOG_COLUMNS_CACHE_TTL:
+            if self._column_exists('log_data', 'ts_ms'):
+                _log_data_ts_ms[key] = True
+                return True
+            _log_data_ts_ms[key] = time.monotonic()
+        return False
 
-    def get_pid_statistics(self, sanitized_pids):
-        if not sanitized_pids:
+    def _log_data_order(self, descending=False):
+        """ORDER BY for one log's log_data rows: the (log_id, ts_ms, data_id) primary key once it exists."""
+        direction = 'DESC' if descending else 'ASC'
+        return f"ts_ms {direction}, data_id {direction}" if self.log_data_has_ts_ms() else f"timestamp {direction}"
+
+    def invalidate_defined_columns(self):
+        with _defined_columns_lock:
+            _defined_columns_cache.pop(self._schema_cache_key(), None)
+        _log_data_ts_ms.pop(self._schema_cache_key(), None)
+
+    def _alter_log_data(self, add_clauses):
+        """Runs one ALTER TABLE with all ADD COLUMN clauses, preferring ALGORITHM=INSTANT."""
+        global _instant_ddl_supported
+        alter_query = f"ALTER TABLE log_data {', '.join(add_clauses)}"
+        attempts = [f"{alter_query}, ALGORITHM=INSTANT", alter_query] if _instant_ddl_supported is not False else [alter_query]
+        cursor = self.connection.cursor()
+        try:
+            for i, query in enumerate(attempts):
+                try:
+                    with DB_WRITE_SECONDS.time(operation='alter_log_data'):
+                        cursor.execute(query)
+                    if i == 0 and len(attempts) > 1:
+                        _instant_ddl_supported = True
+                    return True
+                except Error as e:
+                    if i == 0 and len(attempts) > 1 and e.errno in _INSTANT_RETRY_ERRNOS:
+                        logging.info(f"ALGORITHM=INSTANT not available ({e.msg}). Falling back to the default algorithm.")
+                        if e.errno in _INSTANT_UNSUPPORTED_ERRNOS:
+                            _instant_ddl_supported = False
+                        continue
+                    logging.error(f"Error altering log_data: {e}")
+                    DB_ERRORS.inc(operation='alter_log_data')
+                    return False
+        finally:
+            cursor.close()
+
+    def add_new_columns(self, new_columns, add_to_log_data=True):
+        """
+        Adds several columns at once: one INSERT into column_definitions and a
+        single ALTER TABLE on log_data. `new_columns` is a list of
+        (column_name, data_type). With `add_to_log_data=False` (narrow storage)
+        only the definitions are created. Returns {column_name: definition row}, or None.
+        """
+        if not new_columns:
             return {}
-        stats = {}
-        for pid in sanitized_pids:
-            query = f"""
-                SELECT operating_state, AVG(`{pid}`) as mean, STDDEV(`{pid}`) as std_dev
-                FROM log_data WHERE operating_state IS NOT NULL AND `{pid}` IS NOT NULL
-                GROUP BY operating_state
-            """
-            try:
-                results = self.fetch_all(query)
-                pid_stats = {row['operating_state']: {'mean': row['mean'], 'std_dev': row['std_dev']} for row in results}
-                stats[pid] = pid_stats
-            except Error as e:
-                logging.error(f"Could not calculate statistics for PID '{pid}': {e}")
-        return stats
-    
-    def get_all_defined_columns(self):
-        query = "SELECT column_id, column_name, sanitized_name, mysql_data_type FROM column_definitions"
-        return {row['column_name'].lower(): row for row in self.fetch_all(query)}
+        rows = [(name, sanitize_column_name(name), data_type, int(add_to_log_data)) for name, data_type in new_columns]
+        for name, sanitized, data_type, _ in rows:
+            logging.info(f"New column '{name}' detected. Adding to schema as '{sanitized}' with type {data_type}.")
 
-    def add_new_column(self, column_name, data_type):
-        sanitized = sanitize_column_name(column_name)
-        logging.info(f"New column '{column_name}' detected. Adding to schema as '{sanitized}' with type {data_type}.")
-        insert_query = "INSERT INTO column_definitions (column_name, sanitized_name, mysql_data_type) VALUES (%s, %s, %s)"
-        if not self.execute_query(insert_query, (column_name, sanitized, data_type)):
+        insert_query = "INSERT INTO column_definitions (column_name, sanitized_name, mysql_data_type, wide_column) VALUES (%s, %s, %s, %s)"
+        cursor = self.connection.cursor()
+        try:
+            cursor.executemany(insert_query, rows)
+            self.connection.commit()
+        except Error as e:
+            logging.error(f"Failed to register new columns: {e}")
+            self.connection.rollback()
             return None
-        alter_query = f"ALTER TABLE log_data ADD COLUMN `{sanitized}` {data_type}"
-        if not self.execute_query(alter_query):
-            logging.error(f"Failed to add column '{sanitized}' to log_data table.")
+        finally:
+            cursor.close()
+
+        names = [r[0] for r in rows]
+        format_strings = ','.join(['%s'] * len(names))
+        if add_to_log_data and not self._alter_log_data([f"ADD COLUMN `{sanitized}` {data_type}" for _, sanitized, data_type, _ in rows]):
+            logging.error(f"Failed to add columns {[r[1] for r in rows]} to log_data table. Removing their definitions.")
+            self.execute_query(f"DELETE FROM column_definitions WHERE column_name IN ({format_strings})", tuple(names))
             return None
-        return self.fetch_one("SELECT * FROM column_definitions WHERE column_name = %s", (column_name,))
+
+        self.invalidate_defined_columns()
+        added = self.fetch_all(f"SELECT * FROM column_definitions WHERE column_name IN ({format_strings})", tuple(names))
+        return {row['column_name'].lower(): row for row in added}
+
+    def add_log_data_columns(self, definitions):
+        """Creates log_data columns for PIDs that so far were only stored in narrow form."""
+        if not definitions:
+            return True
+        if not self._alter_log_data([f"ADD COLUMN `{d['sanitized_name']}` {d['mysql_data_type']}" for d in definitions]):
+            return False
+        column_ids = [d['column_id'] for d in definitions]
+        format_strings = ','.join(['%s'] * len(column_ids))
+        self.execute_query(f"UPDATE column_definitions SET wide_column = 1 WHERE column_id IN ({format_strings})", tuple(column_ids))
+        self.invalidate_defined_columns()
+        for d in definitions:
+            d['wide_column'] = 1
+        return True
+
+    def add_new_column(self, column_name, data_type):
+        added = self.add_new_columns([(column_name, data_type)])
+        return added.get(column_name.lower()) if added else None
+
+    def get_header_signatures(self):
+        return self.fetch_all("SELECT signature, headers_json, columns_json FROM header_signatures")
+
+    def save_header_signature(self, signature, headers_json, columns_json):
+        query = "INSERT INTO header_signatures (signature, headers_json, columns_json) VALUES (%s, %s, %s) ON DUPLICATE KEY UPDATE headers_json = VALUES(headers_json), columns_json = VALUES(columns_json)"
+        return self.execute_query(query, (signature, headers_json, columns_json))
+
+    def get_ingest_manifest(self, file_name=None, content_hash=None):
+        query = "SELECT file_name, file_size, file_mtime, content_hash, status, log_id, rows_committed, byte_offset FROM ingest_manifest"
+        if file_name is None and content_hash is None:
+            return self.fetch_all(query)
+        return self.fetch_all(f"{query} WHERE file_name = %s OR content_hash = %s", (file_name, content_hash))
+
+    def upsert_manifest_entry(self, file_name, file_size, file_mtime, content_hash, status, log_id=None):
+        query = """
+            INSERT INTO ingest_manifest (file_name, file_size, file_mtime, content_hash, status, log_id)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE file_size = VALUES(file_size), file_mtime = VALUES(file_mtime),
+                content_hash = VALUES(content_hash), status = VALUES(status), log_id = VALUES(log_id)
+        """
+        return self.execute_query(query, (file_name, file_size, file_mtime, content_hash, status, log_id))
+
+    def save_file_metadata(self, content_hash, file_name, log_id, start_time, last_time_offset, trip_distance, header_signature, row_count, byte_size):
+        """`start_time` is UTC; `byte_size` is the size of the (decompressed) CSV."""
+        query = """
+            INSERT INTO log_file_metadata (content_hash, file_name, log_id, start_time, last_time_offset, trip_distance, header_signature, row_count, byte_size)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE file_name = VALUES(file_name), log_id = VALUES(log_id), start_time = VALUES(start_time),
+                last_time_offset = VALUES(last_time_offset), trip_distance = VALUES(trip_distance),
+                header_signature = VALUES(header_signature), row_count = VALUES(row_count), byte_size = VALUES(byte_size)
+        """
+        if start_time is not None and start_time.tzinfo is not None:
+            start_time = start_time.replace(tzinfo=None)
+        return self.execute_query(query, (content_hash, file_name, log_id, start_time, last_time_offset, trip_distance, header_signature, row_count, byte_size))
+
+    def delete_log_for_file(self, file_name):
+        """Removes a file's log, its log_data rows and, through ON DELETE CASCADE, its other rows."""
+        self.execute_query("UPDATE ingest_manifest SET rows_committed = 0, byte_offset = 0 WHERE file_name = %s", (file_name,))
+        log_ids = [row['log_id'] for row in self.fetch_all("SELECT log_id FROM log_index WHERE file_name = %s", (file_name,))]
+        self.invalidate_log_columns(log_ids)
+        # Its committed batches were merged into the baselines; a re-ingest would count them twice.
+        if not self.subtract_log_state_stats(log_ids):
+            return False
+        # A partitioned log_data has no foreign key to cascade from.
+        if not self.delete_log_data(log_ids):
+            return False
+        return self.execute_query("DELETE FROM log_index WHERE file_name = %s", (file_name,))
+
+    def log_data_partitions(self, refresh=False):
+        """[(partition_name, values_less_than)] of a partitioned log_data in order ([] if it is not partitioned); MAXVALUE is None."""
+        key = self._schema_cache_key()
+        now = time.monotonic()
+        with _log_data_partitions_lock:
+            cached = _log_data_partitions_cache.get(key)
+        if cached is None or refresh or now - cached[0] > LOG_DATA_PARTITIONS_TTL:
+            rows = self.fetch_all(
+                "SELECT PARTITION_NAME AS name, PARTITION_DESCRIPTION AS bound FROM INFORMATION_SCHEMA.PARTITIONS "
+                "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'log_data' AND PARTITION_NAME IS NOT NULL "
+                "ORDER BY PARTITION_ORDINAL_POSITION", (self.db_config['database'],))
+            cached = (now, [(r['name'], None if r['bound'] == 'MAXVALUE' else int(r['bound'])) for r in rows])
+            with _log_data_partitions_lock:
+                _log_data_partitions_cache[key] = cached
+        return cached[1]
+
+    def ensure_log_data_partition(self, log_id):
+        """Adds partitions to a partitioned log_data so that `log_id` and the next logs have one. False if `log_id` has none."""
+        partitions = self.log_data_partitions()
+        if not partitions or partitions[-1][1] is None:
+            return True
+        width = partitions[-1][1] - (partitions[-2][1] if len(partitions) > 1 else 0)
+        if log_id + width * LOG_DATA_PARTITIONS_MIN_AHEAD < partitions[-1][1]:
+            return True
+        with self.named_lock(PARTITION_LOCK_NAME) as acquired:
+            if not acquired:
+                return log_id < partitions[-1][1]
+            partitions = self.log_data_partitions(refresh=True)
+            upper = partitions[-1][1]
+            if log_id + width * LOG_DATA_PARTITIONS_MIN_AHEAD < upper:
+                return True
+            definitions = log_data_partition_definitions(upper, log_id + width * LOG_DATA_PARTITIONS_AHEAD, width)
+            if len(partitions) + len(definitions) > MAX_PARTITIONS:
+                logging.error(f"log_data would exceed {MAX_PARTITIONS} partitions; re-run scripts/partition_log_data.py with more logs per partition.")
+                return log_id < upper
+            cursor = self.connection.cursor()
+            try:
+                cursor.execute("SET SESSION lock_wait_timeout = %s", (PARTITION_DDL_LOCK_WAIT,))
+                with DB_WRITE_SECONDS.time(operation='add_partition'):
+                    cursor.execute(f"ALTER TABLE log_data ADD PARTITION ({', '.join(definitions)})")
+                logging.info(f"Added {len(definitions)} log_data partitions (log_id < {upper + len(definitions) * width}).")
+            except Error as e:
+                # Retried with the next log while the remaining partitions still cover it.
+                logging.error(f"Could not add log_data partitions: {e}")
+                DB_ERRORS.inc(operation='add_partition')
+                return log_id < upper
+            finally:
+                cursor.execute("SET SESSION lock_wait_timeout = DEFAULT")
+                cursor.close()
+            self.log_data_partitions(refresh=True)
+            return True
+
+    def _log_index_next_id(self, cursor):
+        """log_index's next AUTO_INCREMENT value: no log_id at or above it has been handed out yet."""
+        try:
+            # Otherwise information_schema may answer from statistics up to a day old.
+            cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+        except Error:
+            pass
+        cursor.execute("SELECT AUTO_INCREMENT FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'log_index'",
+                       (self.db_config['database'],))
+        row = cursor.fetchone()
+        return row[0] if row and row[0] is not None else 0
+
+    def delete_log_data(self, log_ids):
+        """
+        Deletes the log_data rows of `log_ids`. On a partitioned log_data a
+        partition is truncated, which is instant and leaves no undo, when its
+        whole log_id range has been handed out and every log in it is being
+        deleted; other rows are deleted DELETE_CHUNK_SIZE at a time.
+        """
+        remaining = set(log_ids)
+        if not remaining:
+            return True
+        cursor = self.connection.cursor(buffered=True)
+        try:
+            partitions = self.log_data_partitions(refresh=True)
+            # A range reaching past this may still receive a new log's rows while we look.
+            next_id = self._log_index_next_id(cursor) if partitions else 0
+            lower = None
+            for name, bound in partitions:
+                ids = sorted(i for i in remaining if (lower is None or i >= lower) and (bound is None or i < bound))
+                low, lower = lower, bound
+                if not ids or bound is None or bound > next_id:
+                    continue
+                format_strings = ','.join(['%s'] * len(ids))
+                range_filter = "log_id < %s" if low is None else "log_id >= %s AND log_id < %s"
+                range_params = (bound,) if low is None else (low, bound)
+                cursor.execute(f"SELECT 1 FROM log_index WHERE {range_filter} AND log_id NOT IN ({format_strings}) LIMIT 1", range_params + tuple(ids))
+                if cursor.fetchone() is None:
+                    with DB_WRITE_SECONDS.time(operation='truncate_partition'):
+                        cursor.execute(f"ALTER TABLE log_data TRUNCATE PARTITION {name}")
+                    remaining.difference_update(ids)
+            self.connection.commit()
+            if remaining:
+                ids = sorted(remaining)
+                format_strings = ','.join(['%s'] * len(ids))
+                while True:
+                    with DB_WRITE_SECONDS.time(operation='delete_log_data'):
+                        cursor.execute(f"DELETE FROM log_data WHERE log_id IN ({format_strings}) LIMIT %s", (*ids, DELETE_CHUNK_SIZE))
+                        self.connection.commit()
+                    if cursor.rowcount < DELETE_CHUNK_SIZE:
+                        break
+            return True
+        except Error as e:
+            logging.error(f"Failed to delete log_data rows of logs {sorted(log_ids)}: {e}")
+            DB_ERRORS.inc(operation='delete_log_data')
+            self.connection.rollback()
+            return False
+        finally:
+            cursor.close()
+
+    def _write_checkpoint(self, cursor, log_id, checkpoint):
+        """Records ingest progress inside the caller's transaction."""
+        cursor.execute("UPDATE ingest_manifest SET rows_committed = %s, byte_offset = %s WHERE file_name = %s",
+                       (checkpoint.rows_committed, checkpoint.byte_offset, checkpoint.file_name))
+        cursor.execute("UPDATE log_index SET trip_duration_seconds = %s WHERE log_id = %s", (checkpoint.duration, log_id))
+        self._merge_state_stats(cursor, checkpoint.state_stats)
+
+    def count_log_rows(self, log_id):
+        """Number of data rows stored for a log, in whichever layout it uses."""
+        table = 'log_rows' if self.get_storage_layout(log_id) == STORAGE_NARROW else 'log_data'
+        return self.fetch_one(f"SELECT COUNT(*) AS row_count FROM {table} WHERE log_id = %s", (log_id,))['row_count']
 
     def is_file_processed(self, file_name):
         return self.fetch_one("SELECT 1 FROM log_index WHERE file_name = %s", (file_name,)) is not None
 
-    def insert_log_index(self, file_name, start_timestamp, duration, column_ids_json):
-        query = "INSERT INTO log_index (file_name, start_timestamp, trip_duration_seconds, column_ids_json) VALUES (%s, %s, %s, %s)"
+    def insert_log_index(self, file_name, start_timestamp, duration, column_ids_json, storage_layout=STORAGE_WIDE):
+        query = "INSERT INTO log_index (file_name, start_timestamp, trip_duration_seconds, column_ids_json, storage_layout) VALUES (%s, %s, %s, %s, %s)"
         cursor = self.connection.cursor()
         try:
-            cursor.execute(query, (file_name, start_timestamp, duration, column_ids_json))
+            cursor.execute(query, (file_name, start_timestamp, duration, column_ids_json, storage_layout))
             self.connection.commit()
             log_id = cursor.lastrowid
+            # An AUTO_INCREMENT id can be reused after deletes, so drop anything cached under it.
+            self.invalidate_log_columns([log_id])
+            if storage_layout == STORAGE_WIDE and not self.ensure_log_data_partition(log_id):
+                # Its rows could not be stored; fail here rather than part way through the file.
+                logging.error(f"log_data has no partition for log_id {log_id}; '{file_name}' was not indexed.")
+                cursor.execute("DELETE FROM log_index WHERE log_id = %s", (log_id,))
+                self.connection.commit()
+                return None
             logging.info(f"Indexed file '{file_name}' with log_id: {log_id}.")
             return log_id
         except Error as e:
-            logging.error(f"Failed to index file {file_name}: {e}")
+            if e.errno == errorcode.ER_DUP_ENTRY:
+                logging.warning(f"File '{file_name}' was indexed by another process.")
+            else:
+                logging.error(f"Failed to index file {file_name}: {e}")
             self.connection.rollback()
             return None
         finally:
             cursor.close()
 
+    def update_log_duration(self, log_id, duration):
+        return self.execute_query("UPDATE log_index SET trip_duration_seconds = %s WHERE log_id = %s", (duration, log_id))
+
     def insert_log_data_batch(self, log_id, data_rows, column_map):
         if not data_rows: return
-        sanitized_headers = list(column_map.values())
-        cols_str = ", ".join([f"`{h}`" for h in sanitized_headers])
-        placeholders = ", ".join(["%s"] * len(sanitized_headers))
-        query = f"INSERT INTO log_data (log_id, timestamp, operating_state, {cols_str}) VALUES (%s, %s, %s, {placeholders})"
         insert_tuples = []
         for row in data_rows:
-            data_tuple = [log_id, row['row_timestamp'], row['operating_state']]
+            data_tuple = [log_id, row['row_timestamp'], row.get('row_timestamp_ms', row['row_timestamp'] * 1000), row['operating_state']]
             for header in column_map.keys():
                 data_tuple.append(row.get(header, None))
             insert_tuples.append(tuple(data_tuple))
+        self.insert_log_data_tuples(log_id, column_map, insert_tuples)
+
+    def insert_log_data_tuples(self, log_id, column_map, insert_tuples, checkpoint=None):
+        """
+        Inserts pre-built (log_id, timestamp, ts_ms, operating_state, *values)
+        tuples in one commit, together with `checkpoint` if given. Returns False
+        on failure.
+        """
+        if not insert_tuples: return True
+        sanitized_headers = list(column_map.values())
+        cols_str = ", ".join([f"`{h}`" for h in sanitized_headers])
+        placeholders = ", ".join(["%s"] * len(sanitized_headers))
+        if self.log_data_has_ts_ms():
+            query = f"INSERT INTO log_data (log_id, timestamp, ts_ms, operating_state, {cols_str}) VALUES (%s, %s, %s, %s, {placeholders})"
+        else:
+            query = f"INSERT INTO log_data (log_id, timestamp, operating_state, {cols_str}) VALUES (%s, %s, %s, {placeholders})"
+            insert_tuples = [t[:2] + t[3:] for t in insert_tuples]
         cursor = self.connection.cursor()
         try:
-            cursor.executemany(query, insert_tuples)
-            self.connection.commit()
-            logging.info(f"Inserted {cursor.rowcount} data rows for log_id {log_id}.")
+            with DB_WRITE_SECONDS.time(operation='insert_log_data'):
+                cursor.executemany(query, insert_tuples)
+                row_count = cursor.rowcount
+                if checkpoint: self._write_checkpoint(cursor, log_id, checkpoint)
+                self.connection.commit()
+            DB_ROWS_WRITTEN.inc(len(insert_tuples), operation='insert_log_data')
+            logging.info(f"Inserted {row_count} data rows for log_id {log_id}.")
+            return True
         except Error as e:
             logging.error(f"Failed to batch insert data for log_id {log_id}: {e}")
+            DB_ERRORS.inc(operation='insert_log_data')
+            self.connection.rollback()
+            return False
+        finally:
+            cursor.close()
+
+    def insert_narrow_rows(self, log_id, row_tuples, sample_tuples, checkpoint=None):
+        """Inserts one batch of long-format rows: (log_id, row_seq, timestamp, state) and (log_id, column_id, row_seq, value, text_value)."""
+        if not row_tuples: return True
+        cursor = self.connection.cursor()
+        try:
+            with DB_WRITE_SECONDS.time(operation='insert_narrow'):
+                cursor.executemany("INSERT INTO log_rows (log_id, row_seq, timestamp, operating_state) VALUES (%s, %s, %s, %s)", row_tuples)
+                if sample_tuples:
+                    cursor.executemany("INSERT INTO log_samples (log_id, column_id, row_seq, value, text_value) VALUES (%s, %s, %s, %s, %s)", sample_tuples)
+                if checkpoint: self._write_checkpoint(cursor, log_id, checkpoint)
+                self.connection.commit()
+            DB_ROWS_WRITTEN.inc(len(row_tuples), operation='insert_narrow')
+            logging.info(f"Inserted {len(row_tuples)} rows ({len(sample_tuples)} samples) for log_id {log_id}.")
+            return True
+        except Error as e:
+            logging.error(f"Failed to batch insert narrow data for log_id {log_id}: {e}")
+            DB_ERRORS.inc(operation='insert_narrow')
+            self.connection.rollback()
+            return False
+        finally:
+            cursor.close()
+
+    def supports_local_infile(self):
+        """True if this connection may use LOAD DATA LOCAL INFILE and the server allows it."""
+        if not self.allow_local_infile:
+            return False
+        if self._local_infile_supported is None:
+            row = self.fetch_one("SELECT @@GLOBAL.local_infile AS local_infile")
+            self._local_infile_supported = bool(row and int(row['local_infile']) == 1)
+        return self._local_infile_supported
+
+    def load_log_data_file(self, log_id, column_map, tsv_path, expected_rows=None, state_stats=None):
+        """
+        Loads a spooled TSV of insert tuples into log_data and merges the
+        file's `state_stats` aggregates into pid_state_stats, in a single
+        transaction.
+        """
+        sanitized_headers = list(column_map.values())
+        cols_str = ", ".join([f"`{h}`" for h in sanitized_headers])
+        query = (
+            "LOAD DATA LOCAL INFILE %s INTO TABLE log_data CHARACTER SET utf8mb4 "
+            "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+            f"(log_id, timestamp, {'ts_ms' if self.log_data_has_ts_ms() else '@ts_ms'}, operating_state, {cols_str})"
+        )
+        cursor = self.connection.cursor()
+        try:
+            with DB_WRITE_SECONDS.time(operation='load_data'):
+                cursor.execute(query, (tsv_path,))
+                loaded = cursor.rowcount
+                self._merge_state_stats(cursor, state_stats)
+                self.connection.commit()
+            DB_ROWS_WRITTEN.inc(loaded, operation='load_data')
+            logging.info(f"Bulk loaded {loaded} data rows for log_id {log_id}.")
+            if expected_rows is not None and loaded != expected_rows:
+                logging.warning(f"Expected {expected_rows} rows for log_id {log_id} but LOAD DATA reported {loaded}.")
+            return True
+        except Error as e:
+            logging.error(f"Failed to bulk load data for log_id {log_id}: {e}")
+            DB_ERRORS.inc(operation='load_data')
             self.connection.rollback()
+            return False
         finally:
             cursor.close()
 
-    def get_first_valid_coord(self, log_id, lat_pid, lon_pid):
-        query = f"SELECT `{lat_pid}`, `{lon_pid}` FROM log_data WHERE log_id = %s AND `{lat_pid}` != 0 AND `{lon_pid}` != 0 ORDER BY timestamp ASC LIMIT 1"
-        return self.fetch_one(query, (log_id,))
+    def save_trip_endpoints(self, log_id, start, end):
+        """Stores a log's first and last valid (lat, lon) in `trips`."""
+        query = """
+            INSERT INTO trips (log_id, start_lat, start_lon, end_lat, end_lon) VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE start_lat = VALUES(start_lat), start_lon = VALUES(start_lon), end_lat = VALUES(end_lat), end_lon = VALUES(end_lon)
+        """
+        return self.execute_query(query, (log_id, *start, *end))
 
-    def get_last_valid_coord(self, log_id, lat_pid, lon_pid):
-        query = f"SELECT `{lat_pid}`, `{lon_pid}` FROM log_data WHERE log_id = %s AND `{lat_pid}` != 0 AND `{lon_pid}` != 0 ORDER BY timestamp DESC LIMIT 1"
-        return self.fetch_one(query, (log_id,))
+    def refresh_trip_endpoints(self, log_ids=None):
+        """
+        Recomputes the `trips` endpoints of `log_ids` (default: every log) in
+        one INSERT ... SELECT: the first and last row of each log whose
+        latitude and longitude are non-zero, wide and narrow logs alike.
+        """
+        gps_columns = find_gps_columns(self.get_all_defined_columns())
+        if not gps_columns or (log_ids is not None and not log_ids):
+            return True
+        lat, lon = gps_columns
+        in_logs = f" AND {{}}log_id IN ({', '.join(['%s'] * len(log_ids))})" if log_ids is not None else ""
+        log_params = list(log_ids or [])
+        points, params = [], []
+        if lat.get('wide_column', 1) and lon.get('wide_column', 1):
+            order = 'ts_ms' if self.log_data_has_ts_ms() else '`timestamp`'
+            lat_col, lon_col = f"`{lat['sanitized_name']}`", f"`{lon['sanitized_name']}`"
+            points.append(f"SELECT log_id, {order} AS ts, data_id AS seq, {lat_col} AS lat, {lon_col} AS lon FROM log_data "
+                          f"WHERE {lat_col} != 0 AND {lon_col} != 0{in_logs.format('')}")
+            params += log_params
+        points.append("SELECT la.log_id, la.row_seq AS ts, 0 AS seq, la.value AS lat, lo.value AS lon FROM log_samples la "
+                      "JOIN log_samples lo ON lo.log_id = la.log_id AND lo.column_id = %s AND lo.row_seq = la.row_seq "
+                      f"WHERE la.column_id = %s AND la.value != 0 AND lo.value != 0{in_logs.format('la.')}")
+        params += [lon['column_id'], lat['column_id']] + log_params
+        query = f"""
+            INSERT INTO trips (log_id, start_lat, start_lon, end_lat, end_lon)
+            SELECT log_id, start_lat, start_lon, end_lat, end_lon FROM (
+                SELECT log_id,
+                    FIRST_VALUE(lat) OVER w AS start_lat, FIRST_VALUE(lon) OVER w AS start_lon,
+                    LAST_VALUE(lat) OVER w AS end_lat, LAST_VALUE(lon) OVER w AS end_lon,
+                    ROW_NUMBER() OVER (PARTITION BY log_id ORDER BY ts, seq) AS n
+                FROM ({' UNION ALL '.join(points)}) AS points
+                WINDOW w AS (PARTITION BY log_id ORDER BY ts, seq ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+            ) AS endpoints WHERE n = 1
+            ON DUPLICATE KEY UPDATE start_lat = VALUES(start_lat), start_lon = VALUES(start_lon), end_lat = VALUES(end_lat), end_lon = VALUES(end_lon)
+        """
+        return self.execute_query(query, tuple(params))
+
+    def get_trip_endpoints(self):
+        """[{log_id, start_lat, start_lon, end_lat, end_lon}] of every log whose endpoints are known."""
+        return self.fetch_all(f"SELECT log_id, start_lat, start_lon, end_lat, end_lon FROM trips WHERE {_TRIP_ENDPOINTS_KNOWN} ORDER BY log_id")
+
+    def trip_endpoints_version(self):
+        """
+        (trips with endpoints, newest such trip_id, checksum of their endpoints):
+        it changes whenever endpoints are added, removed or updated in place.
+        """
+        row = self.fetch_one(f"""
+            SELECT COUNT(*) AS trips, COALESCE(MAX(trip_id), 0) AS newest,
+                BIT_XOR(CRC32(CONCAT_WS(',', log_id, start_lat, start_lon, end_lat, end_lon))) AS checksum
+            FROM trips WHERE {_TRIP_ENDPOINTS_KNOWN}
+        """)
+        return row['trips'], row['newest'], row['checksum']
 
     def get_all_logs(self):
         query = "SELECT li.log_id, li.file_name, li.start_timestamp, li.trip_duration_seconds, t.distance_miles FROM log_index li LEFT JOIN trips t ON li.log_id = t.log_id ORDER BY li.start_timestamp DESC"
         return self.fetch_all(query)
     
-    def get_data_for_log(self, log_id, pids_to_fetch=None):
-        log_index_entry = self.fetch_one("SELECT column_ids_json FROM log_index WHERE log_id = %s", (log_id,))
+    def _log_columns(self, log_id, pids_to_fetch=None):
+        """(storage_layout, [(column_id, sanitized_name)], normalized_names) of a log's PIDs; raises ValueError for unknown logs."""
+        storage_layout, columns, normalized_names = self._cached_log_columns(log_id)
+        if pids_to_fetch:
+            columns = [(i, s) for i, s in columns if normalized_names[s] in pids_to_fetch]
+        return storage_layout, list(columns), dict(normalized_names)
+
+    def _cached_log_columns(self, log_id):
+        key = self._schema_cache_key() + (log_id,)
+        with _log_columns_lock:
+            entry = _log_columns_cache.get(key)
+            if entry is not None and time.monotonic() - entry[0] < LOG_COLUMNS_CACHE_TTL:
+                _log_columns_cache.move_to_end(key)
+                LOG_COLUMNS_CACHE_LOOKUPS.inc(result='hit')
+                return entry[1]
+        LOG_COLUMNS_CACHE_LOOKUPS.inc(result='miss')
+        resolved = self._resolve_log_columns(log_id)
+        with _log_columns_lock:
+            _log_columns_cache[key] = (time.monotonic(), resolved)
+            _log_columns_cache.move_to_end(key)
+            while len(_log_columns_cache) > LOG_COLUMNS_CACHE_SIZE:
+                _log_columns_cache.popitem(last=False)
+        return resolved
+
+    def invalidate_log_columns(self, log_ids=None):
+        """Drops cached columns of `log_ids`, or of every log of this database."""
+        prefix = self._schema_cache_key()
+        with _log_columns_lock:
+            keys = [prefix + (log_id,) for log_id in log_ids] if log_ids is not None else [k for k in _log_columns_cache if k[:2] == prefix]
+            for key in keys:
+                _log_columns_cache.pop(key, None)
+
+    def _resolve_log_columns(self, log_id):
+        log_index_entry = self.fetch_one("SELECT column_ids_json, storage_layout FROM log_index WHERE log_id = %s", (log_id,))
         if not log_index_entry: raise ValueError(f"No log found with log_id: {log_id}")
+        storage_layout = log_index_entry.get('storage_layout')
         column_ids_json = log_index_entry.get('column_ids_json')
-        if not column_ids_json: return [], [], {}, {}
+        if not column_ids_json: return storage_layout, [], {}
         column_ids = json.loads(column_ids_json)
-        if not column_ids: return [], [], {}, {}
+        if not column_ids: return storage_layout, [], {}
         format_strings = ','.join(['%s'] * len(column_ids))
-        cols_query = f"SELECT sanitized_name, column_name FROM column_definitions WHERE column_id IN ({format_strings})"
+        cols_query = f"SELECT column_id, sanitized_name, column_name FROM column_definitions WHERE column_id IN ({format_strings})"
         cursor = self.connection.cursor(dictionary=True)
         cursor.execute(cols_query, tuple(column_ids))
         column_info = cursor.fetchall()
         cursor.close()
-        sanitized_names = [c['sanitized_name'] for c in column_info]
         normalized_names = {c['sanitized_name']: c['column_name'] for c in column_info}
-        if not sanitized_names: return [], [], {}, {}
-        
-        if pids_to_fetch:
-            requested_sanitized = [s for s, n in normalized_names.items() if n in pids_to_fetch]
-            sanitized_names = requested_sanitized
+        columns = [(c['column_id'], c['sanitized_name']) for c in column_info]
+        return storage_layout, columns, normalized_names
+
+    def get_data_for_log(self, log_id, pids_to_fetch=None):
+        storage_layout, columns, normalized_names = self._log_columns(log_id, pids_to_fetch)
+        if not normalized_names: return [], [], {}, {}
+        sanitized_names = [name for _, name in columns]
         
         statistics = self.get_pid_statistics(sanitized_names)
-        cols_for_select = ", ".join([f"`{name}`" for name in sanitized_names])
-        data_query = f"SELECT data_id, timestamp, operating_state, {cols_for_select} FROM log_data WHERE log_id = %s ORDER BY timestamp ASC"
-        data_rows = self.fetch_all(data_query, (log_id,))
+        if storage_layout == STORAGE_NARROW:
+            data_rows = self._get_narrow_data(log_id, columns)
+        else:
+            cols_for_select = ", ".join([f"`{name}`" for name in sanitized_names])
+            data_query = f"SELECT data_id, timestamp, operating_state, {cols_for_select} FROM log_data WHERE log_id = %s ORDER BY {self._log_data_order()}"
+            data_rows = self.fetch_all(data_query, (log_id,))
         return data_rows, ['data_id', 'timestamp', 'operating_state'] + sanitized_names, statistics, normalized_names
 
+    def stream_data_for_log(self, log_id, pids_to_fetch=None, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Like `get_data_for_log`, but the rows come as an iterator of lists of at
+        most `chunk_size` row dicts, so memory does not grow with the log.
+        Returns (chunks, columns, statistics, normalized_names). Wide logs are
+        read through an unbuffered cursor that keeps this connection busy until
+        `chunks` is exhausted or closed: run any other queries before iterating.
+        """
+        storage_layout, columns, normalized_names = self._log_columns(log_id, pids_to_fetch)
+        if not normalized_names: return iter(()), [], {}, {}
+        sanitized_names = [name for _, name in columns]
+        statistics = self.get_pid_statistics(sanitized_names)
+        if storage_layout == STORAGE_NARROW:
+            chunks = self._iter_narrow_chunks(log_id, columns, chunk_size)
+        else:
+            cols_for_select = ", ".join([f"`{name}`" for name in sanitized_names])
+            data_query = f"SELECT data_id, timestamp, operating_state, {cols_for_select} FROM log_data WHERE log_id = %s ORDER BY {self._log_data_order()}"
+            chunks = self._iter_unbuffered(data_query, (log_id,), chunk_size)
+        return chunks, ['data_id', 'timestamp', 'operating_state'] + sanitized_names, statistics, normalized_names
+
+    def _iter_unbuffered(self, query, params, chunk_size):
+        cursor = self.connection.cursor(dictionary=True, buffered=False)
+        exhausted = False
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    exhausted = True
+                    return
+                yield rows
+        finally:
+            if not exhausted:
+                # Stopped early (e.g. the client went away): drop the rest of the result set.
+                try: self.connection.consume_results()
+                except Error: pass
+            cursor.close()
+
+    def _get_narrow_data(self, log_id, columns):
+        """Pivots long-format samples back into wide row dicts. `columns` is [(column_id, sanitized_name)]."""
+        rows = self.fetch_all("SELECT row_seq AS data_id, timestamp, operating_state FROM log_rows WHERE log_id = %s ORDER BY row_seq ASC", (log_id,))
+        return self._pivot_samples(log_id, rows, columns)
+
+    def _iter_narrow_chunks(self, log_id, columns, chunk_size):
+        """`_get_narrow_data` a row_seq range at a time."""
+        last_seq = -1
+        while True:
+            rows = self.fetch_all("SELECT row_seq AS data_id, timestamp, operating_state FROM log_rows WHERE log_id = %s AND row_seq > %s ORDER BY row_seq ASC LIMIT %s",
+                                  (log_id, last_seq, chunk_size))
+            if not rows:
+                return
+            last_seq = rows[-1]['data_id']
+            yield self._pivot_samples(log_id, rows, columns, (rows[0]['data_id'], last_seq))
+
+    def _pivot_samples(self, log_id, rows, columns, seq_range=None):
+        """Fills `rows` (ordered log_rows dicts) with their samples, optionally only those in an inclusive row_seq range."""
+        if not rows or not columns:
+            return rows
+        names_by_id = dict(columns)
+        rows_by_seq = {}
+        for row in rows:
+            for name in names_by_id.values():
+                row[name] = None
+            rows_by_seq[row['data_id']] = row
+        format_strings = ','.join(['%s'] * len(names_by_id))
+        samples_query = f"SELECT column_id, row_seq, value, text_value FROM log_samples WHERE log_id = %s AND column_id IN ({format_strings})"
+        params = (log_id,) + tuple(names_by_id)
+        if seq_range:
+            samples_query += " AND row_seq BETWEEN %s AND %s"
+            params += tuple(seq_range)
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(samples_query, params)
+            for column_id, row_seq, value, text_value in cursor:
+                rows_by_seq[row_seq][names_by_id[column_id]] = value if value is not None else text_value
+        finally:
+            cursor.close()
+        return rows
+
+    def get_storage_layout(self, log_id):
+        entry = self.fetch_one("SELECT storage_layout FROM log_index WHERE log_id = %s", (log_id,))
+        return entry['storage_layout'] if entry else None
+
+    def update_operating_states(self, log_id, updates):
+        """Applies (operating_state, data_id) pairs to whichever table holds the log's rows."""
+        if self.get_storage_layout(log_id) == STORAGE_NARROW:
+            query = "UPDATE log_rows SET operating_state = %s WHERE log_id = %s AND row_seq = %s"
+            params = [(state, log_id, row_seq) for state, row_seq in updates]
+        else:
+            # log_id lets a partitioned log_data prune to the log's partition.
+            query = "UPDATE log_data SET operating_state = %s WHERE log_id = %s AND data_id = %s"
+            params = [(state, log_id, data_id) for state, data_id in updates]
+        cursor = self.connection.cursor()
+        try:
+            cursor.executemany(query, params)
+            self.connection.commit()
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
     def get_all_trip_groups(self):
         query = "SELECT trip_group_id, COUNT(trip_id) as trip_count, AVG(start_lat) as avg_start_lat, AVG(start_lon) as avg_start_lon, AVG(end_lat) as avg_end_lat, AVG(end_lon) as avg_end_lon FROM trips WHERE trip_group_id IS NOT NULL GROUP BY trip_group_id HAVING trip_count > 1 ORDER BY trip_count DESC;"
         return self.fetch_all(query)
@@ -261,5 +1067,11 @@ class DatabaseManager:
         return {"total_groups": len([g for g in groups if g['count'] > 1]), "total_trips_grouped": total_trips_in_groups, "total_logs": total_logs, "group_counts": group_counts}
 
     def close(self):
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
\ No newline at end of file
+        """Returns a pooled connection to its pool, or closes a direct one."""
+        connection, self.connection = self.connection, None
+        if connection is None:
+            return
+        if self._pool is not None:
+            self._pool.release(connection)
+        elif connection.is_connected():
+            connection.close()
\ No newline at end of file
@@ -0,0 +1,154 @@
+# FILE: backend/log2db/ingest_service.py
+#
+# --- VERSION 1.0.0 ---
+# - Background ingestion for the file watcher. The watchdog handler only
+#   calls `submit()`; a bounded queue feeds a pool of worker threads.
+# - A file is ingested only once its size and mtime have stopped changing for
+#   `stable_seconds`, so files still being copied are not read truncated.
+# - A full queue blocks `submit()` (backpressure on the observer). Failed
+#   files are retried with exponential backoff up to `max_retries` times.
+# - Workers take a DatabaseManager per file and close it afterwards, which
+#   hands the connection back when the app has configured a pool.
+# - Compressed logs and zip archives are accepted; every CSV in an archive is
+#   ingested, and the archive is retried if any of them fails.
+# -----------------------------
+
+import os
+import time
+import queue
+import logging
+import threading
+
+from .core import process_log_file
+from .sources import iter_log_sources
+from .writers import DEFAULT_WRITER, STORAGE_WIDE
+
+class IngestService:
+    def __init__(self, db_manager_class, db_config, workers=2, max_queue=100, stable_seconds=2.0,
+                 poll_interval=0.5, max_wait_seconds=600, max_retries=3, backoff_seconds=5.0, writer=DEFAULT_WRITER, storage=STORAGE_WIDE):
+        self.db_manager_class = db_manager_class
+        self.db_config = db_config
+        self.workers = workers
+        self.stable_seconds = stable_seconds
+        self.poll_interval = poll_interval
+        self.max_wait_seconds = max_wait_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.writer = writer
+        self.storage = storage
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._threads = []
+        self._stats = {'submitted': 0, 'processed': 0, 'skipped': 0, 'failed': 0, 'retries': 0, 'in_flight': 0}
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker_loop, name=f"ingest-worker-{i+1}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        logging.info(f"Ingest service started with {self.workers} workers (queue size {self._queue.maxsize}).")
+
+    def stop(self, timeout=None):
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def submit(self, file_path, attempt=0, block=True, timeout=None):
+        """Queues a file for ingestion. Blocks while the queue is full unless `block` is False."""
+        file_path = os.path.abspath(file_path)
+        with self._lock:
+            if attempt == 0 and file_path in self._pending:
+                return True
+            self._pending.add(file_path)
+        try:
+            self._queue.put((file_path, attempt), block=block, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self._pending.discard(file_path)
+            logging.warning(f"INGEST: Queue full, could not accept '{file_path}'.")
+            return False
+        with self._lock:
+            self._stats['submitted'] += 1
+        return True
+
+    def status(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending_files'] = len(self._pending)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['queue_capacity'] = self._queue.maxsize
+        stats['workers'] = len(self._threads)
+        return stats
+
+    def wait_until_stable(self, file_path):
+        """Returns True once size and mtime are unchanged for `stable_seconds`, False if the file vanished or never settled."""
+        deadline = time.monotonic() + self.max_wait_seconds
+        last_seen = None
+        stable_since = None
+        while time.monotonic() < deadline:
+            try:
+                st = os.stat(file_path)
+            except FileNotFoundError:
+                return False
+            current = (st.st_size, st.st_mtime)
+            now = time.monotonic()
+            if current != last_seen:
+                last_seen, stable_since = current, now
+            elif now - stable_since >= self.stable_seconds:
+                return True
+            time.sleep(self.poll_interval)
+        return False
+
+    def _worker_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            file_path, attempt = item
+            db_manager = None
+            with self._lock:
+                self._stats['in_flight'] += 1
+            try:
+                if not self.wait_until_stable(file_path):
+                    logging.warning(f"INGEST: '{file_path}' disappeared or never stopped changing. Dropping it.")
+                    self._finish(file_path, 'failed')
+                    continue
+                db_manager = self.db_manager_class(self.db_config)
+                results = [process_log_file(source, db_manager, writer=self.writer, storage=self.storage) for source in iter_log_sources(file_path)]
+                if results and all(success for success, _ in results):
+                    self._finish(file_path, 'processed' if any(status == 'processed' for _, status in results) else 'skipped')
+                else:
+                    self._retry_or_fail(file_path, attempt)
+            except Exception as e:
+                logging.error(f"INGEST: Unhandled error ingesting '{file_path}': {e}", exc_info=True)
+                self._retry_or_fail(file_path, attempt)
+            finally:
+                # One connection per file; with a pool configured this just returns it.
+                if db_manager is not None:
+                    try: db_manager.close()
+                    except Exception: pass
+                with self._lock:
+                    self._stats['in_flight'] -= 1
+                self._queue.task_done()
+
+    def _finish(self, file_path, outcome):
+        with self._lock:
+            self._pending.discard(file_path)
+            self._stats[outcome] += 1
+
+    def _retry_or_fail(self, file_path, attempt):
+        if attempt >= self.max_retries:
+            logging.error(f"INGEST: Giving up on '{file_path}' after {attempt + 1} attempts.")
+            self._finish(file_path, 'failed')
+            return
+        delay = self.backoff_seconds * (2 ** attempt)
+        logging.warning(f"INGEST: Retrying '{file_path}' in {delay:.0f}s (attempt {attempt + 2} of {self.max_retries + 1}).")
+        with self._lock:
+            self._stats['retries'] += 1
+        timer = threading.Timer(delay, self.submit, args=(file_path,), kwargs={'attempt': attempt + 1})
+        timer.daemon = True
+        timer.start()
@@ -0,0 +1,15 @@
+# FILE: backend/log2db/insert_tuples.py
+#
+# --- VERSION 1.0.0 ---
+# - The layout of the insert tuples built by `core.build_insert_tuples`:
+#   (log_id, timestamp, ts_ms, operating_state, value, value, ...), one value
+#   per `column_map` entry. The writers, `StateStatsAccumulator` and
+#   `EndpointTracker` index them through these constants. They live in their
+#   own module because `core` imports all of those.
+# -----------------------------
+
+LOG_ID_INDEX = 0
+TIMESTAMP_INDEX = 1
+TS_MS_INDEX = 2
+STATE_INDEX = 3
+FIRST_VALUE_INDEX = 4
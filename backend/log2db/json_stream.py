@@ -0,0 +1,70 @@
+# FILE: backend/log2db/json_stream.py
+#
+# --- VERSION 1.0.1 ---
+# - A document whose rows fail to stream ends with `error_fields` after the
+#   partial array instead of being cut off, so clients can tell.
+#
+# --- VERSION 1.0.0 ---
+# - Incremental JSON encoding for large API responses: `iter_json_document`
+#   writes the small fields of a response first and then one long array chunk
+#   by chunk, so a log's rows are sent as they are read from the database.
+# - Values are converted the way Flask's `jsonify` does (Decimal -> string,
+#   dates -> HTTP date), so streamed and buffered responses look the same.
+# - Uses `orjson` when it is installed; otherwise the standard library encoder.
+# -----------------------------
+
+import json
+import decimal
+from datetime import date
+
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(value):
+    if isinstance(value, date):
+        return http_date(value)
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(value):
+        return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+else:
+    _encoder = json.JSONEncoder(default=_default, separators=(',', ':'))
+
+    def dumps(value):
+        return _encoder.encode(value).encode('utf-8')
+
+def iter_json_document(fields, array_key, chunks, error_fields=None):
+    """
+    Yields the UTF-8 JSON of `fields` plus `array_key`: the concatenation of
+    `chunks` (an iterable of lists), one piece per chunk.
+
+    With `error_fields` (e.g. {"error": "..."}) a failure while reading or
+    encoding `chunks` still ends a valid document: the array holds the rows
+    sent so far and `error_fields` follow it. The exception is re-raised
+    after that last piece, so the caller can log it.
+    """
+    head = dumps(fields)
+    yield (head[:-1] + b',' if len(head) > 2 else b'{') + dumps(array_key) + b':['
+    first = True
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            body = dumps(chunk)[1:-1]
+            yield body if first else b',' + body
+            first = False
+    except Exception:
+        if error_fields is None:
+            raise
+        yield b'],' + dumps(error_fields)[1:]
+        raise
+    yield b']}'
@@ -0,0 +1,109 @@
+# FILE: backend/log2db/manifest.py
+#
+# --- VERSION 1.0.0 ---
+# - Tracks every file seen by ingestion in the `ingest_manifest` table:
+#   file name, size, mtime, SHA-256 of the content, status and log_id.
+# - A directory scan loads the whole manifest in one query and skips
+#   unchanged files in memory. Renamed copies of an already ingested file are
+#   caught by their content hash before any parsing starts, and files left
+#   'failed' or 'processing' by an earlier run are cleaned up and retried.
+# - Entries also hold an ingest checkpoint: data rows committed and the byte
+#   offset in the file just past them. An interrupted file whose content is
+#   unchanged resumes from there instead of starting over.
+# - A checkpoint also carries the batch's per-state PID aggregates, which
+#   are merged into `pid_state_stats` in the batch's transaction.
+# - `hash_stream` hashes any binary stream, so compressed logs are hashed
+#   over their decompressed content (a .csv.gz of an ingested .csv is a
+#   duplicate).
+# -----------------------------
+
+import os
+import hashlib
+import logging
+from collections import namedtuple
+
+STATUS_PROCESSING = 'processing'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+STATUS_DUPLICATE = 'duplicate'
+STATUS_NO_DATA = 'no_data'
+
+# Statuses that mean "nothing more to do for this file".
+FINISHED_STATUSES = (STATUS_DONE, STATUS_DUPLICATE, STATUS_NO_DATA)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Progress saved with each committed batch; `duration` is the trip duration so far
+# and `state_stats` the batch's `pid_state_stats` aggregates (see state_stats.py).
+Checkpoint = namedtuple('Checkpoint', ['file_name', 'rows_committed', 'byte_offset', 'duration', 'state_stats'], defaults=(None,))
+
+def hash_stream(f):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_file(file_path):
+    with open(file_path, 'rb') as f:
+        return hash_stream(f)
+
+def file_fingerprint(file_path):
+    """(size, mtime) as stored in the manifest."""
+    st = os.stat(file_path)
+    return st.st_size, round(st.st_mtime, 6)
+
+class IngestManifest:
+    def __init__(self, rows=()):
+        self._by_name = {}
+        self._done_by_hash = {}
+        for row in rows:
+            self._remember(row)
+
+    @classmethod
+    def load(cls, db_manager):
+        """Loads the full manifest in a single query."""
+        manifest = cls(db_manager.get_ingest_manifest())
+        logging.info(f"Loaded ingest manifest with {len(manifest._by_name)} entries.")
+        return manifest
+
+    @classmethod
+    def load_for(cls, db_manager, file_name, content_hash):
+        """Loads only the entries relevant to one file (by name or by content)."""
+        return cls(db_manager.get_ingest_manifest(file_name=file_name, content_hash=content_hash))
+
+    def _remember(self, row):
+        self._by_name[row['file_name']] = row
+        if row.get('content_hash') and row['status'] == STATUS_DONE:
+            self._done_by_hash.setdefault(row['content_hash'], row['file_name'])
+
+    def entry(self, file_name):
+        return self._by_name.get(file_name)
+
+    def is_unchanged(self, file_name, fingerprint):
+        """True if the file finished ingesting before and has not changed since."""
+        entry = self._by_name.get(file_name)
+        if not entry or entry['status'] not in FINISHED_STATUSES:
+            return False
+        # Entries migrated from log_index have no fingerprint; trust the name as before.
+        if entry.get('file_size') is None:
+            return True
+        return (entry['file_size'], round(entry['file_mtime'], 6)) == fingerprint
+
+    def duplicate_of(self, file_name, content_hash):
+        """Name of another, already ingested file with the same content, if any."""
+        other = self._done_by_hash.get(content_hash)
+        return other if other and other != file_name else None
+
+    def resume_point(self, file_name, content_hash):
+        """The entry of an interrupted ingest of this exact content, if it has a usable checkpoint."""
+        entry = self._by_name.get(file_name)
+        if not entry or entry['status'] not in (STATUS_PROCESSING, STATUS_FAILED):
+            return None
+        if entry.get('content_hash') != content_hash or not entry.get('log_id') or not entry.get('rows_committed'):
+            return None
+        return entry
+
+    def record(self, db_manager, file_name, fingerprint, content_hash, status, log_id=None):
+        size, mtime = fingerprint
+        db_manager.upsert_manifest_entry(file_name, size, mtime, content_hash, status, log_id)
+        self._remember({'file_name': file_name, 'file_size': size, 'file_mtime': mtime, 'content_hash': content_hash, 'status': status, 'log_id': log_id})
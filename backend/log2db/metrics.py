@@ -0,0 +1,214 @@
+# FILE: backend/log2db/metrics.py
+#
+# --- VERSION 1.0.1 ---
+# - `Gauge` for values set from a snapshot. The ingest service and
+#   connection pool figures are registered gauges, so they carry `# HELP`
+#   lines like every other metric.
+# - Streamed responses are timed until the body is closed (see app.py).
+#
+# --- VERSION 1.0.0 ---
+# - Minimal in-process metrics (counters and histograms with labels) rendered
+#   in the Prometheus text format by `render_text()`, served by the Flask app
+#   at `/api/metrics`. No client library needed.
+# - Metrics are per process: the watcher's ingest threads share the app's
+#   registry, `python -m log2db --workers N` workers each have their own.
+# -----------------------------
+
+import time
+import threading
+from contextlib import contextmanager
+
+# Seconds; covers a 1 ms query up to a multi-minute file.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + [f'{n}="{v}"' for n, v in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(n, '') for n in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+class Gauge:
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(n, '') for n in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, dict(s, counts=list(s['counts']))) for key, s in self._series.items())
+        lines = []
+        for key, s in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, s['counts']):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', _format_value(float(bound)))])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {s['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(s['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {s['count']}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render_text(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# --- Ingestion ---
+INGEST_STAGE_SECONDS = REGISTRY.histogram(
+    'log2db_ingest_stage_seconds', "Time spent per ingest stage (per file, or per batch for parse/classify/timestamp/insert).", ['stage'])
+INGEST_FILES = REGISTRY.counter('log2db_ingest_files_total', "Files handled by process_log_file, by outcome.", ['status'])
+INGEST_ROWS = REGISTRY.counter('log2db_ingest_rows_total', "Data rows read from CSV files.")
+INGEST_BYTES = REGISTRY.counter('log2db_ingest_bytes_total', "Bytes of CSV files that were ingested.")
+INGEST_ERRORS = REGISTRY.counter('log2db_ingest_errors_total', "Ingest failures, by stage.", ['stage'])
+
+# --- Database ---
+DB_WRITE_SECONDS = REGISTRY.histogram('log2db_db_write_seconds', "Latency of one write (batch insert, bulk load or log_data ALTER), including commit.", ['operation'])
+DB_ROWS_WRITTEN = REGISTRY.counter('log2db_db_rows_written_total', "Data rows committed, by operation.", ['operation'])
+DB_ERRORS = REGISTRY.counter('log2db_db_errors_total', "Failed data writes and schema changes, by operation.", ['operation'])
+LOG_COLUMNS_CACHE_LOOKUPS = REGISTRY.counter('log2db_log_columns_cache_lookups_total', "Log column lookups by get_data_for_log/stream_data_for_log, by cache result.", ['result'])
+DB_POOL_WAIT_SECONDS = REGISTRY.histogram('log2db_db_pool_wait_seconds', "Time to get a connection from the pool, including health checks and new connections.")
+
+# --- Snapshots (set by app.py from IngestService.status() and ConnectionPool.stats() on each scrape) ---
+INGEST_SERVICE_GAUGES = {key: REGISTRY.gauge(f'log2db_ingest_service_{key}', documentation) for key, documentation in {
+    'submitted': "Files handed to the watcher's ingest service since it started.",
+    'processed': "Files the ingest service ingested since it started.",
+    'skipped': "Files the ingest service found already ingested since it started.",
+    'failed': "Files the ingest service gave up on (unstable, or out of retries) since it started.",
+    'retries': "Failed ingest attempts scheduled for a retry since the ingest service started.",
+    'in_flight': "Files being ingested right now.",
+    'pending_files': "Files submitted and not yet finished, queued or in flight.",
+    'queue_depth': "Files waiting in the ingest queue.",
+    'queue_capacity': "Capacity of the ingest queue.",
+    'workers': "Ingest service worker threads.",
+}.items()}
+DB_POOL_GAUGES = {key: REGISTRY.gauge(f'log2db_db_pool_{key}', documentation) for key, documentation in {
+    'acquired': "Connections handed out by the pool since it was created.",
+    'created': "Connections the pool opened.",
+    'recycled': "Connections the pool closed at the end of their lifetime or after the pool was closed.",
+    'broken': "Connections the pool discarded after a failed health check or session reset.",
+    'timeouts': "Callers that timed out waiting for a pooled connection.",
+    'waits': "Callers that had to wait for a pooled connection.",
+    'size': "Maximum number of pooled connections.",
+    'open': "Connections currently open.",
+    'idle': "Open connections waiting in the pool.",
+    'in_use': "Open connections handed out.",
+}.items()}
+
+# --- HTTP (filled in by app.py) ---
+HTTP_REQUEST_SECONDS = REGISTRY.histogram('log2db_http_request_seconds', "Flask request latency by endpoint.", ['endpoint', 'method', 'status'])
+
+def timed_iter(iterable, stage):
+    """Yields from `iterable`, adding the time spent producing each item to INGEST_STAGE_SECONDS."""
+    iterator = iter(iterable)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        INGEST_STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+        yield item
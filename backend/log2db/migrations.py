@@ -0,0 +1,557 @@
+# FILE: backend/log2db/migrations.py
+#
+# --- VERSION 1.0.1 ---
+# - Shadow copies give the copy's constraints fresh names that no table
+#   uses, so a table can be rebuilt again after a swap.
+# - Migrations marked `manual` (every `.sql` file: the optional GPX tables)
+#   are never applied at app startup, which warns about them instead;
+#   `scripts/migrate.py` and `scripts/create_gpx_tables.py` apply them.
+# - 0009 (log_data.ts_ms) uses an expression default and needs MySQL
+#   8.0.13 or later; on older servers it fails with that message.
+#
+# --- VERSION 1.0.0 ---
+# - Versioned schema migrations recorded in the `schema_migrations` table.
+#   `ensure_base_tables_exist` calls `apply_migrations`, which costs a single
+#   `SELECT version FROM schema_migrations` when the schema is current.
+# - Migrations are the Python functions registered below with `@migration`
+#   plus the `.sql` files in `backend/migrations/` (version = file name), all
+#   applied in version order, once, under the 'log2db_migrations' lock.
+# - `online_alter` changes a table while it keeps serving reads and writes:
+#   ALGORITHM=INSTANT, then ALGORITHM=INPLACE with LOCK=NONE, and otherwise
+#   `shadow_copy`, which copies the rows into an altered copy of the table in
+#   key-ordered chunks (throttled, with progress logged), keeps it current
+#   with triggers and swaps it in with one atomic RENAME TABLE.
+# - Migrations registered with `online=True` rewrite a large table. At app
+#   startup they are deferred (with a warning) when that table holds rows;
+#   `scripts/migrate.py` applies them.
+# -----------------------------
+
+import os
+import re
+import time
+import logging
+from collections import namedtuple
+
+from mysql.connector import Error, errorcode
+
+from .db_manager import _INSTANT_RETRY_ERRNOS
+from .core import SCHEMA_LOCK_NAME
+from .writers import STORAGE_WIDE
+
+MIGRATION_LOCK_NAME = 'log2db_migrations'
+MIGRATION_LOCK_TIMEOUT = 600
+SQL_MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+# Shadow-copy defaults: rows per chunk, seconds slept per second spent copying
+# (0.5 keeps the copy to about two thirds of the server's time), seconds
+# between progress lines.
+COPY_CHUNK_SIZE = 5000
+COPY_THROTTLE = 0.5
+COPY_PROGRESS_INTERVAL = 10
+
+# Expression defaults such as `DEFAULT (timestamp * 1000)` need MySQL 8.0.13.
+EXPRESSION_DEFAULT_MIN_VERSION = (8, 0, 13)
+
+Migration = namedtuple('Migration', ['version', 'description', 'apply', 'table', 'online', 'manual'], defaults=(None, False, False))
+
+_MIGRATIONS = []
+
+def migration(version, description, table=None, online=False):
+    """Registers `apply(db_manager, copy_options)` as a schema migration."""
+    def register(apply):
+        _MIGRATIONS.append(Migration(version, description, apply, table, online))
+        return apply
+    return register
+
+def _execute(db_manager, statement, params=None):
+    """Runs one statement and commits; unlike `execute_query` it raises on failure."""
+    cursor = db_manager.connection.cursor()
+    try:
+        cursor.execute(statement, params or ())
+        if cursor.with_rows:
+            cursor.fetchall()
+        db_manager.connection.commit()
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+# --- Online DDL ---------------------------------------------------------------
+
+def online_alter(db_manager, table, clauses, **copy_options):
+    """
+    Applies ALTER TABLE `clauses` without blocking reads or writes for long.
+    Returns 'instant', 'inplace' or 'copy', the method that was used.
+    """
+    alter_query = f"ALTER TABLE {table} {', '.join(clauses)}"
+    for method, options in (('instant', "ALGORITHM=INSTANT"), ('inplace', "ALGORITHM=INPLACE, LOCK=NONE")):
+        try:
+            _execute(db_manager, f"{alter_query}, {options}")
+            return method
+        except Error as e:
+            if e.errno not in _INSTANT_RETRY_ERRNOS:
+                raise
+            logging.info(f"{options} not available for {table} ({e.msg}).")
+    shadow_copy(db_manager, table, clauses, **copy_options)
+    return 'copy'
+
+def _columns(db_manager, table):
+    rows = db_manager.fetch_all(
+        "SELECT COLUMN_NAME AS name, EXTRA AS extra FROM INFORMATION_SCHEMA.COLUMNS "
+        "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s ORDER BY ORDINAL_POSITION",
+        (db_manager.db_config['database'], table))
+    # Generated columns are computed by the server and cannot be written
+    # (EXTRA 'DEFAULT_GENERATED' only marks an expression default).
+    return [r['name'] for r in rows if not re.search(r'\b(VIRTUAL|STORED) GENERATED\b', (r['extra'] or '').upper())]
+
+def table_indexes(db_manager, table):
+    """{index_name: [column, ...]} of `table`; the primary key is 'PRIMARY'."""
+    rows = db_manager.fetch_all(
+        "SELECT INDEX_NAME AS name, COLUMN_NAME AS col FROM INFORMATION_SCHEMA.STATISTICS "
+        "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s ORDER BY INDEX_NAME, SEQ_IN_INDEX",
+        (db_manager.db_config['database'], table))
+    indexes = {}
+    for r in rows:
+        indexes.setdefault(r['name'], []).append(r['col'])
+    return indexes
+
+def _shadow_table_ddl(db_manager, table, shadow, keep_foreign_keys=True):
+    """
+    SHOW CREATE TABLE of `table` renamed to `shadow`. Constraint names are
+    unique per schema and the live table keeps its own until the swap, so
+    every constraint gets a fresh `<table>_ibfk_N` / `<table>_chk_N` name
+    that no table uses yet, whatever it was called before.
+    """
+    ddl = db_manager.fetch_one(f"SHOW CREATE TABLE {table}")['Create Table']
+    ddl = ddl.replace(f"CREATE TABLE `{table}`", f"CREATE TABLE `{shadow}`", 1)
+    if not keep_foreign_keys:
+        # One definition per line; drop each FOREIGN KEY line with the comma that precedes it.
+        ddl = re.sub(r",\n\s*CONSTRAINT `[^`]+` FOREIGN KEY [^\n]*?(?=,?\n)", "", ddl)
+    taken = {r['name'] for r in db_manager.fetch_all(
+        "SELECT CONSTRAINT_NAME AS name FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS WHERE CONSTRAINT_SCHEMA = %s",
+        (db_manager.db_config['database'],))}
+
+    def fresh_name(match):
+        prefix = f"{table}_ibfk_" if match.group(1) == 'FOREIGN KEY' else f"{table}_chk_"
+        n = 1
+        while f"{prefix}{n}" in taken:
+            n += 1
+        taken.add(f"{prefix}{n}")
+        return f"CONSTRAINT `{prefix}{n}` {match.group(1)}"
+    return re.sub(r"CONSTRAINT `[^`]+` (FOREIGN KEY|CHECK)", fresh_name, ddl)
+
+def _drop_shadow_objects(db_manager, table, shadow, triggers):
+    for trigger in triggers:
+        _execute(db_manager, f"DROP TRIGGER IF EXISTS {trigger}")
+    _execute(db_manager, f"DROP TABLE IF EXISTS {shadow}")
+
+def shadow_copy(db_manager, table, clauses, key='data_id', expressions=None, partitioning=None, keep_foreign_keys=True,
+                chunk_size=COPY_CHUNK_SIZE, throttle=COPY_THROTTLE, progress_interval=COPY_PROGRESS_INTERVAL):
+    """
+    Rebuilds `table` with ALTER TABLE `clauses` while it stays in use.
+
+    The empty copy `_<table>_new` is altered first, then AFTER INSERT/UPDATE/
+    DELETE triggers mirror every write to it while the existing rows are
+    copied in `chunk_size` ranges of the integer `key` column. After each chunk
+    the copy sleeps `throttle` times as long as the chunk took. Once the copy
+    has caught up, `RENAME TABLE` swaps the tables atomically and the old one is
+    dropped. `expressions` maps columns of the new table to SQL computed from
+    the old row, written with a `{row}` placeholder (e.g. "{row}.timestamp * 1000").
+    `partitioning` (e.g. "PARTITION BY RANGE (log_id) (...)") is applied to the
+    copy after `clauses`; partitioned InnoDB tables cannot have foreign keys,
+    so pass `keep_foreign_keys=False` with it.
+
+    Tables referenced by foreign keys cannot be swapped and are refused. Creating
+    the triggers needs the TRIGGER privilege (and, with binary logging on, SUPER
+    or log_bin_trust_function_creators). New log_data columns wait for the copy:
+    the ingest schema lock is held throughout. An interrupted copy is started
+    over by the next run.
+    """
+    shadow, old = f"_{table}_new", f"_{table}_old"
+    triggers = [f"_{table}_copy_{event}" for event in ('ins', 'upd', 'del')]
+    expressions = expressions or {}
+
+    referenced = db_manager.fetch_one(
+        "SELECT COUNT(*) AS n FROM INFORMATION_SCHEMA.REFERENTIAL_CONSTRAINTS "
+        "WHERE CONSTRAINT_SCHEMA = %s AND REFERENCED_TABLE_NAME = %s",
+        (db_manager.db_config['database'], table))
+    if referenced['n']:
+        raise RuntimeError(f"{table} is referenced by foreign keys and cannot be rebuilt by a shadow copy.")
+
+    with db_manager.named_lock(SCHEMA_LOCK_NAME, timeout=MIGRATION_LOCK_TIMEOUT) as acquired:
+        if not acquired:
+            raise RuntimeError(f"Could not take the '{SCHEMA_LOCK_NAME}' lock to rebuild {table}.")
+
+        _drop_shadow_objects(db_manager, table, shadow, triggers)
+        try:
+            _execute(db_manager, _shadow_table_ddl(db_manager, table, shadow, keep_foreign_keys))
+            if clauses:
+                _execute(db_manager, f"ALTER TABLE {shadow} {', '.join(clauses)}")
+            if partitioning:
+                _execute(db_manager, f"ALTER TABLE {shadow} {partitioning}")
+
+            source_columns = set(_columns(db_manager, table))
+            target_columns = [c for c in _columns(db_manager, shadow) if c in source_columns or c in expressions]
+            column_list = ', '.join(f"`{c}`" for c in target_columns)
+            def values(row):
+                return ', '.join(expressions[c].format(row=row) if c in expressions else f"{row}.`{c}`" for c in target_columns)
+
+            _execute(db_manager, f"CREATE TRIGGER {triggers[0]} AFTER INSERT ON {table} FOR EACH ROW "
+                                 f"REPLACE INTO {shadow} ({column_list}) VALUES ({values('NEW')})")
+            _execute(db_manager, f"CREATE TRIGGER {triggers[1]} AFTER UPDATE ON {table} FOR EACH ROW BEGIN "
+                                 f"DELETE FROM {shadow} WHERE `{key}` = OLD.`{key}`; "
+                                 f"REPLACE INTO {shadow} ({column_list}) VALUES ({values('NEW')}); END")
+            _execute(db_manager, f"CREATE TRIGGER {triggers[2]} AFTER DELETE ON {table} FOR EACH ROW "
+                                 f"DELETE FROM {shadow} WHERE `{key}` = OLD.`{key}`")
+
+            bounds = db_manager.fetch_one(f"SELECT MIN(`{key}`) AS low, MAX(`{key}`) AS high, COUNT(*) AS total FROM {table}")
+            db_manager.connection.commit()
+            _copy_chunks(db_manager, table, shadow, key, column_list, values('src'), bounds, chunk_size, throttle, progress_interval)
+
+            # Atomic: writers wait on the metadata lock and then see the new table.
+            _execute(db_manager, f"RENAME TABLE {table} TO {old}, {shadow} TO {table}")
+        except BaseException:
+            logging.error(f"Shadow copy of {table} interrupted; dropping {shadow}.")
+            try:
+                _drop_shadow_objects(db_manager, table, shadow, triggers)
+            except Error as e:
+                logging.error(f"Could not drop {shadow} and its triggers: {e}")
+            raise
+
+        for trigger in triggers:
+            _execute(db_manager, f"DROP TRIGGER IF EXISTS {trigger}")
+        _execute(db_manager, f"DROP TABLE {old}")
+    db_manager.invalidate_defined_columns()
+    if table == 'log_data':
+        db_manager.log_data_partitions(refresh=True)
+    logging.info(f"{table} rebuilt by shadow copy.")
+
+def _copy_chunks(db_manager, table, shadow, key, column_list, source_values, bounds, chunk_size, throttle, progress_interval):
+    low, high, total = bounds['low'], bounds['high'], bounds['total']
+    if low is None:
+        return
+    insert_query = (f"INSERT IGNORE INTO {shadow} ({column_list}) "
+                    f"SELECT {source_values} FROM {table} AS src WHERE src.`{key}` >= %s AND src.`{key}` <= %s")
+    # The end of each chunk: the `chunk_size`-th key from its start, or the last key.
+    boundary_query = f"SELECT `{key}` AS boundary FROM {table} WHERE `{key}` >= %s ORDER BY `{key}` LIMIT 1 OFFSET %s"
+    started = last_report = time.monotonic()
+    copied = 0
+    start = low
+    logging.info(f"Copying {total} rows of {table} into {shadow} ({chunk_size} per chunk, throttle {throttle}).")
+    while start <= high:
+        chunk_started = time.monotonic()
+        boundary = db_manager.fetch_one(boundary_query, (start, chunk_size - 1))
+        end = min(boundary['boundary'], high) if boundary else high
+        copied += _execute(db_manager, insert_query, (start, end))
+        start = end + 1
+
+        now = time.monotonic()
+        if now - last_report >= progress_interval or start > high:
+            done = min(1.0, (end - low + 1) / (high - low + 1))
+            elapsed = now - started
+            eta = elapsed * (1 - done) / done if done else 0
+            logging.info(f"{table}: {copied}/{total} rows copied ({done:.1%}), {copied / max(elapsed, 1e-9):.0f} rows/s, about {eta:.0f}s left.")
+            last_report = now
+        if throttle:
+            time.sleep((now - chunk_started) * throttle)
+
+# --- Runner ---------------------------------------------------------------------
+
+def _split_sql(text):
+    """Statements of a migration .sql file (no `;` inside strings or `--` comments)."""
+    text = re.sub(r'--[^\n]*', '', text)
+    return [s.strip() for s in text.split(';') if s.strip()]
+
+def server_version(db_manager):
+    """The MySQL server version as a tuple of ints, e.g. (8, 0, 36)."""
+    version = db_manager.fetch_one("SELECT VERSION() AS v")['v']
+    return tuple(int(part) for part in re.findall(r'\d+', version.split('-')[0])[:3])
+
+def _sql_file_migration(path):
+    def apply(db_manager, copy_options):
+        with open(path, 'r', encoding='utf-8') as f:
+            statements = _split_sql(f.read())
+        for statement in statements:
+            _execute(db_manager, statement)
+    version = os.path.splitext(os.path.basename(path))[0]
+    # Optional feature tables: created by the scripts that use them, never at app startup.
+    return Migration(version, os.path.basename(path), apply, manual=True)
+
+def all_migrations(sql_dir=SQL_MIGRATIONS_DIR):
+    migrations = list(_MIGRATIONS)
+    if os.path.isdir(sql_dir):
+        migrations += [_sql_file_migration(os.path.join(sql_dir, f)) for f in os.listdir(sql_dir) if f.endswith('.sql')]
+    return sorted(migrations, key=lambda m: m.version)
+
+def applied_versions(db_manager):
+    """{version: applied_at} of the applied migrations, or None before the table exists."""
+    try:
+        rows = db_manager.fetch_all("SELECT version, applied_at FROM schema_migrations")
+    except Error as e:
+        if e.errno == errorcode.ER_NO_SUCH_TABLE:
+            return None
+        raise
+    finally:
+        # Do not keep a read snapshot open across the migrations.
+        db_manager.connection.commit()
+    return {r['version']: r['applied_at'] for r in rows}
+
+def _has_rows(db_manager, table):
+    try:
+        return db_manager.fetch_one(f"SELECT 1 AS found FROM {table} LIMIT 1") is not None
+    except Error as e:
+        if e.errno == errorcode.ER_NO_SUCH_TABLE:
+            return False
+        raise
+
+def migration_status(db_manager):
+    """[(migration, applied_at or None)] for every known migration, in order."""
+    applied = applied_versions(db_manager) or {}
+    return [(m, applied.get(m.version)) for m in all_migrations()]
+
+def _runnable(migrations, include_manual):
+    return [m for m in migrations if include_manual or not m.manual]
+
+def apply_migrations(db_manager, run_online=True, copy_options=None, include_manual=True):
+    """
+    Applies pending migrations in order. With `run_online=False` (app startup)
+    it stops at the first `online` migration whose table already holds rows.
+    With `include_manual=False` (app startup) `manual` migrations are left
+    pending, with a warning, for `scripts/migrate.py`.
+    Returns False if a migration failed or the lock could not be taken.
+    """
+    applied = applied_versions(db_manager)
+    pending = [m for m in all_migrations() if applied is None or m.version not in applied]
+    if not include_manual:
+        for m in pending:
+            if m.manual:
+                logging.warning(f"Migration {m.version} ({m.description}) is not applied at startup; "
+                                f"apply it with scripts/migrate.py.")
+    if applied is not None and not _runnable(pending, include_manual):
+        return True
+
+    with db_manager.named_lock(MIGRATION_LOCK_NAME, timeout=MIGRATION_LOCK_TIMEOUT) as acquired:
+        if not acquired:
+            return False
+        _execute(db_manager, SCHEMA_MIGRATIONS_QUERY)
+        # Another process may have applied some while we waited for the lock.
+        applied = applied_versions(db_manager)
+        changed = False
+        try:
+            for m in _runnable(all_migrations(), include_manual):
+                if m.version in applied:
+                    continue
+                if m.online and not run_online and _has_rows(db_manager, m.table):
+                    logging.warning(f"Migration {m.version} ({m.description}) rewrites {m.table} and was deferred; "
+                                    f"apply it with scripts/migrate.py.")
+                    break
+                logging.info(f"Applying migration {m.version}: {m.description}")
+                started = time.perf_counter()
+                changed = True
+                try:
+                    m.apply(db_manager, copy_options or {})
+                except (Error, RuntimeError) as e:
+                    logging.error(f"Migration {m.version} failed: {e}")
+                    db_manager.connection.rollback()
+                    return False
+                duration = time.perf_counter() - started
+                _execute(db_manager, "INSERT INTO schema_migrations (version, description, duration_seconds) VALUES (%s, %s, %s)",
+                         (m.version, m.description, duration))
+                logging.info(f"Migration {m.version} applied in {duration:.1f}s.")
+        finally:
+            if changed:
+                db_manager.invalidate_defined_columns()
+                db_manager.invalidate_log_columns()
+    return True
+
+SCHEMA_MIGRATIONS_QUERY = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version VARCHAR(128) PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    duration_seconds DOUBLE,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
+"""
+
+# --- Migrations -------------------------------------------------------------------
+# The first ones reproduce the schema that `ensure_base_tables_exist` used to
+# build and patch at every startup; each is a no-op on a database that already
+# has it, so existing installations simply record them.
+
+def _add_missing_columns(db_manager, table, columns, copy_options):
+    """online_alter with ADD COLUMN clauses for the `columns` ({name: definition}) the table lacks."""
+    clauses = [f"ADD COLUMN {name} {definition}" for name, definition in columns.items()
+               if not db_manager._column_exists(table, name)]
+    if clauses:
+        online_alter(db_manager, table, clauses, **copy_options)
+
+@migration('0001_base_tables', "log_index, column_definitions, log_data, trips, header_signatures, ingest_manifest")
+def _base_tables(db_manager, copy_options):
+    _execute(db_manager, """
+    CREATE TABLE IF NOT EXISTS log_index (
+        log_id INT AUTO_INCREMENT PRIMARY KEY,
+        file_name VARCHAR(255) UNIQUE NOT NULL,
+        start_timestamp BIGINT NOT NULL,
+        trip_duration_seconds FLOAT NOT NULL,
+        column_ids_json TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB;
+    """)
+    _execute(db_manager, """
+    CREATE TABLE IF NOT EXISTS column_definitions (
+        column_id INT AUTO_INCREMENT PRIMARY KEY,
+        column_name VARCHAR(255) UNIQUE NOT NULL,
+        sanitized_name VARCHAR(255) UNIQUE NOT NULL,
+        mysql_data_type VARCHAR(50) NOT NULL
+    ) ENGINE=InnoDB;
+    """)
+    _execute(db_manager, """
+    CREATE TABLE IF NOT EXISTS log_data (
+        data_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        log_id INT NOT NULL,
+        timestamp BIGINT NOT NULL,
+        INDEX (log_id),
+        FOREIGN KEY (log_id) REFERENCES log_index(log_id) ON DELETE CASCADE
+    ) ENGINE=InnoDB;
+    """)
+    _execute(db_manager, """
+    CREATE TABLE IF NOT EXISTS trips (
+        trip_id INT AUTO_INCREMENT PRIMARY KEY,
+        log_id INT NOT NULL UNIQUE,
+        start_lat DECIMAL(9, 6),
+        start_lon DECIMAL(9, 6),
+        end_lat DECIMAL(9, 6),
+        end_lon DECIMAL(9, 6),
+        trip_group_id VARCHAR(64),
+        distance_miles FLOAT,
+        notes TEXT,
+        tags JSON,
+        FOREIGN KEY (log_id) REFERENCES log_index(log_id) ON DELETE CASCADE
+    ) ENGINE=InnoDB;
+    """)
+    _execute(db_manager, """
+    CREATE TABLE IF NOT EXISTS header_signatures (
+        signature CHAR(40) PRIMARY KEY,
+        headers_json TEXT NOT NULL,
+        columns_json TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB;
+    """)
+    _execute(db_manager, """
+    CREATE TABLE IF NOT EXISTS ingest_manifest (
+        file_name VARCHAR(255) PRIMARY KEY,
+        file_size BIGINT,
+        file_mtime DOUBLE,
+        content_hash CHAR(64),
+        status VARCHAR(16) NOT NULL,
+        log_id INT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        INDEX idx_content_hash (content_hash)
+    ) ENGINE=InnoDB;
+    """)
+
+@migration('0002_log_data_operating_state', "log_data.operating_state and its index")
+def _log_data_operating_state(db_manager, copy_options):
+    if not db_manager._column_exists('log_data', 'operating_state'):
+        online_alter(db_manager, 'log_data', ["ADD COLUMN operating_state VARCHAR(50)", "ADD INDEX idx_operating_state (operating_state)"], **copy_options)
+
+@migration('0003_ingest_checkpoints', "ingest_manifest.rows_committed and byte_offset")
+def _ingest_checkpoints(db_manager, copy_options):
+    _add_missing_columns(db_manager, 'ingest_manifest', {'rows_committed': "INT NOT NULL DEFAULT 0", 'byte_offset': "BIGINT NOT NULL DEFAULT 0"}, copy_options)
+
+@migration('0004_seed_ingest_manifest', "record logs ingested before the manifest existed as done")
+def _seed_ingest_manifest(db_manager, copy_options):
+    _execute(db_manager, "INSERT IGNORE INTO ingest_manifest (file_name, status, log_id) SELECT file_name, 'done', log_id FROM log_index")
+
+@migration('0005_trips_distance', "trips.distance_miles")
+def _trips_distance(db_manager, copy_options):
+    _add_missing_columns(db_manager, 'trips', {'distance_miles': "FLOAT"}, copy_options)
+
+@migration('0006_narrow_storage', "log_rows, log_samples, log_index.storage_layout, column_definitions.wide_column")
+def _narrow_storage(db_manager, copy_options):
+    # Long-format ("narrow") storage: one row per sample instead of one column per PID.
+    _execute(db_manager, """
+    CREATE TABLE IF NOT EXISTS log_rows (
+        log_id INT NOT NULL,
+        row_seq INT NOT NULL,
+        timestamp BIGINT NOT NULL,
+        operating_state VARCHAR(50),
+        PRIMARY KEY (log_id, row_seq),
+        FOREIGN KEY (log_id) REFERENCES log_index(log_id) ON DELETE CASCADE
+    ) ENGINE=InnoDB;
+    """)
+    _execute(db_manager, """
+    CREATE TABLE IF NOT EXISTS log_samples (
+        log_id INT NOT NULL,
+        column_id INT NOT NULL,
+        row_seq INT NOT NULL,
+        value DOUBLE,
+        text_value VARCHAR(255),
+        PRIMARY KEY (log_id, column_id, row_seq),
+        FOREIGN KEY (log_id) REFERENCES log_index(log_id) ON DELETE CASCADE
+    ) ENGINE=InnoDB;
+    """)
+    _add_missing_columns(db_manager, 'log_index', {'storage_layout': f"VARCHAR(10) NOT NULL DEFAULT '{STORAGE_WIDE}'"}, copy_options)
+    _add_missing_columns(db_manager, 'column_definitions', {'wide_column': "TINYINT(1) NOT NULL DEFAULT 1"}, copy_options)
+
+@migration('0007_pid_state_stats', "pid_state_stats")
+def _pid_state_stats(db_manager, copy_options):
+    # Per-PID baselines by operating state as mergeable (count, mean, M2) aggregates; see state_stats.py.
+    _execute(db_manager, """
+    CREATE TABLE IF NOT EXISTS pid_state_stats (
+        column_id INT NOT NULL,
+        operating_state VARCHAR(50) NOT NULL,
+        sample_count BIGINT NOT NULL,
+        mean DOUBLE NOT NULL,
+        m2 DOUBLE NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (column_id, operating_state)
+    ) ENGINE=InnoDB;
+    """)
+
+@migration('0008_log_file_metadata', "log_file_metadata")
+def _log_file_metadata(db_manager, copy_options):
+    # Per-file facts gathered at ingest, so maintenance scripts never re-read the CSVs.
+    _execute(db_manager, """
+    CREATE TABLE IF NOT EXISTS log_file_metadata (
+        content_hash CHAR(64) PRIMARY KEY,
+        file_name VARCHAR(255) NOT NULL,
+        log_id INT,
+        start_time DATETIME(6),
+        last_time_offset DOUBLE,
+        trip_distance DOUBLE,
+        header_signature CHAR(40),
+        row_count INT,
+        byte_size BIGINT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        INDEX idx_file_name (file_name),
+        INDEX idx_log_id (log_id),
+        FOREIGN KEY (log_id) REFERENCES log_index(log_id) ON DELETE SET NULL
+    ) ENGINE=InnoDB;
+    """)
+
+@migration('0009_log_data_ts_ms', "log_data.ts_ms (Unix milliseconds) and primary key (log_id, ts_ms, data_id)", table='log_data', online=True)
+def _log_data_ts_ms(db_manager, copy_options):
+    # Existing rows only have whole-second timestamps: their ts_ms is timestamp * 1000,
+    # and data_id keeps samples within a second in order. New rows get exact values.
+    if db_manager._column_exists('log_data', 'ts_ms'):
+        return
+    version = server_version(db_manager)
+    if version < EXPRESSION_DEFAULT_MIN_VERSION:
+        raise RuntimeError(f"Migration 0009 needs MySQL {'.'.join(map(str, EXPRESSION_DEFAULT_MIN_VERSION))} or later "
+                           f"for the ts_ms expression default; the server is {'.'.join(map(str, version))}.")
+    indexes = table_indexes(db_manager, 'log_data')
+    clauses = ["ADD COLUMN ts_ms BIGINT NOT NULL DEFAULT (`timestamp` * 1000) AFTER `timestamp`",
+               "DROP PRIMARY KEY", "ADD PRIMARY KEY (log_id, ts_ms, data_id)"]
+    # data_id stays AUTO_INCREMENT, which needs an index that starts with it.
+    if not any(columns[0] == 'data_id' for name, columns in indexes.items() if name != 'PRIMARY'):
+        clauses.append("ADD INDEX idx_data_id (data_id)")
+    # The new primary key starts with log_id, which also serves the foreign key.
+    if indexes.get('log_id') == ['log_id']:
+        clauses.append("DROP INDEX `log_id`")
+    online_alter(db_manager, 'log_data', clauses, **copy_options)
+
+@migration('0010_trip_endpoints', "trips.start_*/end_* of every log, for grouping without scanning log_data", table='log_data', online=True)
+def _trip_endpoints(db_manager, copy_options):
+    # New logs get theirs at ingest; this fills in the logs ingested before.
+    if not db_manager.refresh_trip_endpoints():
+        raise RuntimeError("Could not compute the trip endpoints.")
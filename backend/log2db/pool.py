@@ -0,0 +1,177 @@
+# FILE: backend/log2db/pool.py
+#
+# --- VERSION 1.0.0 ---
+# - A thread-safe MySQL connection pool for long-running processes (the Flask
+#   app and its watcher). `DatabaseManager` borrows from the pool registered
+#   for its config with `configure_pool()`; without one it connects directly,
+#   as the CLI and scripts do.
+# - Connections are checked with a ping when they have been idle for
+#   `health_check_after` seconds, replaced once older than `max_lifetime`, and
+#   have their session reset (open transaction rolled back, user variables,
+#   temporary tables and GET_LOCK locks dropped) when they are returned.
+# - A full pool makes `acquire()` wait up to `timeout` seconds. `stats()`
+#   reports usage for `/api/metrics` and `/api/db/pool`.
+# -----------------------------
+
+import time
+import logging
+import threading
+
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+from .metrics import DB_POOL_WAIT_SECONDS
+
+class ConnectionPool:
+    def __init__(self, connect_args, size=10, max_lifetime=1800, health_check_after=30, timeout=30, reset_session=True):
+        self.connect_args = dict(connect_args)
+        self.size = size
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self.timeout = timeout
+        self.reset_session = reset_session
+        # Idle connections as [connection, created_at, returned_at], most recently returned last.
+        self._idle = []
+        self._open = 0
+        self._closed = False
+        self._available = threading.Condition(threading.Lock())
+        self._stats = {'acquired': 0, 'created': 0, 'recycled': 0, 'broken': 0, 'timeouts': 0, 'waits': 0}
+        # Connection id -> created_at for connections currently handed out.
+        self._created_at = {}
+
+    def _connect(self):
+        connection = mysql.connector.connect(**self.connect_args)
+        with self._available:
+            self._stats['created'] += 1
+        return connection, time.monotonic()
+
+    def _discard(self, connection, reason):
+        try:
+            connection.close()
+        except Error:
+            pass
+        with self._available:
+            self._open -= 1
+            self._stats[reason] += 1
+            self._available.notify()
+
+    def _is_healthy(self, connection, returned_at):
+        if time.monotonic() - returned_at < self.health_check_after:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Error as e:
+            logging.warning(f"Dropping pooled connection that failed its health check: {e}")
+            return False
+
+    def acquire(self):
+        """Returns an open connection, waiting up to `timeout` seconds while the pool is exhausted."""
+        deadline = time.monotonic() + self.timeout
+        started = time.perf_counter()
+        while True:
+            with self._available:
+                if self._closed:
+                    raise PoolError("Connection pool is closed.")
+                waited = False
+                while not self._idle and self._open >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolError(f"No connection available within {self.timeout}s (pool size {self.size}).")
+                    if not waited:
+                        self._stats['waits'] += 1
+                        waited = True
+                    self._available.wait(remaining)
+                idle = self._idle.pop() if self._idle else None
+                if idle is None:
+                    self._open += 1
+
+            if idle is None:
+                try:
+                    connection, created_at = self._connect()
+                except Error:
+                    with self._available:
+                        self._open -= 1
+                        self._available.notify()
+                    raise
+            else:
+                connection, created_at, returned_at = idle
+                if time.monotonic() - created_at >= self.max_lifetime:
+                    self._discard(connection, 'recycled')
+                    continue
+                if not self._is_healthy(connection, returned_at):
+                    self._discard(connection, 'broken')
+                    continue
+
+            with self._available:
+                self._stats['acquired'] += 1
+                self._created_at[id(connection)] = created_at
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+            return connection
+
+    def release(self, connection):
+        """Returns a connection to the pool with its session state reset."""
+        with self._available:
+            created_at = self._created_at.pop(id(connection), None)
+        if created_at is None:
+            logging.warning("Ignoring a connection that was not handed out by this pool.")
+            return
+        if self._closed or time.monotonic() - created_at >= self.max_lifetime:
+            self._discard(connection, 'recycled')
+            return
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+            if self.reset_session:
+                connection.reset_session()
+        except Error as e:
+            logging.warning(f"Dropping pooled connection that could not be reset: {e}")
+            self._discard(connection, 'broken')
+            return
+        with self._available:
+            self._idle.append([connection, created_at, time.monotonic()])
+            self._available.notify()
+
+    def stats(self):
+        with self._available:
+            return dict(self._stats, size=self.size, open=self._open, idle=len(self._idle), in_use=self._open - len(self._idle))
+
+    def close(self):
+        """Closes idle connections; connections still in use are closed when released."""
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for connection, _, _ in idle:
+            self._discard(connection, 'recycled')
+
+# Pools by (host, port, database, user, allow_local_infile), see `pool_key`.
+_pools = {}
+_pools_lock = threading.Lock()
+
+def pool_key(db_config, allow_local_infile=False):
+    return (db_config.get('host'), db_config.get('port', 3306), db_config.get('database'), db_config.get('user'), bool(allow_local_infile))
+
+def configure_pool(db_config, allow_local_infile=False, **pool_options):
+    """Creates the pool used by every DatabaseManager built with this config (see ConnectionPool for options)."""
+    connect_args = dict(db_config)
+    if allow_local_infile:
+        connect_args['allow_local_infile'] = True
+    key = pool_key(db_config, allow_local_infile)
+    with _pools_lock:
+        previous = _pools.get(key)
+        _pools[key] = ConnectionPool(connect_args, **pool_options)
+    if previous is not None:
+        previous.close()
+    return _pools[key]
+
+def get_pool(db_config, allow_local_infile=False):
+    return _pools.get(pool_key(db_config, allow_local_infile))
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
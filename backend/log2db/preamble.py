@@ -0,0 +1,136 @@
+# FILE: backend/log2db/preamble.py
+#
+# --- VERSION 1.1.1 ---
+# - `header_units` returns the unit a raw header carries ('km' for
+#   'Trip Distance (km)'), which normalization strips.
+# - `Preamble.start_time` keeps the StartTime as a UTC datetime with its
+#   fractional seconds, for the `log_file_metadata` index.
+# - `read_preamble` reads the comment block and header row of an open CSV in a
+#   single pass and leaves the file positioned at the first data row, in
+#   place of separate scans for the StartTime and the header row.
+# - `HeaderSignatureCache` maps the hash of a raw header row to its
+#   normalized headers and its `column_definitions` entries. It is loaded once
+#   per process from the `header_signatures` table, so recurring layouts skip
+#   normalization and the schema lookups.
+# -----------------------------
+
+import csv
+import json
+import hashlib
+import logging
+import re
+from collections import namedtuple
+
+from .utils import TIMESTAMP_PATTERN, parse_start_time
+
+Preamble = namedtuple('Preamble', ['start_timestamp', 'header_row_index', 'raw_headers', 'headers', 'dialect', 'signature', 'start_time'])
+
+_UNITS_SUFFIX = re.compile(r'\s*\([^)]*\)$')
+_UNITS = re.compile(r'\(([^)]*)\)$')
+_WHITESPACE = re.compile(r'\s+')
+
+def header_units(header):
+    """'Trip Distance (km)' -> 'km'; None for a header without units."""
+    match = _UNITS.search(header.strip())
+    return match.group(1).strip().lower() if match else None
+
+def normalize_header(header):
+    """'Engine RPM (rpm)' -> 'engine rpm'"""
+    no_units = _UNITS_SUFFIX.sub('', header)
+    return _WHITESPACE.sub(' ', no_units).strip().lower()
+
+def header_signature(header_line):
+    return hashlib.sha1(header_line.encode('utf-8')).hexdigest()
+
+def sniff_dialect(header_line):
+    # Comma-separated logs keep the default dialect so parsing is unchanged.
+    if ',' in header_line:
+        return csv.excel
+    try:
+        return csv.Sniffer().sniff(header_line, delimiters=';\t|')
+    except csv.Error:
+        return csv.excel
+
+def read_preamble(f, file_name, cache=None):
+    """
+    Consumes lines from `f` up to and including the header row. Returns a
+    Preamble; `start_timestamp` (Unix seconds) and `start_time` (UTC datetime
+    with fractional seconds) are None if no StartTime line precedes the header,
+    and `headers` is None if the file has no header row.
+    """
+    logging.info(f"Scanning preamble of: {file_name}")
+    start_timestamp = start_time = None
+    for i, line in enumerate(f):
+        if i < 5:
+            logging.info(f"  > Scanning line {i+1}: '{line.strip()}'")
+
+        if start_timestamp is None:
+            match = TIMESTAMP_PATTERN.search(line)
+            if match:
+                timestamp_str = match.group(1).strip()
+                logging.info(f"  SUCCESS: Found raw timestamp string: '{timestamp_str}'")
+                start_time = parse_start_time(timestamp_str)
+                if start_time is None:
+                    return Preamble(None, -1, None, None, None, None, None)
+                start_timestamp = int(start_time.timestamp())
+                logging.info(f"  > Converted to Unix timestamp (UTC): {start_timestamp}")
+                continue
+
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#'):
+            continue
+
+        if start_timestamp is None:
+            logging.warning(f"  STOP: Reached non-comment line without finding timestamp.")
+
+        signature = header_signature(stripped)
+        dialect = sniff_dialect(stripped)
+        raw_headers = next(csv.reader([stripped], dialect))
+        headers = cache.headers_for(signature) if cache else None
+        if headers is None:
+            headers = [normalize_header(h) for h in raw_headers]
+            if cache: cache.remember_headers(signature, headers)
+        return Preamble(start_timestamp, i, raw_headers, headers, dialect, signature, start_time)
+
+    return Preamble(start_timestamp, -1, None, None, None, None, start_time)
+
+class HeaderSignatureCache:
+    """Process-wide cache of header layouts, backed by the `header_signatures` table."""
+
+    def __init__(self):
+        self._headers = {}
+        self._columns = {}
+        self._loaded = False
+
+    def load(self, db_manager):
+        if self._loaded:
+            return
+        for row in db_manager.get_header_signatures():
+            self._headers[row['signature']] = json.loads(row['headers_json'])
+            self._columns[row['signature']] = json.loads(row['columns_json'])
+        self._loaded = True
+        logging.info(f"Loaded {len(self._columns)} known header layouts.")
+
+    def headers_for(self, signature):
+        return self._headers.get(signature)
+
+    def remember_headers(self, signature, headers):
+        self._headers[signature] = headers
+
+    def columns_for(self, signature):
+        """Returns {normalized header: column_definitions row} for a known layout, else None."""
+        return self._columns.get(signature)
+
+    def store(self, db_manager, signature, headers, defined_columns):
+        columns = {h: {k: defined_columns[h].get(k, 1) for k in ('column_id', 'sanitized_name', 'mysql_data_type', 'wide_column')} for h in headers}
+        self._headers[signature] = headers
+        self._columns[signature] = columns
+        db_manager.save_header_signature(signature, json.dumps(headers), json.dumps(columns))
+        return columns
+
+    def clear(self):
+        self._headers.clear()
+        self._columns.clear()
+        self._loaded = False
+
+HEADER_CACHE = HeaderSignatureCache()
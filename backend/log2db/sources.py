@@ -0,0 +1,135 @@
+# FILE: backend/log2db/sources.py
+#
+# --- VERSION 1.0.1 ---
+# - Member names longer than the 255-character `file_name` columns are
+#   shortened by `member_source_name` (start and end kept around a hash of
+#   the full name) instead of failing the INSERT.
+#
+# --- VERSION 1.0.0 ---
+# - A `LogSource` is one CSV log as ingestion sees it: a plain file, a
+#   gzip/zstd-compressed file, or one CSV member of a zip archive. `open()`
+#   returns a binary stream of the decompressed CSV, so hashing, the preamble
+#   scan and the data pass never unpack anything to disk.
+# - `iter_log_sources(path)` expands a path into its sources (one per CSV in
+#   a zip). Zip members are named '<archive>.zip:<path/in/archive>.csv' in the
+#   manifest and log_index.
+# - zstd needs the optional `zstandard` package; without it .zst logs are
+#   reported and skipped.
+# -----------------------------
+
+import io
+import os
+import gzip
+import hashlib
+import logging
+import zipfile
+from collections import namedtuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PLAIN = 'plain'
+GZIP = 'gzip'
+ZSTD = 'zstd'
+ZIP = 'zip'
+
+# Lower-case name suffix -> compression. Checked in order.
+LOG_SUFFIXES = (('.csv', PLAIN), ('.csv.gz', GZIP), ('.csv.zst', ZSTD), ('.zip', ZIP))
+
+# Length of the `file_name` columns (VARCHAR(255)) in log_index, ingest_manifest and log_file_metadata.
+MAX_SOURCE_NAME_LENGTH = 255
+
+# Errors that mean a source could not be read (missing, truncated, corrupt).
+SOURCE_ERRORS = (OSError, EOFError, zipfile.BadZipFile, KeyError) + ((zstandard.ZstdError,) if zstandard else ())
+
+def compression_for(file_name):
+    lower = file_name.lower()
+    for suffix, compression in LOG_SUFFIXES:
+        if lower.endswith(suffix):
+            return compression
+    return None
+
+def is_log_file(file_name):
+    return compression_for(file_name) is not None
+
+class LogSource(namedtuple('LogSource', ['path', 'name', 'compression', 'member'])):
+    """`member` is the CSV's name inside a zip archive, else None."""
+    __slots__ = ()
+
+    def open(self):
+        """Binary stream of the (decompressed) CSV."""
+        if self.compression == PLAIN:
+            return open(self.path, 'rb')
+        if self.compression == GZIP:
+            return gzip.open(self.path, 'rb')
+        if self.compression == ZSTD:
+            if zstandard is None:
+                raise OSError(f"'{self.name}' is zstd-compressed but the 'zstandard' package is not installed.")
+            return _open_zstd(self.path)
+        if self.compression == ZIP:
+            return _open_zip_member(self.path, self.member)
+        raise ValueError(f"Unknown compression '{self.compression}' for '{self.name}'.")
+
+    def fingerprint(self):
+        """(size, mtime) as stored in the manifest; size is the on-disk (compressed) size."""
+        st = os.stat(self.path)
+        size = st.st_size
+        if self.compression == ZIP:
+            with zipfile.ZipFile(self.path) as archive:
+                size = archive.getinfo(self.member).compress_size
+        return size, round(st.st_mtime, 6)
+
+def _open_zip_member(path, member):
+    # The member keeps the archive's file open until it is closed itself.
+    with zipfile.ZipFile(path) as archive:
+        return archive.open(member)
+
+def _open_zstd(path):
+    raw = open(path, 'rb')
+    try:
+        # Buffered for readline(); the reader closes `raw` when it is closed.
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw))
+    except Exception:
+        raw.close()
+        raise
+
+def member_source_name(archive_name, member):
+    """
+    '<archive>:<member>', the name a zip member is stored under. Names longer
+    than MAX_SOURCE_NAME_LENGTH keep their start and end around a hash of the
+    full name, so they stay unique, stable and recognisable.
+    """
+    name = f"{archive_name}:{member}"
+    if len(name) <= MAX_SOURCE_NAME_LENGTH:
+        return name
+    marker = f"~{hashlib.sha1(name.encode('utf-8')).hexdigest()[:16]}~"
+    keep = MAX_SOURCE_NAME_LENGTH - len(marker)
+    return name[:keep // 2] + marker + name[-(keep - keep // 2):]
+
+def iter_log_sources(path):
+    """Sources contained in `path`: the file itself, or each CSV member of a zip."""
+    name = os.path.basename(path)
+    compression = compression_for(name)
+    if compression is None:
+        return []
+    if compression != ZIP:
+        return [LogSource(path, name, compression, None)]
+    try:
+        with zipfile.ZipFile(path) as archive:
+            members = [m.filename for m in archive.infolist() if not m.is_dir() and m.filename.lower().endswith('.csv')]
+    except (OSError, zipfile.BadZipFile) as e:
+        logging.error(f"Could not read zip archive '{name}': {e}")
+        return []
+    # The full member path: CSVs with the same name in different folders are different logs.
+    return [LogSource(path, member_source_name(name, member), ZIP, member) for member in sorted(members)]
+
+def as_log_source(path_or_source):
+    """Accepts a LogSource or a path to a single (possibly compressed) CSV."""
+    if isinstance(path_or_source, LogSource):
+        return path_or_source
+    sources = iter_log_sources(path_or_source)
+    if len(sources) != 1:
+        raise ValueError(f"'{path_or_source}' does not hold exactly one CSV log; expand it with iter_log_sources().")
+    return sources[0]
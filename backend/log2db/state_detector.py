@@ -1,67 +1,156 @@
 # FILE: backend/log2db/state_detector.py
 #
-# --- VERSION 1.4.0 ---
-# - PERMANENT FIX: The PID lookup keys have been corrected to use underscores
-#   (e.g., 'engine_rpm') to match the final sanitized names used throughout the
-#   application. This reflects the user's correct debugging and ensures
-#   consistency.
+# --- VERSION 1.5.0 ---
+# - The rules are now evaluated column-wise with NumPy masks in
+#   `classify_states_columnar`. `classify_operating_states` keeps its old
+#   signature and results, including the '(Warm-up)' suffix and the
+#   'Unknown (Err)' fallback for values that fail float()/int() conversion.
+# - `classify_state_labels` returns the labels without touching the rows, for
+#   callers (like the backfill script) that only need the list.
 # -----------------------------
 
 import logging
+import numpy as np
 
 WARM_ENGINE_TEMP_F = 160
 HIGH_LOAD_THRESHOLD = 70
 HIGHWAY_SPEED_MPH = 60
 
-def classify_operating_states(data_rows, pids):
+# --- PERMANENT FIX: Use the correct, sanitized PID names for lookup ---
+RPM_PID = 'engine_rpm'
+SPEED_PID = 'gps_speed'
+LOAD_PID = 'calculated_load_value'
+COOLANT_PID = 'engine_coolant_temperature'
+FUEL_STATUS_PID = 'fuel_system_1_status'
+
+# Defaults used when a PID is not present in the log at all.
+DEFAULT_RPM = 0
+DEFAULT_SPEED = 0
+DEFAULT_LOAD = 0
+DEFAULT_COOLANT_TEMP = 180
+DEFAULT_FUEL_STATUS = 0
+
+COLD_START_STATE = 'Open Loop (Cold Start)'
+ERROR_STATE = 'Unknown (Err)'
+BASE_STATES = [
+	'Unknown',
+	'Engine Off',
+	COLD_START_STATE,
+	'Closed Loop (Idle)',
+	'Closed Loop (Highway)',
+	'Closed Loop (City)',
+	'Open Loop (Idle)',
+	'Open Loop (WOT Accel)',
+	'Open Loop (Decel Fuel Cut)',
+	'FAULT - Open Loop',
+	'FAULT - Closed Loop',
+]
+# Lookup table indexed by state code: base states, their warm-up variants, then the error state.
+STATE_LABELS = np.array(BASE_STATES + [f"{s} (Warm-up)" for s in BASE_STATES] + [ERROR_STATE], dtype=object)
+WARM_UP_OFFSET = len(BASE_STATES)
+ERROR_CODE = len(STATE_LABELS) - 1
+
+def _to_float_array(values, n, default):
+	"""
+	Converts a column to float64 the way `float()` would, returning the array and
+	a mask of entries that would have raised (None, '', non-numeric strings).
+	"""
+	if values is None:
+		return np.full(n, float(default)), np.zeros(n, dtype=bool)
+	if isinstance(values, np.ndarray) and values.dtype.kind in 'fiu':
+		return values.astype(np.float64, copy=False), np.zeros(n, dtype=bool)
+	values = list(values)
+	if None not in values:
+		try:
+			return np.asarray(values, dtype=np.float64), np.zeros(n, dtype=bool)
+		except (ValueError, TypeError):
+			pass
+	out = np.empty(n, dtype=np.float64)
+	errors = np.zeros(n, dtype=bool)
+	for i, v in enumerate(values):
+		try:
+			out[i] = float(v)
+		except (ValueError, TypeError):
+			out[i] = np.nan
+			errors[i] = True
+	return out, errors
+
+def classify_states_columnar(rpm=None, speed=None, load=None, coolant_temp=None, fuel_status=None, n=None):
+	"""
+	Classifies operating states for whole columns at once. Each argument is a
+	sequence of raw values (strings, numbers or None), or None when the PID is
+	not logged. Returns an object array of state labels.
+	"""
+	if n is None:
+		n = next((len(c) for c in (rpm, speed, load, coolant_temp, fuel_status) if c is not None), 0)
+	if n == 0:
+		return np.empty(0, dtype=object)
+
+	rpm, rpm_err = _to_float_array(rpm, n, DEFAULT_RPM)
+	speed, speed_err = _to_float_array(speed, n, DEFAULT_SPEED)
+	load, load_err = _to_float_array(load, n, DEFAULT_LOAD)
+	coolant_temp, coolant_err = _to_float_array(coolant_temp, n, DEFAULT_COOLANT_TEMP)
+	fuel_raw, fuel_err = _to_float_array(fuel_status, n, DEFAULT_FUEL_STATUS)
+
+	# int(float(x)) truncates toward zero and fails for NaN/inf.
+	with np.errstate(invalid='ignore'):
+		fuel = np.trunc(fuel_raw)
+	errors = rpm_err | speed_err | load_err | coolant_err | fuel_err | ~np.isfinite(fuel_raw)
+
+	idle = speed == 0
+	closed_loop = fuel == 2
+	open_loop = fuel == 4
+	conditions = [
+		(fuel == 0) | (rpm == 0),
+		fuel == 1,
+		closed_loop & idle,
+		closed_loop & (speed >= HIGHWAY_SPEED_MPH),
+		closed_loop,
+		open_loop & idle,
+		open_loop & (load > HIGH_LOAD_THRESHOLD),
+		open_loop,
+		fuel == 8,
+		fuel == 16,
+	]
+	codes = np.select(conditions, np.arange(1, len(conditions) + 1), default=0)
+
+	warm_up = (coolant_temp < WARM_ENGINE_TEMP_F) & (rpm > 0) & (codes != BASE_STATES.index(COLD_START_STATE))
+	codes = codes + warm_up * WARM_UP_OFFSET
+	codes[errors] = ERROR_CODE
+	return STATE_LABELS[codes]
+
+def classify_state_labels(data_rows, pids):
+	"""Returns the operating state label for each row dict, in order."""
 	if not data_rows:
 		return []
 
-	# --- PERMANENT FIX: Use the correct, sanitized PID names for lookup ---
-	rpm_pid = 'engine_rpm'
-	speed_pid = 'gps_speed'
-	load_pid = 'calculated_load_value'
-	coolant_pid = 'engine_coolant_temperature'
-	fuel_status_pid = 'fuel_system_1_status'
-
 	available_pids = set(pids)
-	if rpm_pid not in available_pids: rpm_pid = None
-	if speed_pid not in available_pids: speed_pid = None
-	if load_pid not in available_pids: load_pid = None
-	if coolant_pid not in available_pids: coolant_pid = None
-	if fuel_status_pid not in available_pids: fuel_status_pid = None
-	
+	rpm_pid = RPM_PID if RPM_PID in available_pids else None
+	speed_pid = SPEED_PID if SPEED_PID in available_pids else None
+	load_pid = LOAD_PID if LOAD_PID in available_pids else None
+	coolant_pid = COOLANT_PID if COOLANT_PID in available_pids else None
+	fuel_status_pid = FUEL_STATUS_PID if FUEL_STATUS_PID in available_pids else None
+
 	logging.info(f"State detection using PIDs: FuelStatus='{fuel_status_pid}', RPM='{rpm_pid}', Speed='{speed_pid}'")
 
-	for row in data_rows:
-		state = 'Unknown'
-		try:
-			rpm = float(row.get(rpm_pid, 0)) if rpm_pid else 0
-			speed = float(row.get(speed_pid, 0)) if speed_pid else 0
-			load = float(row.get(load_pid, 0)) if load_pid else 0
-			coolant_temp = float(row.get(coolant_pid, 180)) if coolant_pid else 180
-			fuel_status = int(float(row.get(fuel_status_pid, 0))) if fuel_status_pid else 0
-
-			if fuel_status == 0 or rpm == 0:
-				state = 'Engine Off'
-			elif fuel_status == 1:
-				state = 'Open Loop (Cold Start)'
-			elif fuel_status == 2:
-				if speed == 0: state = 'Closed Loop (Idle)'
-				elif speed >= HIGHWAY_SPEED_MPH: state = 'Closed Loop (Highway)'
-				else: state = 'Closed Loop (City)'
-			elif fuel_status == 4:
-				if speed == 0: state = 'Open Loop (Idle)'
-				elif load > HIGH_LOAD_THRESHOLD: state = 'Open Loop (WOT Accel)'
-				else: state = 'Open Loop (Decel Fuel Cut)'
-			elif fuel_status == 8: state = 'FAULT - Open Loop'
-			elif fuel_status == 16: state = 'FAULT - Closed Loop'
-
-			if coolant_temp < WARM_ENGINE_TEMP_F and rpm > 0 and state != 'Open Loop (Cold Start)':
-				state = f"{state} (Warm-up)"
-		except (ValueError, TypeError):
-			state = 'Unknown (Err)'
-		
+	def column(pid, default):
+		return [row.get(pid, default) for row in data_rows] if pid else None
+
+	labels = classify_states_columnar(
+		rpm=column(rpm_pid, DEFAULT_RPM),
+		speed=column(speed_pid, DEFAULT_SPEED),
+		load=column(load_pid, DEFAULT_LOAD),
+		coolant_temp=column(coolant_pid, DEFAULT_COOLANT_TEMP),
+		fuel_status=column(fuel_status_pid, DEFAULT_FUEL_STATUS),
+		n=len(data_rows),
+	)
+	return labels.tolist()
+
+def classify_operating_states(data_rows, pids):
+	if not data_rows:
+		return []
+
+	for row, state in zip(data_rows, classify_state_labels(data_rows, pids)):
 		row['operating_state'] = state
-		
-	return data_rows
\ No newline at end of file
+
+	return data_rows
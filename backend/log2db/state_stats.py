@@ -0,0 +1,86 @@
+# FILE: backend/log2db/state_stats.py
+#
+# --- VERSION 1.0.3 ---
+# - Insert-tuple positions come from `insert_tuples`.
+# - `remove_aggregate` is the inverse of `merge_aggregates`; it takes a
+#   deleted log's share back out of the stored baselines.
+# - Insert tuples carry `ts_ms` after `timestamp`; the state and value
+#   positions moved by one.
+# - Per-PID, per-operating-state baseline statistics kept as mergeable
+#   (count, mean, M2) aggregates in the `pid_state_stats` table, so the log
+#   view reads them instead of scanning log_data for every PID.
+# - `StateStatsAccumulator` aggregates each batch of insert tuples during
+#   ingestion; the batch's aggregates are merged into the table in the same
+#   transaction as its rows (see `Checkpoint.state_stats`). The merge is the
+#   parallel-variance combination (Chan et al.), also done in SQL.
+# - The standard deviation reported is the population one, sqrt(M2 / count),
+#   matching MySQL's STDDEV().
+# -----------------------------
+
+import math
+
+import numpy as np
+
+from .utils import is_numeric_type
+from .insert_tuples import STATE_INDEX, FIRST_VALUE_INDEX
+
+def merge_aggregates(a, b):
+    """Combines two (count, mean, m2) aggregates."""
+    count_a, mean_a, m2_a = a
+    count_b, mean_b, m2_b = b
+    count = count_a + count_b
+    if count == 0:
+        return 0, 0.0, 0.0
+    delta = mean_b - mean_a
+    mean = mean_a + delta * count_b / count
+    m2 = m2_a + m2_b + delta * delta * count_a * count_b / count
+    return count, mean, m2
+
+def remove_aggregate(total, part):
+    """Takes `part` back out of `total`, both (count, mean, m2); (0, 0.0, 0.0) when nothing is left."""
+    count, mean, m2 = total
+    count_b, mean_b, m2_b = part
+    count_a = count - count_b
+    if count_a <= 0:
+        return 0, 0.0, 0.0
+    mean_a = (count * mean - count_b * mean_b) / count_a
+    delta = mean_b - mean_a
+    m2_a = m2 - m2_b - delta * delta * count_a * count_b / count
+    return count_a, mean_a, max(m2_a, 0.0)
+
+def std_dev(count, m2):
+    return math.sqrt(max(m2, 0.0) / count) if count else None
+
+def numeric_positions(column_map, defined_columns):
+    """[(position in an insert tuple's values, column_id)] for the numeric columns of `column_map`."""
+    return [(i, defined_columns[h]['column_id']) for i, h in enumerate(column_map)
+            if is_numeric_type(defined_columns[h].get('mysql_data_type') or '')]
+
+class StateStatsAccumulator:
+    """Aggregates numeric values by (column_id, operating_state) from insert tuples."""
+
+    def __init__(self, positions):
+        self.positions = positions
+        self._pending = {}
+
+    def add(self, insert_tuples):
+        if not insert_tuples or not self.positions:
+            return
+        states = np.array([t[STATE_INDEX] for t in insert_tuples], dtype=object)
+        state_masks = [(state, states == state) for state in set(states.tolist()) if state is not None]
+        for position, column_id in self.positions:
+            values = np.array([t[FIRST_VALUE_INDEX + position] for t in insert_tuples], dtype=float)
+            present = ~np.isnan(values)
+            for state, mask in state_masks:
+                selected = values[mask & present]
+                if not selected.size:
+                    continue
+                mean = float(selected.mean())
+                batch = (int(selected.size), mean, float(((selected - mean) ** 2).sum()))
+                key = (column_id, state)
+                self._pending[key] = merge_aggregates(self._pending[key], batch) if key in self._pending else batch
+
+    def take(self):
+        """Returns the aggregates gathered since the last call as [(column_id, state, count, mean, m2)]."""
+        pending, self._pending = self._pending, {}
+        return [(column_id, state, count, mean, m2) for (column_id, state), (count, mean, m2) in pending.items()]
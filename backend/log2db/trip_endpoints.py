@@ -0,0 +1,187 @@
+# FILE: backend/log2db/trip_endpoints.py
+#
+# --- VERSION 1.1.2 ---
+# - Only PREVIEW_SENSITIVITIES are served: `parse_sensitivity` validates a
+#   request's value, and `EndpointSet.summary` no longer caches others, so
+#   the preview cache cannot grow with request traffic.
+#
+# --- VERSION 1.1.1 ---
+# - `EndpointTracker` takes the first value position from `insert_tuples`
+#   instead of `StateStatsAccumulator`.
+# - `load_endpoint_set` keeps every log's endpoints in memory as numpy arrays
+#   (one per database, process-wide). It is reloaded only after endpoints in
+#   `trips` were added, removed or changed, e.g. when a new log was ingested;
+#   checking that costs one small query.
+# - The grouping preview of sensitivities 1-6 (decimal places of the rounded
+#   endpoints) is computed for all of them in one vectorized pass when the set
+#   is loaded, so moving the preview slider does no work at all. Group keys
+#   come from `round_endpoints` both for the preview and for applying a
+#   grouping, so the two always agree.
+# - The start and end coordinates of each log (its first and last row with a
+#   non-zero latitude and longitude) are kept in `trips`, so trip grouping
+#   reads one small table instead of two ORDER BY queries on log_data per log.
+# - `EndpointTracker` picks them out of the insert tuples while a file is
+#   ingested. `DatabaseManager.refresh_trip_endpoints` recomputes them for any
+#   set of logs in one INSERT ... SELECT, for backfills and resumed files.
+# -----------------------------
+
+import math
+import threading
+
+import numpy as np
+
+from .insert_tuples import FIRST_VALUE_INDEX
+
+def find_gps_columns(defined_columns):
+    """
+    (latitude, longitude) column definitions from `get_all_defined_columns`:
+    the first PIDs whose names contain 'latitude' and 'longitude'. None unless
+    both exist.
+    """
+    lat = next((info for name, info in defined_columns.items() if 'latitude' in name), None)
+    lon = next((info for name, info in defined_columns.items() if 'longitude' in name), None)
+    return (lat, lon) if lat and lon else None
+
+def _coordinate(value):
+    """The value as a float when it is a usable coordinate (finite, non-zero), else None."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value and math.isfinite(value) else None
+
+class EndpointTracker:
+    """First and last valid (lat, lon) of one log, taken from its insert tuples in order."""
+
+    def __init__(self, column_map, defined_columns, gps_columns):
+        self.positions = None
+        self.start = self.end = None
+        if gps_columns:
+            ids = [defined_columns[h]['column_id'] for h in column_map]
+            lat_id, lon_id = (info['column_id'] for info in gps_columns)
+            if lat_id in ids and lon_id in ids:
+                self.positions = (FIRST_VALUE_INDEX + ids.index(lat_id), FIRST_VALUE_INDEX + ids.index(lon_id))
+
+    def add(self, insert_tuples):
+        if self.positions is None:
+            return
+        lat_at, lon_at = self.positions
+        if self.start is None:
+            for t in insert_tuples:
+                start = _coordinate(t[lat_at]), _coordinate(t[lon_at])
+                if None not in start:
+                    self.start = start
+                    break
+            else:
+                return
+        for t in reversed(insert_tuples):
+            end = _coordinate(t[lat_at]), _coordinate(t[lon_at])
+            if None not in end:
+                self.end = end
+                return
+
+# Decimal places swept when an endpoint set is loaded; the only sensitivities accepted.
+PREVIEW_SENSITIVITIES = tuple(range(1, 7))
+
+def parse_sensitivity(value):
+    """`value` (e.g. from a request body) as one of PREVIEW_SENSITIVITIES, or None."""
+    if isinstance(value, bool):
+        return None
+    try:
+        sensitivity = int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    if sensitivity != value and str(sensitivity) != value:
+        return None
+    return sensitivity if sensitivity in PREVIEW_SENSITIVITIES else None
+
+# Process-wide endpoint sets, keyed by (host, database): (version, EndpointSet).
+_endpoint_sets = {}
+_endpoint_sets_lock = threading.Lock()
+
+def round_endpoints(coords, sensitivities):
+    """
+    Group keys of `coords` (n x [start_lat, start_lon, end_lat, end_lon]) for
+    each of `sensitivities`: an array of shape (len(sensitivities), n, 4)
+    holding both points rounded to that many decimals, lower point first.
+    """
+    scale = 10.0 ** np.asarray(sensitivities, dtype=float)[:, None, None]
+    scaled = coords * scale
+    rounded = np.rint(scaled) / scale
+    # Near a half the product can fall on the wrong side of it; those few values
+    # get Python's round(), which `generate_group_id` has always used.
+    for level, row, col in zip(*np.nonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)):
+        rounded[level, row, col] = round(float(coords[row, col]), int(sensitivities[level]))
+    # + 0.0 turns -0.0 into 0.0, which would otherwise hash differently.
+    rounded += 0.0
+    start, end = rounded[..., :2], rounded[..., 2:]
+    swap = (start[..., 0] > end[..., 0]) | ((start[..., 0] == end[..., 0]) & (start[..., 1] > end[..., 1]))
+    return np.where(swap[..., None], np.concatenate([end, start], axis=-1), rounded)
+
+def group_summaries(coords, sensitivities=PREVIEW_SENSITIVITIES):
+    """
+    {sensitivity: grouping preview} for `coords`: the number of groups with
+    more than one trip, the trips in them, and those groups by size.
+    """
+    count = len(sensitivities)
+    sizes = levels = np.zeros(0, dtype=np.int64)
+    if len(coords):
+        keys = round_endpoints(coords, sensitivities).reshape(-1, 4)
+        key_levels = np.repeat(np.arange(count), len(coords))
+        order = np.lexsort((keys[:, 3], keys[:, 2], keys[:, 1], keys[:, 0], key_levels))
+        keys, key_levels = keys[order], key_levels[order]
+        new_group = np.ones(len(keys), dtype=bool)
+        new_group[1:] = (key_levels[1:] != key_levels[:-1]) | (keys[1:] != keys[:-1]).any(axis=1)
+        starts = np.flatnonzero(new_group)
+        sizes = np.diff(np.append(starts, len(keys)))
+        levels = key_levels[starts]
+
+    def per_level(mask, weights=None):
+        return np.bincount(levels[mask], weights=None if weights is None else weights[mask], minlength=count).astype(np.int64).tolist()
+
+    total_groups = per_level(sizes > 1)
+    total_trips = per_level(sizes > 1, sizes)
+    of_2 = per_level(sizes == 2)
+    of_3_4 = per_level((sizes == 3) | (sizes == 4))
+    of_5_plus = per_level(sizes >= 5)
+    return {s: {"total_groups": total_groups[i], "total_trips_grouped": total_trips[i],
+                "group_counts": {"groups_of_2": of_2[i], "groups_of_3_4": of_3_4[i], "groups_of_5_plus": of_5_plus[i]}}
+            for i, s in enumerate(sensitivities)}
+
+class EndpointSet:
+    """Every log's trip endpoints as arrays, with the grouping preview of each sensitivity."""
+
+    def __init__(self, rows):
+        self.log_ids = np.array([r['log_id'] for r in rows], dtype=np.int64)
+        self.coords = np.array([[r['start_lat'], r['start_lon'], r['end_lat'], r['end_lon']] for r in rows], dtype=float).reshape(-1, 4)
+        self._summaries = group_summaries(self.coords)
+
+    def __len__(self):
+        return len(self.log_ids)
+
+    def group_keys(self, sensitivity):
+        """(n, 4) rounded endpoints, lower point first; equal rows form one group."""
+        return round_endpoints(self.coords, [sensitivity])[0]
+
+    def summary(self, sensitivity):
+        """The grouping preview of one of PREVIEW_SENSITIVITIES; ValueError for any other."""
+        summary = self._summaries.get(sensitivity)
+        if summary is None:
+            raise ValueError(f"Sensitivity must be one of {PREVIEW_SENSITIVITIES}, not {sensitivity!r}.")
+        return summary
+
+def load_endpoint_set(db_manager):
+    """
+    The EndpointSet of `db_manager`'s database. Served from memory until
+    the endpoints in `trips` change.
+    """
+    key = db_manager._schema_cache_key()
+    version = db_manager.trip_endpoints_version()
+    with _endpoint_sets_lock:
+        cached = _endpoint_sets.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    endpoint_set = EndpointSet(db_manager.get_trip_endpoints())
+    with _endpoint_sets_lock:
+        _endpoint_sets[key] = (version, endpoint_set)
+    return endpoint_set
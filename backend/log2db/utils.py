@@ -2,15 +2,37 @@
 #
 # Contains utility and helper functions for the application.
 #
-# --- VERSION 0.8.3 CHANGE ---
-# - `parse_start_timestamp` is now much more robust.
-#   - It now handles multiple date formats (YYYY-MM-DD and MM/DD/YYYY with AM/PM).
-#   - The regex now accepts either ':' or '=' as a separator.
-# - All `open()` calls now use `encoding='utf-8-sig'` to automatically handle
-#   and strip the UTF-8 Byte Order Mark (BOM) character from the start of files.
+# --- VERSION 0.8.7 CHANGE ---
+# - Removed the dead `parse_start_timestamp` scan: `read_preamble` finds the
+#   StartTime in its single pass, and nothing called it any more. Its
+#   `find_header_row` counterpart and the imports only they used are gone
+#   from core.py too.
+#
+# --- VERSION 0.8.6 CHANGE ---
+# - `parse_start_time` returns the StartTime as a UTC datetime with its
+#   fractional seconds; `parse_timestamp_string` truncates it to Unix time.
+# - `last_data_rows` returns the last N data rows of a CSV by reading blocks
+#   backwards from EOF, so finding a log's final row costs a few KB of I/O
+#   instead of a full read. Used by the maintenance scripts and by ingestion
+#   when a resumed file has no rows left to stream.
+#
+# --- VERSION 0.8.5 CHANGE ---
+# - `ColumnTypeSampler` types a new column from every value seen in the file
+#   instead of the first row, so an empty first cell no longer turns
+#   a numeric PID into VARCHAR. Values needing more than FLOAT's ~7
+#   significant digits (e.g. GPS coordinates) get DOUBLE.
+# - `value_converter` returns the function that turns a raw CSV cell into the
+#   Python value bound for a column of a given type ('' becomes None).
+#
+# --- VERSION 0.8.4 CHANGE ---
+# - The StartTime regex, formats and timezone are module constants, and the
+#   string-to-Unix conversion lives in `parse_timestamp_string` so the
+#   single-pass preamble reader in `preamble.py` can share it.
 # -----------------------------
 
+import csv
 import logging
+import math
 import os
 import re
 from datetime import datetime
@@ -46,66 +68,165 @@ def sanitize_column_name(header):
 
 def infer_mysql_type(value_sample):
     """Infers the MySQL data type from a sample value."""
-    if value_sample is None or value_sample.strip() == '':
-        return 'VARCHAR(255)'
+    return infer_mysql_type_from_values([value_sample])
+
+# FLOAT keeps about 7 significant decimal digits; anything longer goes to DOUBLE.
+FLOAT_SIGNIFICANT_DIGITS = 7
+FLOAT_MAX_MAGNITUDE = 3.4e38
+NUMERIC_TYPE_PREFIXES = ('FLOAT', 'DOUBLE', 'DECIMAL', 'TINYINT', 'SMALLINT', 'MEDIUMINT', 'INT', 'BIGINT')
+INTEGER_TYPE_PREFIXES = ('TINYINT', 'SMALLINT', 'MEDIUMINT', 'INT', 'BIGINT')
+
+def significant_digits(value_str):
+    """'-0.004560' -> 4, '97.1234567' -> 9, '1.5e3' -> 2"""
+    mantissa = value_str.strip().lstrip('+-').lower().split('e')[0]
+    if '.' in mantissa:
+        mantissa = mantissa.replace('.', '').rstrip('0') or '0'
+    digits = mantissa.lstrip('0')
+    return len(digits) or 1
+
+class ColumnTypeSampler:
+    """
+    Accumulates raw values for one column and reports the narrowest type that
+    holds all of them. Empty cells are ignored; a column with no values at all
+    stays VARCHAR(255), as does any column with a non-numeric value.
+    """
+
+    def __init__(self):
+        self.seen_number = False
+        self.needs_double = False
+        self.is_text = False
+
+    def add(self, value):
+        if self.is_text or value is None or value.strip() == '':
+            return
+        try:
+            number = float(value)
+        except (ValueError, TypeError):
+            self.is_text = True
+            return
+        if not math.isfinite(number):
+            return
+        self.seen_number = True
+        if not self.needs_double and (significant_digits(value) > FLOAT_SIGNIFICANT_DIGITS or abs(number) > FLOAT_MAX_MAGNITUDE):
+            self.needs_double = True
+
+    @property
+    def mysql_type(self):
+        if self.is_text or not self.seen_number:
+            return 'VARCHAR(255)'
+        return 'DOUBLE' if self.needs_double else 'FLOAT'
+
+def infer_mysql_type_from_values(values):
+    sampler = ColumnTypeSampler()
+    for value in values:
+        sampler.add(value)
+    return sampler.mysql_type
+
+def is_numeric_type(mysql_data_type):
+    return mysql_data_type.upper().startswith(NUMERIC_TYPE_PREFIXES)
+
+def _to_float(value):
+    if value is None:
+        return None
     try:
-        float(value_sample)
-        return 'FLOAT'
+        number = float(value)
     except (ValueError, TypeError):
-        return 'VARCHAR(255)'
+        return None
+    return number if math.isfinite(number) else None
+
+def _to_int(value):
+    number = _to_float(value)
+    return int(round(number)) if number is not None else None
+
+def _to_text(value):
+    return value if value else None
 
-def parse_start_timestamp(file_path):
+def value_converter(mysql_data_type):
+    """Returns a function converting a raw CSV cell into the value bound for a column of this type."""
+    data_type = (mysql_data_type or '').upper()
+    if data_type.startswith(INTEGER_TYPE_PREFIXES):
+        return _to_int
+    if data_type.startswith(NUMERIC_TYPE_PREFIXES):
+        return _to_float
+    return _to_text
+
+# Flexible regex: matches "StartTime" or "Start Time", case-insensitive, with ':' or '='.
+TIMESTAMP_PATTERN = re.compile(r"#\s*Start\s?Time\s*[:=]\s*(.*)", re.IGNORECASE)
+
+# List of possible formats to try parsing.
+TIMESTAMP_FORMATS = [
+    "%m/%d/%Y %I:%M:%S.%f %p",  # MM/DD/YYYY HH:MM:SS.ms AM/PM
+    "%m/%d/%Y %I:%M:%S %p",     # MM/DD/YYYY HH:MM:SS AM/PM
+    "%Y-%m-%d %H:%M:%S",       # YYYY-MM-DD HH:MM:SS (24-hour)
+]
+
+LOG_TIMEZONE = pytz.timezone('America/Chicago')
+
+def parse_start_time(timestamp_str):
+    """Converts the value of a StartTime line to a UTC datetime (sub-second precision kept), or None if no format matches."""
+    local_dt = None
+    for dt_format in TIMESTAMP_FORMATS:
+        try:
+            local_dt = datetime.strptime(timestamp_str, dt_format)
+            logging.info(f"    > Matched format: '{dt_format}'")
+            break  # Success, exit the format-trying loop
+        except ValueError:
+            continue # Failed, try the next format
+
+    if local_dt is None:
+        logging.error(f"    > FAILED: Could not parse '{timestamp_str}' with any known format.")
+        return None
+
+    return LOG_TIMEZONE.localize(local_dt).astimezone(pytz.utc)
+
+def parse_timestamp_string(timestamp_str):
+    """Converts the value of a StartTime line to Unix time, or None if no format matches."""
+    start_time = parse_start_time(timestamp_str)
+    if start_time is None:
+        return None
+    unix_timestamp = int(start_time.timestamp())
+    logging.info(f"  > Converted to Unix timestamp (UTC): {unix_timestamp}")
+    return unix_timestamp
+
+TAIL_BLOCK_SIZE = 8192
+
+def tail_lines(f, count=1, block_size=TAIL_BLOCK_SIZE):
     """
-    Scans the top of a CSV file for a timestamp line and converts it to Unix time.
-    This version is robust and handles multiple formats.
+    Returns the last `count` non-empty, non-comment lines of a seekable binary
+    file, oldest first, reading `block_size` chunks backwards from EOF.
     """
-    file_name = os.path.basename(file_path)
-    logging.info(f"Scanning for timestamp in: {file_name}")
-    cst = pytz.timezone('America/Chicago')
-    # Flexible regex: matches "StartTime" or "Start Time", case-insensitive, with ':' or '='.
-    timestamp_pattern = re.compile(r"#\s*Start\s?Time\s*[:=]\s*(.*)", re.IGNORECASE)
-    
-    try:
-        # Use 'utf-8-sig' to automatically handle the BOM character.
-        with open(file_path, 'r', encoding='utf-8-sig', errors='ignore') as f:
-            for i, line in enumerate(f):
-                if i < 5:
-                    logging.info(f"  > Scanning line {i+1}: '{line.strip()}'")
-                
-                match = timestamp_pattern.search(line)
-                if match:
-                    timestamp_str = match.group(1).strip()
-                    logging.info(f"  SUCCESS: Found raw timestamp string: '{timestamp_str}'")
-                    
-                    # List of possible formats to try parsing.
-                    possible_formats = [
-                        "%m/%d/%Y %I:%M:%S.%f %p",  # MM/DD/YYYY HH:MM:SS.ms AM/PM
-                        "%m/%d/%Y %I:%M:%S %p",     # MM/DD/YYYY HH:MM:SS AM/PM
-                        "%Y-%m-%d %H:%M:%S",       # YYYY-MM-DD HH:MM:SS (24-hour)
-                    ]
-                    
-                    local_dt = None
-                    for dt_format in possible_formats:
-                        try:
-                            local_dt = datetime.strptime(timestamp_str, dt_format)
-                            logging.info(f"    > Matched format: '{dt_format}'")
-                            break  # Success, exit the format-trying loop
-                        except ValueError:
-                            continue # Failed, try the next format
-                    
-                    if local_dt is None:
-                        logging.error(f"    > FAILED: Could not parse '{timestamp_str}' with any known format.")
-                        return None
-
-                    cst_dt = cst.localize(local_dt)
-                    unix_timestamp = int(cst_dt.timestamp())
-                    logging.info(f"  > Converted to Unix timestamp (UTC): {unix_timestamp}")
-                    return unix_timestamp
-                
-                if line.strip() and not line.strip().startswith('#'):
-                    logging.warning(f"  STOP: Reached non-comment line without finding timestamp.")
-                    break
-    except Exception as e:
-        logging.error(f"  ERROR: An exception occurred while reading {file_path}: {e}")
-        
-    return None
+    f.seek(0, os.SEEK_END)
+    position = f.tell()
+    pending = b''
+    found = []
+
+    def collect(raw_line, at_start=False):
+        line = raw_line.decode('utf-8', errors='ignore')
+        if at_start:
+            line = line.lstrip('\ufeff')
+        line = line.strip()
+        if line and not line.startswith('#'):
+            found.append(line)
+        return len(found) >= count
+
+    while position > 0:
+        step = min(block_size, position)
+        position -= step
+        f.seek(position)
+        pieces = (f.read(step) + pending).split(b'\n')
+        # The first piece may continue in the block before this one.
+        pending = pieces[0]
+        for raw_line in reversed(pieces[1:]):
+            if collect(raw_line):
+                return found[::-1]
+    if pending:
+        collect(pending, at_start=True)
+    return found[::-1]
+
+def last_data_rows(file_path, count=1, dialect=csv.excel):
+    """
+    Parsed CSV fields of the last `count` data rows of a log file. A log with
+    no data rows yields its header row, as the row before the data would.
+    """
+    with open(file_path, 'rb') as f:
+        return list(csv.reader(tail_lines(f, count), dialect))
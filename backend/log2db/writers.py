@@ -0,0 +1,168 @@
+# FILE: backend/log2db/writers.py
+#
+# --- VERSION 1.2.4 ---
+# - `finish()` takes the file's `pid_state_stats` aggregates; `load_data`
+#   merges them in the LOAD DATA transaction, so rows and statistics are
+#   committed together. Writers that commit per batch have none left.
+#
+# --- VERSION 1.2.3 ---
+# - The narrow writer indexes insert tuples through `insert_tuples`.
+# - The narrow writer stores values of non-numeric columns in `text_value` as
+#   they are, so a VARCHAR such as '0012' reads back the same in both layouts.
+# - Insert tuples carry `ts_ms` after `timestamp`. The narrow writer skips it;
+#   log_rows keeps whole-second timestamps ordered by row_seq.
+# - `write()` returns False if the batch was not stored and accepts an ingest
+#   checkpoint. Writers with `commits_per_batch` save it in the batch's
+#   transaction; `load_data` commits once at `finish()` and ignores it.
+# - Selectable bulk writers for `log_data`. `process_log_file` hands each batch
+#   of insert tuples to a writer and calls `finish()` once the file is consumed.
+#   - `executemany`: the original path, one executemany + commit per batch.
+#   - `load_data`: spools the whole log to a temporary TSV and loads it with
+#     `LOAD DATA LOCAL INFILE` in a single transaction.
+#   - `narrow`: long-format storage in `log_rows`/`log_samples`, used for
+#     every log ingested with `storage='narrow'`.
+# -----------------------------
+
+import os
+import math
+import logging
+import tempfile
+
+from .utils import is_numeric_type
+from .insert_tuples import TIMESTAMP_INDEX, STATE_INDEX, FIRST_VALUE_INDEX
+
+DEFAULT_WRITER = 'executemany'
+
+STORAGE_WIDE = 'wide'
+STORAGE_NARROW = 'narrow'
+STORAGE_LAYOUTS = (STORAGE_WIDE, STORAGE_NARROW)
+
+_TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+def tsv_field(value):
+    """Encodes one value using the LOAD DATA default escaping (`\\N` is NULL)."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, str):
+        return value.translate(_TSV_ESCAPES)
+    return str(value)
+
+class ExecutemanyWriter:
+    name = 'executemany'
+    commits_per_batch = True
+
+    def __init__(self, db_manager, log_id, column_map):
+        self.db_manager = db_manager
+        self.log_id = log_id
+        self.column_map = column_map
+
+    def write(self, insert_tuples, checkpoint=None):
+        return self.db_manager.insert_log_data_tuples(self.log_id, self.column_map, insert_tuples, checkpoint)
+
+    def finish(self, state_stats=None):
+        return True
+
+    def abort(self):
+        pass
+
+class LoadDataWriter:
+    name = 'load_data'
+    commits_per_batch = False
+
+    def __init__(self, db_manager, log_id, column_map):
+        self.db_manager = db_manager
+        self.log_id = log_id
+        self.column_map = column_map
+        self.row_count = 0
+        self.spool = tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', newline='\n', prefix=f'log2db_{log_id}_', suffix='.tsv', delete=False)
+
+    def write(self, insert_tuples, checkpoint=None):
+        lines = ['\t'.join([tsv_field(v) for v in row]) for row in insert_tuples]
+        self.spool.write('\n'.join(lines))
+        self.spool.write('\n')
+        self.row_count += len(insert_tuples)
+        return True
+
+    def finish(self, state_stats=None):
+        self.spool.close()
+        try:
+            return self.db_manager.load_log_data_file(self.log_id, self.column_map, self.spool.name, self.row_count, state_stats)
+        finally:
+            self._remove_spool()
+
+    def abort(self):
+        self.spool.close()
+        self._remove_spool()
+
+    def _remove_spool(self):
+        try:
+            os.remove(self.spool.name)
+        except OSError:
+            pass
+
+def narrow_sample(value, mysql_data_type=None):
+    """
+    Splits a value into (value, text_value); None for empty cells, which are
+    not stored. Values of a non-numeric `mysql_data_type` are always text.
+    """
+    if value is None or value == '':
+        return None
+    if mysql_data_type is not None and not is_numeric_type(mysql_data_type):
+        return None, str(value)[:255]
+    try:
+        number = float(value)
+        if math.isfinite(number):
+            return number, None
+    except (ValueError, TypeError):
+        pass
+    return None, str(value)[:255]
+
+class NarrowWriter:
+    name = 'narrow'
+    commits_per_batch = True
+
+    def __init__(self, db_manager, log_id, column_map, column_ids, start_row=0, column_types=None):
+        self.db_manager = db_manager
+        self.log_id = log_id
+        self.column_ids = column_ids
+        self.column_types = column_types or [None] * len(column_ids)
+        self.row_seq = start_row
+
+    def write(self, insert_tuples, checkpoint=None):
+        row_tuples = []
+        sample_tuples = []
+        for t in insert_tuples:
+            row_tuples.append((self.log_id, self.row_seq, t[TIMESTAMP_INDEX], t[STATE_INDEX]))
+            for column_id, mysql_data_type, value in zip(self.column_ids, self.column_types, t[FIRST_VALUE_INDEX:]):
+                sample = narrow_sample(value, mysql_data_type)
+                if sample:
+                    sample_tuples.append((self.log_id, column_id, self.row_seq) + sample)
+            self.row_seq += 1
+        return self.db_manager.insert_narrow_rows(self.log_id, row_tuples, sample_tuples, checkpoint)
+
+    def finish(self, state_stats=None):
+        return True
+
+    def abort(self):
+        pass
+
+WRITERS = {
+    ExecutemanyWriter.name: ExecutemanyWriter,
+    LoadDataWriter.name: LoadDataWriter,
+}
+
+def get_writer(name, db_manager, log_id, column_map, storage=STORAGE_WIDE, column_ids=None, start_row=0, column_types=None):
+    """
+    Returns the requested writer, falling back to executemany if LOAD DATA is
+    unavailable. Narrow storage always uses `NarrowWriter`; `column_ids` and
+    `column_types` (MySQL types) must then line up with `column_map`.
+    `start_row` is the number of rows already stored when resuming a log.
+    """
+    if storage == STORAGE_NARROW:
+        return NarrowWriter(db_manager, log_id, column_map, column_ids, start_row, column_types)
+    if name not in WRITERS:
+        raise ValueError(f"Unknown log_data writer '{name}'. Choose from: {', '.join(WRITERS)}")
+    if name == LoadDataWriter.name and not db_manager.supports_local_infile():
+        logging.warning("LOAD DATA LOCAL INFILE is not enabled for this connection/server. Falling back to executemany.")
+        name = ExecutemanyWriter.name
+    return WRITERS[name](db_manager, log_id, column_map)
@@ -0,0 +1,105 @@
+# FILE: backend/scripts/convert_log_storage.py
+#
+# --- VERSION 1.0.0 ---
+# - Moves logs from the wide `log_data` table into the long-format
+#   `log_rows`/`log_samples` tables. Each log is converted in one transaction:
+#   copy rows, copy every non-empty PID value, delete the log_data rows, flip
+#   `log_index.storage_layout`. A failure rolls the log back to wide storage.
+# - Usage: python scripts/convert_log_storage.py --log-id 12 [--dry-run]
+#          python scripts/convert_log_storage.py --all
+# -----------------------------
+
+import os
+import sys
+import json
+import logging
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from config.db_credentials import DB_CONFIG
+    from log2db.utils import setup_logging, is_numeric_type
+    from log2db.db_manager import DatabaseManager
+    from log2db.writers import STORAGE_WIDE, STORAGE_NARROW
+except ImportError as e:
+    print(f"FATAL: A required file or module could not be imported: {e}", file=sys.stderr)
+    sys.exit(1)
+
+def wide_logs(db_manager, log_ids=None):
+    query = "SELECT log_id, file_name, column_ids_json FROM log_index WHERE storage_layout = %s"
+    params = [STORAGE_WIDE]
+    if log_ids:
+        query += f" AND log_id IN ({', '.join(['%s'] * len(log_ids))})"
+        params.extend(log_ids)
+    return db_manager.fetch_all(query + " ORDER BY log_id", tuple(params))
+
+def log_columns(db_manager, column_ids_json):
+    """column_definitions rows for the log's PIDs that physically exist in log_data."""
+    column_ids = json.loads(column_ids_json or '[]')
+    by_id = {c['column_id']: c for c in db_manager.get_all_defined_columns().values()}
+    return [by_id[cid] for cid in column_ids if cid in by_id and by_id[cid].get('wide_column', 1)]
+
+def convert_log(db_manager, log, dry_run=False):
+    log_id = log['log_id']
+    columns = log_columns(db_manager, log['column_ids_json'])
+    if dry_run:
+        count = db_manager.fetch_one("SELECT COUNT(*) AS n FROM log_data WHERE log_id = %s", (log_id,))['n']
+        logging.info(f"[dry-run] Log {log_id} ('{log['file_name']}'): {count} rows x {len(columns)} PIDs would be converted.")
+        return True
+
+    cursor = db_manager.connection.cursor()
+    try:
+        db_manager.connection.start_transaction()
+        cursor.execute(
+            "INSERT INTO log_rows (log_id, row_seq, timestamp, operating_state) "
+            "SELECT log_id, ROW_NUMBER() OVER (ORDER BY data_id) - 1, timestamp, operating_state "
+            "FROM log_data WHERE log_id = %s", (log_id,))
+        row_count = cursor.rowcount
+        sample_count = 0
+        for c in columns:
+            target = 'value' if is_numeric_type(c['mysql_data_type']) else 'text_value'
+            cursor.execute(
+                f"INSERT INTO log_samples (log_id, column_id, row_seq, {target}) "
+                f"SELECT log_id, %s, seq, v FROM ("
+                f"  SELECT log_id, ROW_NUMBER() OVER (ORDER BY data_id) - 1 AS seq, `{c['sanitized_name']}` AS v "
+                f"  FROM log_data WHERE log_id = %s) AS numbered "
+                f"WHERE v IS NOT NULL", (c['column_id'], log_id))
+            sample_count += cursor.rowcount
+        cursor.execute("DELETE FROM log_data WHERE log_id = %s", (log_id,))
+        cursor.execute("UPDATE log_index SET storage_layout = %s WHERE log_id = %s", (STORAGE_NARROW, log_id))
+        db_manager.connection.commit()
+        logging.info(f"Converted log {log_id} ('{log['file_name']}'): {row_count} rows, {sample_count} samples.")
+        return True
+    except Exception as e:
+        db_manager.connection.rollback()
+        logging.error(f"Failed to convert log {log_id}: {e}", exc_info=True)
+        return False
+    finally:
+        cursor.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert wide log_data logs to long-format storage.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--log-id', type=int, nargs='+', help="One or more log_ids to convert.")
+    target.add_argument('--all', action='store_true', help="Convert every log still in wide storage.")
+    parser.add_argument('--dry-run', action='store_true', help="Report what would be converted without changing anything.")
+    args = parser.parse_args()
+
+    logger = setup_logging()
+    db_manager = None
+    try:
+        db_manager = DatabaseManager(DB_CONFIG)
+        db_manager.ensure_base_tables_exist()
+        logs = wide_logs(db_manager, None if args.all else args.log_id)
+        if not logs:
+            logger.info("No wide-storage logs matched. Nothing to do.")
+            return
+        converted = sum(1 for log in logs if convert_log(db_manager, log, args.dry_run))
+        logger.info(f"{converted}/{len(logs)} logs {'checked' if args.dry_run else 'converted'}.")
+    finally:
+        if db_manager:
+            db_manager.close()
+
+if __name__ == "__main__":
+    main()
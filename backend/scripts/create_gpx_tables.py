@@ -1,6 +1,7 @@
 # File: backend/scripts/create_gpx_tables.py
-# Version: 0.1.0.0
-# Commit: create waypoints, tracks, track_segments tables
+# Version: 0.2.0.0
+# Commit: apply migrations/2025_09_add_migrations_tables.sql through the
+#         migration runner instead of dropping and recreating the tables
 
 import os
 import sys
@@ -15,8 +16,9 @@ if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 import logging
-import mysql.connector
 from backend.config.db_credentials import DB_CONFIG
+from backend.log2db.db_manager import DatabaseManager
+from backend.log2db.migrations import apply_migrations
 
 def main():
     # Setup program_logs directory
@@ -31,39 +33,14 @@ def main():
     logger = logging.getLogger(__name__)
     logger.info("=== Starting GPX tables creation script ===")
 
-    # Connect to database
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor()
-
-    # 1) Drop existing tables for idempotency
-    for tbl in ('track_segments', 'tracks', 'waypoints'):
-        logger.info(f"Dropping table if exists: {tbl}")
-        cursor.execute(f"DROP TABLE IF EXISTS {tbl};")
-
-    # 2) Locate and read SQL file
-    sql_file = os.path.join(
-        PROJECT_ROOT,
-        'backend',
-        'migrations',
-        '2025_09_add_migrations_tables.sql'
-    )
-    if not os.path.isfile(sql_file):
-        logger.critical(f"SQL file not found: {sql_file}")
-        sys.exit(1)
-
-    with open(sql_file, 'r') as f:
-        raw = f.read()
-    # Split on semicolon—each fragment is one statement
-    statements = [s.strip() for s in raw.split(';') if s.strip()]
-
-    # 3) Execute each CREATE TABLE statement
-    for stmt in statements:
-        logger.info(f"Executing SQL: {stmt[:60]}...")
-        cursor.execute(stmt + ';')
-
-    conn.commit()
-    cursor.close()
-    conn.close()
+    # The GPX tables are a recorded migration now: applied once, never dropped.
+    db_manager = DatabaseManager(DB_CONFIG)
+    try:
+        if not apply_migrations(db_manager, run_online=False):
+            logger.critical("Schema migrations failed; see the log for details.")
+            sys.exit(1)
+    finally:
+        db_manager.close()
     logger.info("=== GPX tables creation complete ===")
 
 if __name__ == '__main__':
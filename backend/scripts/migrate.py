@@ -0,0 +1,56 @@
+# FILE: backend/scripts/migrate.py
+#
+# --- VERSION 1.0.1 ---
+# - `--status` marks `manual` migrations (never applied at app startup).
+#
+# --- VERSION 1.0.0 ---
+# - Applies the pending schema migrations (see log2db/migrations.py),
+#   including the `online` ones that app startup defers because they rewrite
+#   a table that already holds data. Tables are changed online: INSTANT or
+#   INPLACE DDL where the server supports it, otherwise a throttled,
+#   chunked shadow-table copy that logs its progress.
+# - Usage: python scripts/migrate.py [--status] [--chunk-size N] [--throttle X]
+# -----------------------------
+
+import os
+import sys
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from config.db_credentials import DB_CONFIG
+    from log2db.utils import setup_logging
+    from log2db.db_manager import DatabaseManager
+    from log2db.migrations import apply_migrations, migration_status, COPY_CHUNK_SIZE, COPY_THROTTLE
+except ImportError as e:
+    print(f"FATAL: A required file or module could not be imported: {e}", file=sys.stderr)
+    sys.exit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations.")
+    parser.add_argument('--status', action='store_true', help="List the migrations and whether they are applied, then exit.")
+    parser.add_argument('--chunk-size', type=int, default=COPY_CHUNK_SIZE, help=f"Rows per chunk of a shadow-table copy (default: {COPY_CHUNK_SIZE}).")
+    parser.add_argument('--throttle', type=float, default=COPY_THROTTLE,
+                        help=f"Seconds to pause per second spent copying a chunk; 0 copies flat out (default: {COPY_THROTTLE}).")
+    args = parser.parse_args()
+
+    logger = setup_logging()
+    db_manager = None
+    try:
+        db_manager = DatabaseManager(DB_CONFIG)
+        if args.status:
+            for m, applied_at in migration_status(db_manager):
+                state = f"applied {applied_at}" if applied_at else ("pending (manual)" if m.manual else "pending (online)" if m.online else "pending")
+                print(f"{m.version:<48} {state:<32} {m.description}")
+            return
+        if not apply_migrations(db_manager, copy_options={'chunk_size': args.chunk_size, 'throttle': args.throttle}):
+            logger.error("Migrations failed; the remaining ones were not applied.")
+            sys.exit(1)
+        logger.info("Schema is up to date.")
+    finally:
+        if db_manager:
+            db_manager.close()
+
+if __name__ == "__main__":
+    main()
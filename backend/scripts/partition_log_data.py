@@ -0,0 +1,77 @@
+# FILE: backend/scripts/partition_log_data.py
+#
+# --- VERSION 1.0.0 ---
+# - Converts log_data to RANGE partitioning on log_id, online, by a throttled
+#   shadow-table copy (see log2db/migrations.py). Reads of one log then touch
+#   one partition, and deleting a log truncates its partition instead of
+#   running a large DELETE.
+# - Partitioned InnoDB tables cannot have foreign keys, so log_data loses its
+#   ON DELETE CASCADE to log_index (`DatabaseManager.delete_log_data` does
+#   that work). A primary key that does not contain log_id becomes
+#   (log_id, data_id), which also keeps each log's rows together.
+# - New partitions are added by the ingest as logs arrive. Running the script
+#   again repartitions with a different width. MySQL allows at most 8192
+#   partitions per table.
+# - Usage: python scripts/partition_log_data.py [--logs-per-partition N] [--chunk-size N] [--throttle X]
+# -----------------------------
+
+import os
+import sys
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from config.db_credentials import DB_CONFIG
+    from log2db.utils import setup_logging
+    from log2db.db_manager import DatabaseManager, log_data_partition_definitions, LOG_DATA_PARTITIONS_AHEAD, MAX_PARTITIONS
+    from log2db.migrations import shadow_copy, table_indexes, COPY_CHUNK_SIZE, COPY_THROTTLE
+except ImportError as e:
+    print(f"FATAL: A required file or module could not be imported: {e}", file=sys.stderr)
+    sys.exit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Partition log_data by log_id, online.")
+    parser.add_argument('--logs-per-partition', type=int, default=1, help="log_ids per RANGE partition (default: 1, one partition per log).")
+    parser.add_argument('--chunk-size', type=int, default=COPY_CHUNK_SIZE, help=f"Rows copied per chunk (default: {COPY_CHUNK_SIZE}).")
+    parser.add_argument('--throttle', type=float, default=COPY_THROTTLE, help=f"Seconds to pause per second spent copying (default: {COPY_THROTTLE}).")
+    args = parser.parse_args()
+    width = args.logs_per_partition
+
+    logger = setup_logging()
+    db_manager = None
+    try:
+        db_manager = DatabaseManager(DB_CONFIG)
+        db_manager.ensure_base_tables_exist()
+
+        newest = db_manager.fetch_one("SELECT COALESCE(MAX(log_id), 0) AS newest FROM log_index")['newest']
+        definitions = log_data_partition_definitions(0, newest + width * LOG_DATA_PARTITIONS_AHEAD, width)
+        if len(definitions) > MAX_PARTITIONS:
+            logger.error(f"{len(definitions)} partitions would exceed MySQL's limit of {MAX_PARTITIONS}; use a larger --logs-per-partition.")
+            sys.exit(1)
+
+        indexes = table_indexes(db_manager, 'log_data')
+        clauses = []
+        # Every unique key of a partitioned table must contain the partitioning column.
+        if 'log_id' not in indexes.get('PRIMARY', []):
+            clauses.append("DROP PRIMARY KEY, ADD PRIMARY KEY (log_id, data_id)")
+            if not any(columns[0] == 'data_id' for name, columns in indexes.items() if name != 'PRIMARY'):
+                clauses.append("ADD INDEX idx_data_id (data_id)")
+            # Only there for the foreign key; the new primary key starts with log_id.
+            if indexes.get('log_id') == ['log_id']:
+                clauses.append("DROP INDEX `log_id`")
+
+        logger.info(f"Partitioning log_data into {len(definitions)} partitions of {width} log(s).")
+        shadow_copy(db_manager, 'log_data', clauses, keep_foreign_keys=False,
+                    partitioning=f"PARTITION BY RANGE (log_id) ({', '.join(definitions)})",
+                    chunk_size=args.chunk_size, throttle=args.throttle)
+        logger.info(f"log_data now has {len(db_manager.log_data_partitions(refresh=True))} partitions.")
+    except Exception as e:
+        logger.critical(f"Partitioning failed; log_data was left as it was: {e}", exc_info=True)
+        sys.exit(1)
+    finally:
+        if db_manager:
+            db_manager.close()
+
+if __name__ == "__main__":
+    main()
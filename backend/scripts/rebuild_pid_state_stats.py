@@ -0,0 +1,45 @@
+# FILE: backend/scripts/rebuild_pid_state_stats.py
+#
+# --- VERSION 1.0.0 ---
+# - Recomputes the `pid_state_stats` baselines (count, mean, M2 per PID and
+#   operating state) from every stored log, wide and narrow, in one
+#   transaction. Ingestion keeps the table current; run this once after
+#   upgrading, after deleting logs, or after re-classifying operating states.
+# - Usage: python scripts/rebuild_pid_state_stats.py
+# -----------------------------
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from config.db_credentials import DB_CONFIG
+    from log2db.utils import setup_logging
+    from log2db.db_manager import DatabaseManager
+except ImportError as e:
+    print(f"FATAL: A required file or module could not be imported: {e}", file=sys.stderr)
+    sys.exit(1)
+
+def main():
+    argparse.ArgumentParser(description="Rebuild per-state PID statistics from the stored logs.").parse_args()
+
+    logger = setup_logging()
+    db_manager = None
+    try:
+        db_manager = DatabaseManager(DB_CONFIG)
+        db_manager.ensure_base_tables_exist()
+        started = time.perf_counter()
+        rows = db_manager.rebuild_pid_state_stats()
+        if rows is None:
+            logger.error("Rebuild failed; the previous statistics were kept.")
+            sys.exit(1)
+        logger.info(f"Rebuilt {rows} PID/state baselines in {time.perf_counter() - started:.1f}s.")
+    finally:
+        if db_manager:
+            db_manager.close()
+
+if __name__ == "__main__":
+    main()
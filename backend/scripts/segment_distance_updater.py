@@ -13,6 +13,9 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 BACKEND_DIR = os.path.dirname(SCRIPT_DIR)
 ZJOBD_DIR = os.path.dirname(BACKEND_DIR)
 sys.path.append(os.path.join(BACKEND_DIR, 'config'))
+sys.path.append(BACKEND_DIR)
+
+from log2db.utils import last_data_rows
 
 try:
     import db_credentials
@@ -108,20 +111,15 @@ def parse_log_file_distance(file_path):
             logger.warning("        Neither 'Trip Distance (miles)' nor 'Trip Distance' column found in file headers.")
             return None, "Neither 'Trip Distance (miles)' nor 'Trip Distance' column found in file headers."
 
-        # Read all data lines
-        with open(file_path, 'r', encoding='utf-8-sig', errors='ignore') as f:
-            lines = f.readlines()
+        # Read the last data row backwards from the end of the file
+        tail = last_data_rows(file_path)
 
-        data_lines = [line for line in lines if not line.strip().startswith('#') and line.strip()]
-        
-        if not data_lines:
+        if not tail:
             logger.warning("        Could not read any data rows.")
             return None, "Could not read any data rows."
 
-        last_row_data = data_lines[-1]
-        reader = csv.reader([last_row_data])
-        last_row = next(reader, [])
-        
+        last_row = tail[-1]
+
         if len(last_row) > distance_index:
             try:
                 # Get the value from the correct column and convert to float
@@ -142,9 +140,73 @@ def parse_log_file_distance(file_path):
         logger.error(f"        An unexpected error occurred while processing the file: {e}")
         return None, f"An unexpected error occurred: {e}"
 
+# Segments whose track's log has a trip distance in the ingest-time metadata index.
+INDEXED_SEGMENTS = """
+    FROM track_segments ts
+    JOIN tracks t ON ts.track_id = t.track_id
+    JOIN log_file_metadata m ON m.log_id = t.source_log_id
+    WHERE m.trip_distance IS NOT NULL
+"""
+
 def update_segments(dry_run=True):
     """
-    Main function to orchestrate the database updates for segment lengths.
+    Sets segment_length of every track segment in one UPDATE, from the trip
+    distance recorded in `log_file_metadata` at ingest. No CSV is opened.
+    Segments whose log was ingested before the index existed need --scan-files.
+    If dry_run is True, it only logs the planned changes.
+    """
+    logger.info(f"Starting the indexed segment update. Dry-run mode: {'ON' if dry_run else 'OFF'}.")
+
+    conn = get_db_connection()
+    if not conn:
+        logger.critical("Could not connect to the database. Exiting.")
+        return
+
+    cursor = conn.cursor()
+    update_query = "UPDATE track_segments ts JOIN tracks t ON ts.track_id = t.track_id " \
+                   "JOIN log_file_metadata m ON m.log_id = t.source_log_id " \
+                   "SET ts.segment_length = m.trip_distance WHERE m.trip_distance IS NOT NULL"
+    total_segments = indexed_segments = updated_count = 0
+
+    try:
+        cursor.execute("SELECT COUNT(*) FROM track_segments")
+        total_segments = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*)" + INDEXED_SEGMENTS)
+        indexed_segments = cursor.fetchone()[0]
+        logger.info(f"{indexed_segments} of {total_segments} track segments have an indexed trip distance.")
+
+        if dry_run:
+            cursor.execute("SELECT ts.track_id, ts.segment_length, m.trip_distance" + INDEXED_SEGMENTS + " ORDER BY ts.track_id LIMIT 20")
+            for track_id, old_length, new_length in cursor.fetchall():
+                logger.info(f"    PREVIEW: track_id {track_id}: segment_length {old_length} -> {new_length}")
+            logger.info(f"    PREVIEW: {update_query}")
+        else:
+            cursor.execute(update_query)
+            conn.commit()
+            updated_count = cursor.rowcount
+            logger.info(f"    SUCCESS: {updated_count} segments updated.")
+    except mysql.connector.Error as err:
+        logger.error(f"Error executing database query: {err}")
+        conn.rollback()
+    finally:
+        cursor.close()
+        conn.close()
+        logger.info("Database connection closed.")
+
+    print("-" * 30)
+    print(f"Update Summary ({'Preview' if dry_run else 'Update'} Mode, from metadata index)")
+    print("-" * 30)
+    print(f"{total_segments} segments checked")
+    print(f"{indexed_segments} segments with an indexed trip distance")
+    print(f"{total_segments - indexed_segments} segments without index entries (use --scan-files)")
+    if not dry_run:
+        print(f"\nSegments changed in the database: {updated_count}")
+    print("-" * 30)
+
+def update_segments_from_files(dry_run=True):
+    """
+    Reads every segment's CSV to update its length from the trip distance.
+    Only needed for logs ingested before `log_file_metadata` existed.
     If dry_run is True, it only logs the planned changes.
     """
     logger.info(f"Starting the segment update script. Dry-run mode: {'ON' if dry_run else 'OFF'}.")
@@ -254,16 +316,18 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Update track segments with trip distance from log CSV files.")
     parser.add_argument('--preview', '-p', action='store_true', help="Preview changes without writing to the database.")
     parser.add_argument('--update', '-u', action='store_true', help="Execute the database update. **DANGEROUS**")
+    parser.add_argument('--scan-files', action='store_true', help="Read the CSV files instead of the ingest metadata index (for logs ingested before it existed).")
     args = parser.parse_args()
 
     if args.update and args.preview:
         print("Error: Cannot use both --update and --preview flags. Please choose one.")
         sys.exit(1)
-    
+
+    run = update_segments_from_files if args.scan_files else update_segments
     if args.update:
-        update_segments(dry_run=False)
+        run(dry_run=False)
     elif args.preview:
-        update_segments(dry_run=True)
+        run(dry_run=True)
     else:
         print("No action specified. Use --preview to see changes or --update to apply them.")
         sys.exit(1)
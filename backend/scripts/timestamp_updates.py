@@ -1,6 +1,5 @@
 import os
 import sys
-import csv
 import re
 import logging
 import datetime
@@ -13,6 +12,9 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 BACKEND_DIR = os.path.dirname(SCRIPT_DIR)
 ZJOBD_DIR = os.path.dirname(BACKEND_DIR)
 sys.path.append(os.path.join(BACKEND_DIR, 'config'))
+sys.path.append(BACKEND_DIR)
+
+from log2db.utils import last_data_rows
 
 try:
     import db_credentials
@@ -93,29 +95,25 @@ def parse_log_file(file_path):
     logger.info(f"    Processing file: {os.path.basename(file_path)}")
 
     try:
-        # Using 'utf-8-sig' to handle files with a Byte Order Mark (BOM), and ignoring other errors.
-        with open(file_path, 'r', encoding='utf-8-sig', errors='ignore') as f:
-            lines = f.readlines()
-        
-        logger.info(f"        Read {len(lines)} lines from the file.")
-
-        if not lines:
+        if os.path.getsize(file_path) == 0:
             logger.warning("        File is empty.")
             return None, None
 
-        # First, find the start time in a comment line
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if not line.startswith('#'):
-                # We've hit the data rows, so stop searching for comments.
-                break
-            
-            logger.info(f"        Checking comment line {i}: '{line}'")
-            match = re.search(r'#\s*StartTime\s*[:=]\s*(.*)', line, re.IGNORECASE)
-            if match:
-                start_time_str = match.group(1).strip().rstrip(';')
-                logger.info(f"        Found StartTime in comment: '{start_time_str}'")
-                break
+        # First, find the start time in a comment line. Only the preamble is read.
+        # Using 'utf-8-sig' to handle files with a Byte Order Mark (BOM), and ignoring other errors.
+        with open(file_path, 'r', encoding='utf-8-sig', errors='ignore') as f:
+            for i, line in enumerate(f):
+                line = line.strip()
+                if not line.startswith('#'):
+                    # We've hit the data rows, so stop searching for comments.
+                    break
+
+                logger.info(f"        Checking comment line {i}: '{line}'")
+                match = re.search(r'#\s*StartTime\s*[:=]\s*(.*)', line, re.IGNORECASE)
+                if match:
+                    start_time_str = match.group(1).strip().rstrip(';')
+                    logger.info(f"        Found StartTime in comment: '{start_time_str}'")
+                    break
         
         # If start_time was not found in a comment, try the filename as a fallback
         if not start_time_str:
@@ -131,17 +129,15 @@ def parse_log_file(file_path):
             logger.warning("        Could not find start time in file or filename.")
             return None, None
         
-        # Get the last data row
-        data_lines = [line for line in lines if not line.strip().startswith('#')]
-        
-        if not data_lines:
+        # Get the last data row, read backwards from the end of the file
+        tail = last_data_rows(file_path)
+
+        if not tail:
             logger.warning("        Could not read any data rows.")
             return None, None
 
-        last_row_data = data_lines[-1]
-        reader = csv.reader([last_row_data])
-        last_row = next(reader, [])
-        
+        last_row = tail[-1]
+
         if last_row and len(last_row) > 0:
             try:
                 # Convert the first column to Decimal to maintain precision
@@ -172,9 +168,72 @@ def parse_log_file(file_path):
         logger.error(f"        An unexpected error occurred while processing the file: {e}")
         return None, None
 
+# Tracks whose log has an entry in the ingest-time metadata index.
+INDEXED_TRACKS = """
+    FROM tracks t
+    JOIN log_file_metadata m ON m.log_id = t.source_log_id
+    WHERE m.start_time IS NOT NULL AND m.last_time_offset IS NOT NULL
+"""
+
 def update_tracks(dry_run=True):
     """
-    Main function to orchestrate the database updates.
+    Sets start_time and duration_seconds of every track in one UPDATE, from the
+    `log_file_metadata` index written at ingest. No CSV is opened. Tracks whose
+    log was ingested before the index existed need --scan-files.
+    If dry_run is True, it only logs the planned changes.
+    """
+    logger.info(f"Starting the indexed update. Dry-run mode: {'ON' if dry_run else 'OFF'}.")
+
+    conn = get_db_connection()
+    if not conn:
+        logger.critical("Could not connect to the database. Exiting.")
+        return
+
+    cursor = conn.cursor()
+    update_query = "UPDATE tracks t JOIN log_file_metadata m ON m.log_id = t.source_log_id " \
+                   "SET t.start_time = m.start_time, t.duration_seconds = m.last_time_offset " \
+                   "WHERE m.start_time IS NOT NULL AND m.last_time_offset IS NOT NULL"
+    total_tracks = indexed_tracks = updated_count = 0
+
+    try:
+        cursor.execute("SELECT COUNT(*) FROM tracks WHERE source_log_id IS NOT NULL")
+        total_tracks = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*)" + INDEXED_TRACKS)
+        indexed_tracks = cursor.fetchone()[0]
+        logger.info(f"{indexed_tracks} of {total_tracks} tracks have indexed log metadata.")
+
+        if dry_run:
+            cursor.execute("SELECT t.track_id, t.start_time, t.duration_seconds, m.start_time, m.last_time_offset" + INDEXED_TRACKS + " ORDER BY t.track_id LIMIT 20")
+            for track_id, old_start, old_duration, new_start, new_duration in cursor.fetchall():
+                logger.info(f"    PREVIEW: track_id {track_id}: start {old_start} -> {new_start}, duration {old_duration} -> {new_duration}")
+            logger.info(f"    PREVIEW: {update_query}")
+        else:
+            cursor.execute(update_query)
+            conn.commit()
+            updated_count = cursor.rowcount
+            logger.info(f"    SUCCESS: {updated_count} tracks updated.")
+    except mysql.connector.Error as err:
+        logger.error(f"Error executing database query: {err}")
+        conn.rollback()
+    finally:
+        cursor.close()
+        conn.close()
+        logger.info("Database connection closed.")
+
+    print("-" * 30)
+    print(f"Update Summary ({'Preview' if dry_run else 'Update'} Mode, from metadata index)")
+    print("-" * 30)
+    print(f"{total_tracks} tracks checked")
+    print(f"{indexed_tracks} tracks with indexed start time and duration")
+    print(f"{total_tracks - indexed_tracks} tracks without index entries (use --scan-files)")
+    if not dry_run:
+        print(f"\nTracks changed in the database: {updated_count}")
+    print("-" * 30)
+
+def update_tracks_from_files(dry_run=True):
+    """
+    Reads every track's CSV to update its start time and duration. Only needed
+    for logs ingested before `log_file_metadata` existed.
     If dry_run is True, it only logs the planned changes.
     """
     logger.info(f"Starting the update script. Dry-run mode: {'ON' if dry_run else 'OFF'}.")
@@ -277,16 +336,18 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Update track timestamps and durations from log CSV files.")
     parser.add_argument('--preview', '-p', action='store_true', help="Preview changes without writing to the database.")
     parser.add_argument('--update', '-u', action='store_true', help="Execute the database update. **DANGEROUS**")
+    parser.add_argument('--scan-files', action='store_true', help="Read the CSV files instead of the ingest metadata index (for logs ingested before it existed).")
     args = parser.parse_args()
 
     if args.update and args.preview:
         print("Error: Cannot use both --update and --preview flags. Please choose one.")
         sys.exit(1)
-    
+
+    run = update_tracks_from_files if args.scan_files else update_tracks
     if args.update:
-        update_tracks(dry_run=False)
+        run(dry_run=False)
     elif args.preview:
-        update_tracks(dry_run=True)
+        run(dry_run=True)
     else:
         print("No action specified. Use --preview to see changes or --update to apply them.")
         sys.exit(1)
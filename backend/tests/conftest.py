@@ -0,0 +1,23 @@
+# FILE: backend/tests/conftest.py
+#
+# Puts `backend/` on sys.path so the tests import `log2db`, `archive` and
+# `app` the way the scripts do. Run from backend/: python -m pytest -q
+# Without a local config/db_credentials.py, the placeholder settings of
+# config/db_credentials_example.py stand in for it; no test connects.
+# -----------------------------
+
+import os
+import sys
+import importlib.util
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+try:
+    import config.db_credentials
+except ImportError:
+    _spec = importlib.util.spec_from_file_location('config.db_credentials', os.path.join(BACKEND_DIR, 'config', 'db_credentials_example.py'))
+    _credentials = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(_credentials)
+    sys.modules['config.db_credentials'] = _credentials
@@ -0,0 +1,58 @@
+# FILE: backend/tests/test_app_log_data.py
+#
+# The streamed /api/logs/<id>/data response, with the database replaced by a fake.
+# -----------------------------
+
+import json
+
+import pytest
+
+import app as app_module
+
+class FakeDatabaseManager:
+    closed = 0
+
+    def __init__(self, db_config, rows, fail_after=None):
+        self.rows = rows
+        self.fail_after = fail_after
+
+    def fetch_one(self, query, params=None):
+        return {'file_name': 'a.csv', 'trip_group_id': None, 'distance_miles': 1.5, 'trip_duration_seconds': 60}
+
+    def stream_data_for_log(self, log_id):
+        def chunks():
+            for i, row in enumerate(self.rows):
+                if self.fail_after is not None and i >= self.fail_after:
+                    raise RuntimeError("Lost connection to MySQL server during query")
+                yield [row]
+        return chunks(), ['timestamp', 'rpm'], {}, {}
+
+    def close(self):
+        FakeDatabaseManager.closed += 1
+
+@pytest.fixture
+def client(monkeypatch):
+    def use(rows, fail_after=None):
+        monkeypatch.setattr(app_module, 'DatabaseManager', lambda config: FakeDatabaseManager(config, rows, fail_after))
+        return app_module.app.test_client()
+    return use
+
+ROWS = [{'timestamp': 1, 'rpm': 800.0}, {'timestamp': 2, 'rpm': 850.5}, {'timestamp': 3, 'rpm': None}]
+
+def test_streamed_log_data_parses_as_json(client):
+    response = client(ROWS).get('/api/logs/7/data')
+    document = json.loads(response.get_data())
+    assert response.status_code == 200
+    assert document['data'] == ROWS
+    assert document['columns'] == ['timestamp', 'rpm']
+    assert document['trip_info']['file_name'] == 'a.csv'
+    assert 'error' not in document
+
+def test_failed_stream_ends_with_an_error_marker(client):
+    closed = FakeDatabaseManager.closed
+    response = client(ROWS, fail_after=2).get('/api/logs/7/data')
+    document = json.loads(response.get_data())
+    response.close()
+    assert document['data'] == ROWS[:2]
+    assert document['error']
+    assert FakeDatabaseManager.closed > closed
@@ -0,0 +1,54 @@
+# FILE: backend/tests/test_json_stream.py
+
+import json
+import decimal
+from datetime import date
+
+import pytest
+
+from log2db.json_stream import iter_json_document
+
+def _document(*args, **kwargs):
+    return json.loads(b''.join(iter_json_document(*args, **kwargs)))
+
+def _failing_chunks(rows, error=RuntimeError("cursor lost")):
+    yield rows
+    raise error
+
+def test_document_parses_as_json():
+    chunks = [[{'a': 1, 'b': 'x'}], [], [{'a': 2, 'b': None}, {'a': 3, 'b': 'z'}]]
+    document = _document({'columns': ['a', 'b'], 'trip_info': None}, 'data', chunks)
+    assert document == {'columns': ['a', 'b'], 'trip_info': None, 'data': [{'a': 1, 'b': 'x'}, {'a': 2, 'b': None}, {'a': 3, 'b': 'z'}]}
+
+def test_empty_fields_and_no_rows():
+    assert _document({}, 'data', []) == {'data': []}
+    assert _document({'n': 0}, 'data', [[], []]) == {'n': 0, 'data': []}
+
+def test_values_are_converted_like_jsonify():
+    document = _document({'when': date(2024, 3, 14)}, 'data', [[{'v': decimal.Decimal('1.50')}]])
+    assert document == {'when': 'Thu, 14 Mar 2024 00:00:00 GMT', 'data': [{'v': '1.50'}]}
+
+def test_failure_without_error_fields_is_raised():
+    pieces = []
+    with pytest.raises(RuntimeError):
+        for piece in iter_json_document({}, 'data', _failing_chunks([{'a': 1}])):
+            pieces.append(piece)
+    with pytest.raises(ValueError):
+        json.loads(b''.join(pieces))
+
+def test_failure_with_error_fields_ends_a_valid_document():
+    pieces = []
+    with pytest.raises(RuntimeError):
+        for piece in iter_json_document({'columns': ['a']}, 'data', _failing_chunks([{'a': 1}]), error_fields={'error': 'stopped'}):
+            pieces.append(piece)
+    assert json.loads(b''.join(pieces)) == {'columns': ['a'], 'data': [{'a': 1}], 'error': 'stopped'}
+
+def test_failure_before_the_first_row():
+    def no_rows():
+        raise RuntimeError("cursor lost")
+        yield
+    pieces = []
+    with pytest.raises(RuntimeError):
+        for piece in iter_json_document({}, 'data', no_rows(), error_fields={'error': 'stopped'}):
+            pieces.append(piece)
+    assert json.loads(b''.join(pieces)) == {'data': [], 'error': 'stopped'}
@@ -0,0 +1,82 @@
+# FILE: backend/tests/test_offset_line_reader.py
+#
+# Resuming a file from the byte offset saved in an ingest checkpoint.
+# -----------------------------
+
+import io
+import gzip
+from itertools import islice
+
+import pytest
+
+from log2db.core import OffsetLineReader, iter_data_rows
+from log2db.preamble import read_preamble
+
+CSV = ('\ufeff# StartTime = 03/14/2025 08:15:30 AM\r\n'
+       'Time (sec),Engine RPM (rpm),Note\r\n'
+       + ''.join(f'{i}.0,{800 + i},"{"café" if i % 3 else "a, b"}"\r\n' for i in range(20))
+       + '\r\n20.0,820,"multi\r\nline"\r\n21.0,821,end').encode('utf-8')
+
+class ForwardOnly(io.RawIOBase):
+    """A stream that can only be read forwards, like a zstd decompressor."""
+
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self._data.read(len(buffer))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+def _open(data, kind):
+    if kind == 'seekable':
+        return io.BytesIO(data)
+    if kind == 'gzip':
+        return gzip.GzipFile(fileobj=io.BytesIO(gzip.compress(data)))
+    return io.BufferedReader(ForwardOnly(data))
+
+def _all_rows(data, kind='seekable'):
+    lines = OffsetLineReader(_open(data, kind))
+    preamble = read_preamble(lines, 'log.csv')
+    return preamble, list(iter_data_rows(lines, preamble.headers, preamble.dialect))
+
+def test_reads_every_row_and_strips_the_bom():
+    preamble, rows = _all_rows(CSV)
+    assert preamble.headers == ['time', 'engine rpm', 'note']
+    assert len(rows) == 22
+    assert rows[1] == {'time': '1.0', 'engine rpm': '801', 'note': 'café'}
+    assert rows[20]['note'] == 'multi\r\nline'
+
+@pytest.mark.parametrize('kind', ['seekable', 'gzip', 'forward-only'])
+@pytest.mark.parametrize('committed', [0, 1, 7, 20, 21, 22])
+def test_resumes_at_the_checkpoint_offset(kind, committed):
+    preamble, expected = _all_rows(CSV)
+
+    # First run: read `committed` rows and save the offset, as a checkpoint does after a batch.
+    lines = OffsetLineReader(_open(CSV, kind))
+    first = read_preamble(lines, 'log.csv')
+    data_offset = lines.offset
+    assert list(islice(iter_data_rows(lines, first.headers, first.dialect), committed)) == expected[:committed]
+    offset = lines.offset if committed else data_offset
+
+    # Resumed run: a fresh stream, positioned at the saved offset.
+    lines = OffsetLineReader(_open(CSV, kind))
+    lines.seek(offset)
+    assert list(iter_data_rows(lines, preamble.headers, preamble.dialect)) == expected[committed:]
+    assert lines.offset == len(CSV)
+
+def test_offset_counts_the_bom_and_raw_bytes():
+    lines = OffsetLineReader(io.BytesIO(CSV))
+    first = next(lines)
+    assert first.startswith('# StartTime')
+    assert lines.offset == len(first.encode('utf-8')) + 3
+
+def test_forward_only_streams_cannot_seek_backwards():
+    lines = OffsetLineReader(_open(CSV, 'forward-only'))
+    next(lines)
+    next(lines)
+    with pytest.raises(io.UnsupportedOperation):
+        lines.seek(1)
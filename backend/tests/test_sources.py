@@ -0,0 +1,22 @@
+# FILE: backend/tests/test_sources.py
+
+import zipfile
+
+from log2db.sources import iter_log_sources, member_source_name, MAX_SOURCE_NAME_LENGTH
+
+def test_zip_members_are_named_by_their_full_path(tmp_path):
+    path = tmp_path / 'logs.zip'
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('a/trip.csv', 'x\n1\n')
+        archive.writestr('b/trip.csv', 'x\n2\n')
+        archive.writestr('notes.txt', '')
+    assert [s.name for s in iter_log_sources(str(path))] == ['logs.zip:a/trip.csv', 'logs.zip:b/trip.csv']
+
+def test_long_member_names_fit_the_file_name_column():
+    member = '/'.join(['nested_folder'] * 30)
+    first = member_source_name('logs.zip', member + '/trip_1.csv')
+    second = member_source_name('logs.zip', member + '/trip_2.csv')
+    assert len(first) == len(second) == MAX_SOURCE_NAME_LENGTH
+    assert first != second
+    assert first.startswith('logs.zip:nested_folder') and first.endswith('/trip_1.csv')
+    assert member_source_name('logs.zip', member + '/trip_1.csv') == first
@@ -0,0 +1,97 @@
+# FILE: backend/tests/test_state_detector.py
+#
+# The column-wise classifier against the row-by-row rules it replaced
+# (state_detector.py 1.4.0), on the synthetic benchmark corpus and on edge
+# values.
+# -----------------------------
+
+from collections import Counter
+
+import pytest
+
+from benchmarks.synthetic import write_corpus
+from log2db.core import OffsetLineReader, iter_data_rows
+from log2db.preamble import read_preamble
+from log2db.state_detector import classify_operating_states, WARM_ENGINE_TEMP_F, HIGH_LOAD_THRESHOLD, HIGHWAY_SPEED_MPH
+from log2db.utils import sanitize_column_name
+
+PIDS = ('engine_rpm', 'gps_speed', 'calculated_load_value', 'engine_coolant_temperature', 'fuel_system_1_status')
+
+def rowwise_state(row, pids):
+    """One row's state, exactly as the 1.4.0 loop computed it."""
+    available = set(pids)
+    rpm_pid, speed_pid, load_pid, coolant_pid, fuel_status_pid = (p if p in available else None for p in PIDS)
+    state = 'Unknown'
+    try:
+        rpm = float(row.get(rpm_pid, 0)) if rpm_pid else 0
+        speed = float(row.get(speed_pid, 0)) if speed_pid else 0
+        load = float(row.get(load_pid, 0)) if load_pid else 0
+        coolant_temp = float(row.get(coolant_pid, 180)) if coolant_pid else 180
+        fuel_status = int(float(row.get(fuel_status_pid, 0))) if fuel_status_pid else 0
+
+        if fuel_status == 0 or rpm == 0:
+            state = 'Engine Off'
+        elif fuel_status == 1:
+            state = 'Open Loop (Cold Start)'
+        elif fuel_status == 2:
+            if speed == 0: state = 'Closed Loop (Idle)'
+            elif speed >= HIGHWAY_SPEED_MPH: state = 'Closed Loop (Highway)'
+            else: state = 'Closed Loop (City)'
+        elif fuel_status == 4:
+            if speed == 0: state = 'Open Loop (Idle)'
+            elif load > HIGH_LOAD_THRESHOLD: state = 'Open Loop (WOT Accel)'
+            else: state = 'Open Loop (Decel Fuel Cut)'
+        elif fuel_status == 8: state = 'FAULT - Open Loop'
+        elif fuel_status == 16: state = 'FAULT - Closed Loop'
+
+        if coolant_temp < WARM_ENGINE_TEMP_F and rpm > 0 and state != 'Open Loop (Cold Start)':
+            state = f"{state} (Warm-up)"
+    except (ValueError, TypeError):
+        state = 'Unknown (Err)'
+    return state
+
+def assert_matches_rowwise(rows, pids):
+    expected = [rowwise_state(row, pids) for row in rows]
+    assert [row['operating_state'] for row in classify_operating_states([dict(r) for r in rows], pids)] == expected
+    return expected
+
+@pytest.fixture(scope='module')
+def corpus_rows(tmp_path_factory):
+    """Every data row of a small synthetic corpus, keyed by sanitized PID name."""
+    rows = []
+    for path, _, _ in write_corpus(str(tmp_path_factory.mktemp('corpus')), files=3, hours=0.6):
+        with open(path, 'rb') as raw:
+            lines = OffsetLineReader(raw)
+            preamble = read_preamble(lines, path)
+            for row in iter_data_rows(lines, preamble.headers, preamble.dialect):
+                rows.append({sanitize_column_name(h): v for h, v in row.items()})
+    return rows
+
+def test_matches_rowwise_rules_on_the_synthetic_corpus(corpus_rows):
+    states = Counter(assert_matches_rowwise(corpus_rows, list(corpus_rows[0])))
+    # The drive cycle covers the engine-off start, cold start, warm-up and warm driving.
+    assert {'Engine Off', 'Open Loop (Cold Start)', 'Closed Loop (City)', 'Closed Loop (Highway)', 'Unknown (Err)'} <= set(states)
+
+def test_matches_rowwise_rules_without_some_pids(corpus_rows):
+    for missing in PIDS:
+        pids = [p for p in corpus_rows[0] if p != missing]
+        assert_matches_rowwise([{k: v for k, v in r.items() if k != missing} for r in corpus_rows[:400]], pids)
+
+def test_matches_rowwise_rules_on_edge_values():
+    rows = []
+    for fuel in ('0', '1', '2', '2.9', '4', '8', '16', '3', '-1', 'nan', '', None, 'closed', 2, 4.0):
+        for rpm, speed, load, coolant in (('800', '0', '20', '190'), ('2500', '65', '80', '150'), ('0', '30', '75', '100'),
+                                          ('1500', '60', '70', '160'), ('1500', '59.9', '70.1', '159.9'), ('x', '1', '1', '1')):
+            rows.append({'engine_rpm': rpm, 'gps_speed': speed, 'calculated_load_value': load,
+                         'engine_coolant_temperature': coolant, 'fuel_system_1_status': fuel})
+    assert_matches_rowwise(rows, PIDS)
+    # Missing keys fall back to the per-PID defaults, as row.get() did.
+    assert_matches_rowwise([{'engine_rpm': '900'}, {'fuel_system_1_status': '2'}, {}], PIDS)
+
+def test_infinite_fuel_status_is_an_error():
+    # The row-wise loop raised OverflowError from int(float('inf')) here.
+    rows = classify_operating_states([{'engine_rpm': '800', 'fuel_system_1_status': 'inf'}], PIDS)
+    assert rows[0]['operating_state'] == 'Unknown (Err)'
+
+def test_empty_input():
+    assert classify_operating_states([], PIDS) == []
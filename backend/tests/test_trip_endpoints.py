@@ -0,0 +1,55 @@
+# FILE: backend/tests/test_trip_endpoints.py
+
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from archive.group_trips import generate_group_id
+from log2db.trip_endpoints import EndpointSet, PREVIEW_SENSITIVITIES, group_summaries, parse_sensitivity, round_endpoints
+
+def _coords():
+    rnd = random.Random(7)
+    rows = []
+    for _ in range(300):
+        lat, lon = rnd.uniform(44.8, 45.1), rnd.uniform(-93.4, -93.0)
+        rows.append([lat, lon, lat + rnd.uniform(-0.05, 0.05), lon + rnd.uniform(-0.05, 0.05)])
+    # Values on or next to a rounding half at some sensitivity, negatives, zero and swapped ends.
+    rows += [[44.9785, -93.2615, 44.98, -93.26], [44.97850001, -93.26149999, 44.0, -93.0],
+             [0.05, -0.05, 0.0, -0.0], [1.00005, 2.5, 1.00005, 2.5], [45.5, -93.5, 44.5, -92.5],
+             [44.9015, -93.1015, 44.9015, -93.1015], [-33.86885, 151.20935, -33.86875, 151.20945]]
+    # Round trips: the same two points in either direction.
+    rows += [[r[2], r[3], r[0], r[1]] for r in rows[:50]]
+    return np.array(rows, dtype=float)
+
+@pytest.mark.parametrize('sensitivity', PREVIEW_SENSITIVITIES + (0, 7, 9))
+def test_group_ids_from_rounded_keys_match_generate_group_id(sensitivity):
+    coords = _coords()
+    keys = round_endpoints(coords, [sensitivity])[0]
+    for raw, key in zip(coords.tolist(), keys.tolist()):
+        assert generate_group_id(*key, sensitivity) == generate_group_id(*raw, sensitivity)
+
+def test_summaries_count_the_groups_generate_group_id_forms():
+    coords = _coords()
+    summaries = group_summaries(coords)
+    for sensitivity in PREVIEW_SENSITIVITIES:
+        sizes = [n for n in Counter(generate_group_id(*raw, sensitivity) for raw in coords.tolist()).values() if n > 1]
+        assert summaries[sensitivity] == {
+            "total_groups": len(sizes),
+            "total_trips_grouped": sum(sizes),
+            "group_counts": {"groups_of_2": sizes.count(2),
+                             "groups_of_3_4": sum(1 for n in sizes if n in (3, 4)),
+                             "groups_of_5_plus": sum(1 for n in sizes if n >= 5)},
+        }
+
+def test_endpoint_set_serves_only_preview_sensitivities():
+    endpoint_set = EndpointSet([{'log_id': 1, 'start_lat': 44.97, 'start_lon': -93.26, 'end_lat': 44.98, 'end_lon': -93.27}])
+    assert endpoint_set.summary(3)['total_groups'] == 0
+    with pytest.raises(ValueError):
+        endpoint_set.summary(12)
+
+@pytest.mark.parametrize('value, expected', [(3, 3), ('4', 4), (6.0, 6), (1, 1), (0, None), (7, None), (2.5, None),
+                                             ('x', None), (None, None), (True, None), ([3], None)])
+def test_parse_sensitivity(value, expected):
+    assert parse_sensitivity(value) == expected
@@ -0,0 +1,76 @@
+# FILE: backend/tests/test_utils.py
+
+import io
+
+import pytest
+
+from log2db.utils import ColumnTypeSampler, infer_mysql_type_from_values, tail_lines, last_data_rows
+
+@pytest.mark.parametrize('values, expected', [
+    (['12.5', '800', '-3.25'], 'FLOAT'),
+    (['', '0.1234567', None, '  '], 'FLOAT'),
+    (['1.5e3', '-0.004560'], 'FLOAT'),
+    (['44.970001'], 'DOUBLE'),
+    (['-93.2600005', '1'], 'DOUBLE'),
+    (['12345678'], 'DOUBLE'),
+    (['4e38'], 'DOUBLE'),
+    (['1', 'nan', 'inf'], 'FLOAT'),
+    (['1', 'closed'], 'VARCHAR(255)'),
+    (['', None], 'VARCHAR(255)'),
+    (['nan'], 'VARCHAR(255)'),
+])
+def test_column_type_sampler(values, expected):
+    assert infer_mysql_type_from_values(values) == expected
+
+def test_first_empty_cell_does_not_decide_the_type():
+    sampler = ColumnTypeSampler()
+    for value in ('', '', '1.25', '44.9700012'):
+        sampler.add(value)
+    assert sampler.mysql_type == 'DOUBLE'
+
+def test_text_wins_over_later_numbers():
+    sampler = ColumnTypeSampler()
+    for value in ('1', 'open', '2'):
+        sampler.add(value)
+    assert sampler.mysql_type == 'VARCHAR(255)'
+
+def _tail(data, count=1, block_size=8192):
+    return tail_lines(io.BytesIO(data), count, block_size)
+
+def test_tail_lines_of_an_empty_file():
+    assert _tail(b'') == []
+    assert _tail(b'\n\n', count=3) == []
+
+def test_tail_lines_with_and_without_trailing_newline():
+    assert _tail(b'a,b\n1,2\n3,4\n') == ['3,4']
+    assert _tail(b'a,b\n1,2\n3,4') == ['3,4']
+    assert _tail(b'a,b\r\n1,2\r\n3,4\r\n\r\n', count=2) == ['1,2', '3,4']
+
+def test_tail_lines_skips_comments_and_strips_the_bom():
+    assert _tail(b'\xef\xbb\xbfa,b') == ['a,b']
+    assert _tail(b'\xef\xbb\xbf# StartTime = x\na,b\n1,2\n# note\n', count=5) == ['a,b', '1,2']
+
+def test_tail_lines_across_block_boundaries():
+    lines = [f'{i},{i * i}' for i in range(500)]
+    data = ('\n'.join(lines) + '\n').encode('utf-8')
+    for block_size in (1, 3, 7, 64, len(data), len(data) + 10):
+        assert _tail(data, 3, block_size) == lines[-3:]
+    assert _tail(data, 1000, 16) == lines
+
+def test_tail_lines_keeps_multibyte_characters_split_by_a_block():
+    data = 'a,b\n1,café °F\n'.encode('utf-8')
+    for block_size in range(1, len(data) + 1):
+        assert _tail(data, 1, block_size) == ['1,café °F']
+
+def test_last_data_rows(tmp_path):
+    path = tmp_path / 'log.csv'
+    path.write_bytes(b'\xef\xbb\xbf# StartTime = 03/14/2025 08:15:30 AM\nTime (sec),"Speed, GPS (mph)"\n0.0,1\n1.0,"2,5"')
+    assert last_data_rows(str(path)) == [['1.0', '2,5']]
+    assert last_data_rows(str(path), count=2) == [['0.0', '1'], ['1.0', '2,5']]
+
+def test_last_data_rows_of_a_log_without_data(tmp_path):
+    path = tmp_path / 'log.csv'
+    path.write_bytes(b'\xef\xbb\xbfTime (sec),Speed (mph)\n')
+    assert last_data_rows(str(path)) == [['Time (sec)', 'Speed (mph)']]
+    path.write_bytes(b'')
+    assert last_data_rows(str(path)) == []
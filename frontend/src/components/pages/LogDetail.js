@@ -1,3 +1,6 @@
+// --- VERSION 1.0.1 ---
+// - Treats a log data response ending with an "error" field as a failed fetch.
+//
 // --- VERSION 1.0.0 ---
 // - Enhanced LogDetail with proper data fetching and state management
 // - Synchronized chart and map interaction
@@ -64,6 +67,11 @@ export default function LogDetail() {
         }
         
         const data = await response.json();
+
+        // A stream that failed part way ends with an "error" field after the rows sent so far.
+        if (data.error) {
+          throw new Error(data.error);
+        }
         
         console.log(`[LogDetail] Received data:`, {
           dataPoints: data.data?.length || 0,
@@ -1,3 +1,7 @@
+// --- VERSION 0.0.2 ---
+// - A response with an "error" field (e.g. a log stream that failed part
+//   way) is reported as an error instead of rendering partial data.
+//
 // --- VERSION 0.0.1 ---
 // - Optional hook to fetch a single log or a trip group detail,
 //   returning a normalized { data, columns } + raw.
@@ -28,6 +32,7 @@ export function useLogData(logId, type = 'log') {
       .then((res) => res.json())
       .then((data) => {
         if (!mounted) return;
+        if (data?.error) throw new Error(data.error);
         console.log(
           `[useLogData] loaded ${type} ${logId} with`,
           type === 'group'